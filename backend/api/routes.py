@@ -1,93 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, aliased
+from datetime import datetime
+from typing import List, Optional
+import asyncio
 import uuid
 
 from api.schemas import (
     VideoCreateRequest, 
+    VideoBatchCreateRequest,
+    VideoBatchCreateResponse,
+    VideoRemixRequest,
+    VideoSearchHit,
+    VideoSearchResponse,
+    VideoStatusResponse,
     VideoResponse, 
+    PlanRequest,
+    PlanResponse,
     StyleResponse, 
     VoiceResponse
 )
-from models.database import get_db, Video
+from models.database import get_db, Video, Plan
 from config.presets import VISUAL_STYLES, NARRATION_VOICES
-from workflows.video_workflow import VideoGenerationWorkflow, VideoGenerationState
-import asyncio
+from config.settings import settings
+from jobs.worker import notify_new_jobs, cancel_local_job
+from jobs.cancellation import mark_cancelled, is_cancellable
+from jobs.plan_cache import plan_fingerprint, plan_matches, find_plan, new_plan_expiry, start_build
+from jobs.coalescing import (
+    job_fingerprint,
+    find_inflight_leader,
+    propagate_to_followers,
+    IN_FLIGHT_STATUSES
+)
+from services.storage_service import storage
+from services.export_service import iter_ndjson, gzip_stream
+from services.search_service import search_videos
+from services.eta_service import estimate_etas, overall_progress
+from services.status_cache import status_cache
+from services.webhook_service import webhooks, verify_signature, parse_event, WebhookVerificationError
 
 router = APIRouter(prefix="/api", tags=["videos"])
 
-# Initialize workflow
-workflow = VideoGenerationWorkflow()
+PREVIEW_MODES = ("off", "auto", "approval")
 
-async def process_video_generation(video_id: str, size: str, duration: int, db_session: Session):
-    """Background task to process video generation"""
-    db = next(get_db())
-    
-    try:
-        # Get video from database
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if not video:
-            return
-        
-        # Update status to processing
-        video.status = "processing"
-        db.commit()
-        
-        # Create initial state
-        initial_state: VideoGenerationState = {
-            "video_id": video_id,
-            "script": video.script,
-            "style": video.style,
-            "voice": video.voice,
-            "size": size,
-            "keywords": video.keywords or [],
-            "negative_keywords": video.negative_keywords or [],
-            "prompts": [],
-            "best_prompt": "",
-            "image_paths": [],
-            "audio_path": "",
-            "video_path": "",
-            "duration": duration,
-            "narration_text": None,
-            "error": None,
-            "current_step": "initializing"
-        }
-        
-        # Run workflow - using await since it's async
-        result = await workflow.run(initial_state)
-        
-        # Update database with results
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if result.get("error"):
-            video.status = "failed"
-            video.error_message = result["error"]
-        else:
-            video.status = "completed"
-            video.prompts = result.get("prompts")
-            video.image_paths = result.get("image_paths")
-            video.audio_path = result.get("audio_path")
-            video.video_path = result["video_path"]
-            video.duration = result.get("duration")
-        
-        db.commit()
-        
-    except Exception as e:
-        print(f"Error processing video {video_id}: {str(e)}")
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if video:
-            video.status = "failed"
-            video.error_message = str(e)
-            db.commit()
-    finally:
-        db.close()
+def _preview_mode(value: Optional[str], field: str = "preview_mode") -> str:
+    """Requested preview mode, defaulting to PREVIEW_MODE"""
+    mode = value or settings.PREVIEW_MODE
+    if mode not in PREVIEW_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid {field}: {mode}")
+    return mode
+
+def _with_etas(db: Session, videos: List[Video]) -> List[VideoResponse]:
+    """Responses for ``videos`` with completion estimates on unfinished jobs"""
+    etas = estimate_etas(db, videos)
+    return [VideoResponse(**v.to_dict(), eta_seconds=etas.get(v.id)) for v in videos]
 
 @router.post("/videos/create", response_model=VideoResponse)
 async def create_video(
     request: VideoCreateRequest, 
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
 ):
-    """Create a new video generation job"""
+    """
+    Create a new video generation job
+    
+    A repeated Idempotency-Key returns the job created for it the first
+    time. Without a key, a submission identical to a job still in flight is
+    attached to that job and shares its artifacts instead of paying for a
+    second render. A script close to a past completed one is reported in
+    similar_to, or reuses that job's prompts and reference images
+    (NEAR_DUP_MODE=auto, or reuse_from set explicitly). A plan_id from
+    POST /api/plan skips the stages already done for it.
+    """
     
     # Validate style and voice
     if request.style not in VISUAL_STYLES:
@@ -96,6 +81,52 @@ async def create_video(
     if request.voice not in NARRATION_VOICES:
         raise HTTPException(status_code=400, detail=f"Invalid voice: {request.voice}")
     
+    if idempotency_key:
+        existing = db.query(Video).filter(Video.idempotency_key == idempotency_key).first()
+        if existing:
+            return VideoResponse(**existing.to_dict())
+    
+    if request.plan_id and request.reuse_from:
+        raise HTTPException(status_code=400, detail="Use either plan_id or reuse_from")
+    
+    size = request.size or "1280x720"
+    duration = request.duration or 8
+    preview_mode = _preview_mode(request.preview_mode)
+    fingerprint = job_fingerprint(
+        request.script, request.style, request.voice, size, duration,
+        request.keywords, request.negative_keywords, preview_mode, request.storyboard
+    )
+    
+    # An explicit key asks for exactly one job per key, so only coalesce without one
+    leader = None
+    if settings.ENABLE_JOB_COALESCING and not idempotency_key and not request.reuse_from:
+        leader = find_inflight_leader(db, fingerprint)
+    
+    plan = None
+    if request.plan_id and not leader:
+        plan = db.query(Plan).filter(Plan.id == request.plan_id).first()
+        # A stale plan (edited form, expired, failed) only loses the head start
+        if not plan or plan.status == "failed" or not plan_matches(
+            plan, request.script, request.style, request.keywords, request.negative_keywords
+        ):
+            print(f"Ignoring plan {request.plan_id}: missing, failed or for different inputs")
+            plan = None
+    
+    reuse_source, similar_to, similarity = None, None, None
+    if request.reuse_from:
+        reuse_source = db.query(Video).filter(Video.id == request.reuse_from).first()
+        if not reuse_source or reuse_source.status != "completed" or not reuse_source.prompts:
+            raise HTTPException(status_code=400, detail="reuse_from must be a completed video")
+        if reuse_source.style != request.style:
+            raise HTTPException(status_code=400, detail="reuse_from must have the same style")
+    elif not leader and settings.NEAR_DUP_MODE != "off":
+        match = await _find_near_duplicate(request.script, request.style)
+        if match:
+            similar, similarity = match
+            similar_to = similar.id
+            if settings.NEAR_DUP_MODE == "auto" and not plan:
+                reuse_source = similar
+    
     # Create video record
     video = Video(
         id=str(uuid.uuid4()),
@@ -105,37 +136,277 @@ async def create_video(
         voice=request.voice,
         keywords=request.keywords,
         negative_keywords=request.negative_keywords,
-        status="pending"
+        size=size,
+        duration=duration,
+        storyboard=request.storyboard,
+        preview_mode=preview_mode,
+        fingerprint=fingerprint,
+        idempotency_key=idempotency_key,
+        coalesced_into=leader.id if leader else None,
+        similar_to=similar_to,
+        similarity=similarity,
+        reused_from=reuse_source.id if reuse_source else None,
+        plan_id=plan.id if plan else None,
+        # The plan is reused as is; the worker copies the reference images
+        prompts=reuse_source.prompts if reuse_source else None,
+        best_prompt=reuse_source.best_prompt if reuse_source else None,
+        status=leader.status if leader else "pending"
     )
+    if plan and plan.status == "ready":
+        # A plan still being built is picked up by the worker once it is ready
+        video.prompts = plan.prompts
+        video.best_prompt = plan.best_prompt
+        video.narration_text = plan.narration_text
     
     db.add(video)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request with the same Idempotency-Key won the race
+        db.rollback()
+        existing = db.query(Video).filter(Video.idempotency_key == idempotency_key).first()
+        if not existing:
+            raise
+        return VideoResponse(**existing.to_dict())
     db.refresh(video)
     
-    # Start background processing - create task directly
-    import asyncio
-    asyncio.create_task(process_video_generation(
-        video.id, 
-        request.size or "1280x720",
-        request.duration or 8,
-        db
-    ))
+    if leader:
+        print(f"[{video.id}] Attached to in-flight job {leader.id}")
+    else:
+        # Enqueue: the pending row is picked up by a worker
+        notify_new_jobs()
     
-    return VideoResponse(**video.to_dict())
+    return _with_etas(db, [video])[0]
+
+async def _find_near_duplicate(script: str, style: str):
+    """Closest reusable completed job as (video, similarity), or None; never fails a submission"""
+    try:
+        # Imported here so NumPy stays out of API startup
+        from services.similarity_service import find_reusable
+        return await asyncio.to_thread(find_reusable, script, style)
+    except Exception as e:
+        print(f"Near-duplicate lookup failed: {str(e)}")
+        return None
+
+@router.post("/videos/batch", response_model=VideoBatchCreateResponse)
+async def create_video_batch(request: VideoBatchCreateRequest, db: Session = Depends(get_db)):
+    """Create many video generation jobs in one transaction"""
+    
+    if len(request.videos) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(request.videos)} videos (max {settings.MAX_BATCH_SIZE})"
+        )
+    
+    # Validate every entry before writing anything
+    for index, item in enumerate(request.videos):
+        if item.style not in VISUAL_STYLES:
+            raise HTTPException(status_code=400, detail=f"Invalid style in videos[{index}]: {item.style}")
+        if item.voice not in NARRATION_VOICES:
+            raise HTTPException(status_code=400, detail=f"Invalid voice in videos[{index}]: {item.voice}")
+    preview_modes = [_preview_mode(item.preview_mode, f"preview_mode in videos[{index}]") for index, item in enumerate(request.videos)]
+    
+    batch_id = str(uuid.uuid4())
+    videos = [
+        Video(
+            id=str(uuid.uuid4()),
+            title=item.title,
+            script=item.script,
+            style=item.style,
+            voice=item.voice,
+            keywords=item.keywords,
+            negative_keywords=item.negative_keywords,
+            size=item.size or "1280x720",
+            duration=item.duration or 8,
+            storyboard=item.storyboard,
+            preview_mode=preview_mode,
+            fingerprint=job_fingerprint(
+                item.script, item.style, item.voice, item.size or "1280x720", item.duration or 8,
+                item.keywords, item.negative_keywords, preview_mode, item.storyboard
+            ),
+            batch_id=batch_id,
+            status="pending"
+        )
+        for item, preview_mode in zip(request.videos, preview_modes)
+    ]
+    # Collect ids before commit expires the instances
+    ids = [video.id for video in videos]
+    
+    db.add_all(videos)
+    db.commit()
+    
+    # Enqueue the whole batch; workers plan scripts sharing a style together
+    notify_new_jobs()
+    
+    return VideoBatchCreateResponse(ids=ids, count=len(ids))
+
+@router.post("/plan", response_model=PlanResponse)
+async def create_plan(request: PlanRequest, db: Session = Depends(get_db)):
+    """
+    Start planning a video before it is submitted
+    
+    Runs the planning step (and with with_images / with_audio the reference
+    images and narration) in the background while the user is still
+    reviewing the form. Pass the returned id as plan_id to
+    /api/videos/create to skip the finished stages. Repeated requests for
+    the same inputs return the same plan until it expires; any change
+    starts a new, separately billed plan, so clients should call this once
+    the form is complete rather than while it is being edited.
+    """
+    if request.style not in VISUAL_STYLES:
+        raise HTTPException(status_code=400, detail=f"Invalid style: {request.style}")
+    if request.with_audio and request.voice not in NARRATION_VOICES:
+        raise HTTPException(status_code=400, detail=f"Invalid voice: {request.voice}")
+    if not request.script.strip():
+        raise HTTPException(status_code=400, detail="Script must not be empty")
+    
+    fingerprint = plan_fingerprint(
+        request.script, request.style, request.voice, request.keywords,
+        request.negative_keywords, request.with_images, request.with_audio
+    )
+    plan = find_plan(db, fingerprint)
+    if plan:
+        return PlanResponse(**plan.to_dict())
+    
+    plan = Plan(
+        id=str(uuid.uuid4()),
+        fingerprint=fingerprint,
+        script=request.script,
+        style=request.style,
+        voice=request.voice,
+        keywords=request.keywords,
+        negative_keywords=request.negative_keywords,
+        with_images=request.with_images,
+        with_audio=request.with_audio,
+        status="planning",
+        expires_at=new_plan_expiry()
+    )
+    db.add(plan)
+    db.commit()
+    db.refresh(plan)
+    start_build(plan.id)
+    
+    return PlanResponse(**plan.to_dict())
+
+@router.get("/plan/{plan_id}", response_model=PlanResponse)
+async def get_plan(plan_id: str, db: Session = Depends(get_db)):
+    """Get a plan's progress and results"""
+    plan = db.query(Plan).filter(Plan.id == plan_id).first()
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return PlanResponse(**plan.to_dict())
 
 @router.get("/videos", response_model=List[VideoResponse])
 async def list_videos(db: Session = Depends(get_db)):
     """List all videos"""
     videos = db.query(Video).order_by(Video.created_at.desc()).all()
-    return [VideoResponse(**v.to_dict()) for v in videos]
+    return _with_etas(db, videos)
+
+# Registered before /videos/{video_id} so "export" isn't taken for an id
+@router.get("/videos/export")
+async def export_videos(
+    status: Optional[List[str]] = Query(default=None, description="Only these statuses (repeatable)"),
+    created_from: Optional[datetime] = Query(default=None, description="Created at or after (ISO 8601)"),
+    created_to: Optional[datetime] = Query(default=None, description="Created before (ISO 8601)"),
+    gzip: bool = Query(default=False, description="Gzip the stream")
+):
+    """Stream the catalog as NDJSON, one video per line, in constant memory"""
+    stream = iter_ndjson(status, created_from, created_to)
+    if gzip:
+        return StreamingResponse(
+            gzip_stream(stream),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="videos.ndjson.gz"'}
+        )
+    return StreamingResponse(
+        stream,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="videos.ndjson"'}
+    )
+
+@router.get("/videos/search", response_model=VideoSearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, description="Words to find in titles, scripts and prompts"),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db)
+):
+    """Full-text search ranked by relevance, with highlighted snippets"""
+    try:
+        hits, next_cursor = search_videos(db, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OperationalError:
+        raise HTTPException(status_code=503, detail="Full-text search is not available")
+    return VideoSearchResponse(
+        results=[
+            VideoSearchHit(video=VideoResponse(**hit["video"].to_dict()), score=hit["score"], snippet=hit["snippet"])
+            for hit in hits
+        ],
+        next_cursor=next_cursor
+    )
+
+STATUS_FIELDS = ["id", "status", "progress", "updated_at"]
+STATUS_MAX_IDS = 200
+
+@router.get("/videos/status", response_model=VideoStatusResponse)
+async def video_statuses(
+    ids: str = Query(..., description=f"Comma-separated video ids (at most {STATUS_MAX_IDS})"),
+    db: Session = Depends(get_db)
+):
+    """
+    Status of many videos in one cheap request (e.g. a gallery refresh)
+    
+    One primary-key lookup returns only id, status, progress and updated_at
+    as compact rows; attached duplicates report their leader's progress.
+    Unknown ids are left out.
+    """
+    wanted = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if len(wanted) > STATUS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {STATUS_MAX_IDS} ids per request")
+    
+    leader = aliased(Video)
+    found = {
+        row.id: row for row in
+        db.query(
+            Video.id, Video.status, Video.stage, Video.render_progress, Video.updated_at,
+            leader.stage.label("leader_stage"), leader.render_progress.label("leader_progress")
+        )
+        .outerjoin(leader, leader.id == Video.coalesced_into)
+        .filter(Video.id.in_(wanted))
+    }
+    rows = []
+    for video_id in wanted:
+        row = found.get(video_id)
+        if row is None:
+            continue
+        stage, progress = (row.leader_stage, row.leader_progress) if row.leader_stage else (row.stage, row.render_progress)
+        rows.append([
+            row.id,
+            row.status,
+            overall_progress(row.status, stage, progress),
+            row.updated_at.isoformat() if row.updated_at else None,
+        ])
+    return VideoStatusResponse(fields=STATUS_FIELDS, rows=rows)
 
 @router.get("/videos/{video_id}", response_model=VideoResponse)
 async def get_video(video_id: str, db: Session = Depends(get_db)):
-    """Get a specific video by ID"""
+    """
+    Get a specific video by ID
+    
+    Polled while a video is generating, so responses are served from the
+    status cache until the row is written.
+    """
+    cached = status_cache.get(video_id)
+    if cached is not None:
+        return JSONResponse(cached)
+    token = status_cache.token(video_id)
     video = db.query(Video).filter(Video.id == video_id).first()
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
-    return VideoResponse(**video.to_dict())
+    response = _with_etas(db, [video])[0]
+    status_cache.put(video_id, response.model_dump(), token)
+    return response
 
 @router.get("/styles", response_model=List[StyleResponse])
 async def list_styles():
@@ -164,7 +435,6 @@ async def list_voices():
 @router.post("/videos/{video_id}/regenerate", response_model=VideoResponse)
 async def regenerate_video(
     video_id: str,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Regenerate a video with the same details as an existing video"""
@@ -183,6 +453,11 @@ async def regenerate_video(
         voice=original_video.voice,
         keywords=original_video.keywords,
         negative_keywords=original_video.negative_keywords,
+        size=original_video.size or "1280x720",  # Use the same size as original or default
+        duration=original_video.duration or 8,  # Use the same duration as original or default
+        storyboard=original_video.storyboard,
+        preview_mode=original_video.preview_mode,
+        fingerprint=original_video.fingerprint,  # Never coalesced itself, but later duplicates may attach to it
         status="pending"
     )
     
@@ -190,25 +465,172 @@ async def regenerate_video(
     db.commit()
     db.refresh(new_video)
     
-    # Start background processing with the same parameters
-    import asyncio
-    asyncio.create_task(process_video_generation(
-        new_video.id,
-        "1280x720",  # Use the same size as original or default
-        original_video.duration or 8,  # Use the same duration as original or default
-        db
-    ))
+    # Enqueue with the same parameters
+    notify_new_jobs()
     
     return VideoResponse(**new_video.to_dict())
 
+@router.post("/videos/{video_id}/remix", response_model=VideoResponse)
+async def remix_video(
+    video_id: str,
+    request: VideoRemixRequest,
+    db: Session = Depends(get_db)
+):
+    """Create a new video by remixing a completed one with a prompt change"""
+    
+    source = db.query(Video).filter(Video.id == video_id).first()
+    if not source:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if source.status != "completed" or not source.sora_job_id:
+        raise HTTPException(status_code=409, detail="Only completed Sora videos can be remixed")
+    
+    # Runs through the normal queue; the worker remixes instead of running the pipeline
+    remix = Video(
+        id=str(uuid.uuid4()),
+        title=request.title or f"{source.title} (Remix)",
+        script=source.script,
+        style=source.style,
+        voice=source.voice,
+        keywords=source.keywords,
+        negative_keywords=source.negative_keywords,
+        size=source.size or "1280x720",
+        duration=source.duration or 8,
+        remix_of=source.id,
+        remix_prompt=request.prompt,
+        status="pending"
+    )
+    
+    db.add(remix)
+    db.commit()
+    db.refresh(remix)
+    
+    notify_new_jobs()
+    
+    return VideoResponse(**remix.to_dict())
+
+def _approval_job(db: Session, video_id: str) -> Video:
+    """The job deciding a video's preview (its leader if coalesced)"""
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    job = video
+    if video.coalesced_into:
+        job = db.query(Video).filter(Video.id == video.coalesced_into).first() or video
+    if job.preview_mode != "approval" or job.status not in IN_FLIGHT_STATUSES:
+        raise HTTPException(status_code=409, detail="Video is not waiting for preview approval")
+    return job
+
+@router.post("/videos/{video_id}/approve", response_model=VideoResponse)
+async def approve_preview(video_id: str, db: Session = Depends(get_db)):
+    """Approve the preview so the full render runs (may be sent before the preview is ready)"""
+    job = _approval_job(db, video_id)
+    job.preview_decision = "approved"
+    if job.status == "awaiting_approval":
+        job.status = "pending"
+        job.attempts = 0
+        propagate_to_followers(db, job)
+    db.commit()
+    notify_new_jobs()
+    
+    video = db.query(Video).filter(Video.id == video_id).first()
+    return VideoResponse(**video.to_dict())
+
+@router.post("/videos/{video_id}/reject", response_model=VideoResponse)
+async def reject_preview(video_id: str, db: Session = Depends(get_db)):
+    """Reject the preview; the full render is never submitted"""
+    job = _approval_job(db, video_id)
+    job.preview_decision = "rejected"
+    job.status = "cancelled"
+    # Dropping the lease makes a worker still rendering the preview stop and discard it
+    job.lease_owner = None
+    job.lease_expires_at = None
+    propagate_to_followers(db, job)
+    db.commit()
+    
+    video = db.query(Video).filter(Video.id == video_id).first()
+    return VideoResponse(**video.to_dict())
+
+def _after_cancel(video_id: str, promoted: Optional[str]):
+    """
+    Stop a cancelled job's worker and enqueue its promoted follower
+
+    The in-process worker cancels the task at once; a worker in another
+    process loses its lease and stops at its next heartbeat. Either way the
+    task cancels the upstream Sora job and frees its slot.
+    """
+    cancel_local_job(video_id)
+    if promoted:
+        notify_new_jobs()
+
+@router.post("/videos/{video_id}/cancel", response_model=VideoResponse)
+async def cancel_video(video_id: str, db: Session = Depends(get_db)):
+    """Cancel a pending or running job and delete its partial files"""
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if not is_cancellable(video):
+        raise HTTPException(status_code=409, detail=f"Video is already {video.status}")
+    
+    owns_artifacts = video.coalesced_into is None
+    promoted = mark_cancelled(db, video)
+    db.commit()
+    _after_cancel(video_id, promoted)
+    
+    if owns_artifacts:
+        storage.delete_later(video_id)
+    
+    db.refresh(video)
+    return VideoResponse(**video.to_dict())
+
 @router.delete("/videos/{video_id}")
 async def delete_video(video_id: str, db: Session = Depends(get_db)):
-    """Delete a video"""
+    """Delete a video (an unfinished job is cancelled first)"""
     video = db.query(Video).filter(Video.id == video_id).first()
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
+    # Unfinished jobs are stopped; attached duplicates are handed to the oldest one
+    promoted = None
+    in_flight = is_cancellable(video)
+    if in_flight:
+        owns_artifacts = video.coalesced_into is None
+        promoted = mark_cancelled(db, video)
+    else:
+        # Followers point at their leader's files, and finished followers keep
+        # sharing them after the leader row is gone (the sweeper reclaims them later)
+        owns_artifacts = video.coalesced_into is None and (
+            db.query(Video.id).filter(Video.coalesced_into == video.id).first() is None
+        )
+    
     db.delete(video)
     db.commit()
     
+    if in_flight:
+        _after_cancel(video_id, promoted)
+    if owns_artifacts:
+        storage.delete_later(video_id)
+    
     return {"message": "Video deleted successfully"}
+
+@router.post("/webhooks/openai", tags=["webhooks"])
+async def openai_webhook(request: Request):
+    """
+    Receive OpenAI video job events (video.completed / video.failed)
+    
+    Deliveries are verified against SORA_WEBHOOK_SECRET and deduplicated by
+    webhook-id; the job waiting on the event's video id resumes right away.
+    """
+    if not webhooks.enabled:
+        raise HTTPException(status_code=404, detail="Webhooks are not enabled")
+    
+    body = await request.body()
+    try:
+        webhook_id = verify_signature(settings.SORA_WEBHOOK_SECRET, request.headers, body)
+        event = parse_event(body)
+    except WebhookVerificationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Retries of an already stored delivery are acknowledged without effect
+    if not webhooks.record(webhook_id, event):
+        return {"received": True, "duplicate": True}
+    return {"received": True}
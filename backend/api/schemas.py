@@ -11,6 +11,41 @@ class VideoCreateRequest(BaseModel):
     duration: Optional[int] = Field(default=8, description="Video duration in seconds (4, 8, or 12)")
     keywords: Optional[List[str]] = Field(default=[], description="Keywords to include")
     negative_keywords: Optional[List[str]] = Field(default=[], description="Keywords to avoid")
+    preview_mode: Optional[str] = Field(default=None, description="Quick draft before the full render: 'off', 'auto' or 'approval' (defaults to PREVIEW_MODE)")
+    reuse_from: Optional[str] = Field(default=None, description="Reuse the prompts and reference images of this completed video (e.g. an offered similar_to)")
+    storyboard: bool = Field(default=False, description="Render each scene as its own Sora clip and join them, for videos longer than one clip")
+    plan_id: Optional[str] = Field(default=None, description="Plan prepared by POST /api/plan for the same script, style and keywords")
+
+class PlanRequest(BaseModel):
+    script: str = Field(..., description="Script text for the video")
+    style: str = Field(..., description="Visual style (e.g., 'cinematic', 'anime')")
+    voice: Optional[str] = Field(default=None, description="Narration voice; required with with_audio")
+    keywords: Optional[List[str]] = Field(default=[], description="Keywords to include")
+    negative_keywords: Optional[List[str]] = Field(default=[], description="Keywords to avoid")
+    with_images: bool = Field(default=False, description="Also generate the reference images")
+    with_audio: bool = Field(default=False, description="Also generate the narration")
+
+class PlanResponse(BaseModel):
+    id: str  # Pass as plan_id when creating the video
+    status: str  # planning, ready or failed
+    prompts: Optional[List[str]] = None
+    best_prompt: Optional[str] = None
+    narration_text: Optional[str] = None
+    image_paths: Optional[List[str]] = None
+    audio_path: Optional[str] = None
+    error_message: Optional[str] = None
+    expires_at: Optional[str] = None
+
+class VideoBatchCreateRequest(BaseModel):
+    videos: List[VideoCreateRequest] = Field(..., min_length=1, description="Videos to create")
+
+class VideoBatchCreateResponse(BaseModel):
+    ids: List[str]
+    count: int
+
+class VideoRemixRequest(BaseModel):
+    prompt: str = Field(..., min_length=1, description="Change to apply to the source video")
+    title: Optional[str] = Field(default=None, description="Title of the remix (defaults to the source title)")
 
 class VideoResponse(BaseModel):
     id: str
@@ -24,12 +59,35 @@ class VideoResponse(BaseModel):
     image_paths: Optional[List[str]]
     audio_path: Optional[str]
     video_path: Optional[str]
+    preview_path: Optional[str] = None  # Quick draft, available before the full render
+    preview_mode: Optional[str] = None
+    hls_path: Optional[str] = None  # Adaptive bitrate HLS master playlist; prefer over video_path when playable
     duration: Optional[int]  # Duration in seconds
+    storyboard: bool = False
     status: str
     error_message: Optional[str]
+    coalesced_into: Optional[str] = None  # Set when attached to an identical in-flight job
+    remix_of: Optional[str] = None  # Source video when this is a remix
+    similar_to: Optional[str] = None  # Near-duplicate completed video offered for reuse
+    similarity: Optional[float] = None
+    reused_from: Optional[str] = None  # Video whose prompts and reference images were reused
+    eta_seconds: Optional[float] = None  # Estimated seconds until completion (unfinished jobs)
     created_at: Optional[str]
     updated_at: Optional[str]
 
+class VideoStatusResponse(BaseModel):
+    fields: List[str]  # Names of the values in each row
+    rows: List[list]  # One [id, status, progress, updated_at] row per video found, in request order
+
+class VideoSearchHit(BaseModel):
+    video: VideoResponse
+    score: float  # bm25, lower is a better match
+    snippet: str  # Matching excerpt with <mark> highlights
+
+class VideoSearchResponse(BaseModel):
+    results: List[VideoSearchHit]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
+
 class StyleResponse(BaseModel):
     id: str
     name: str
@@ -0,0 +1,206 @@
+"""
+API and database scaling benchmark for catalog growth
+
+Grows a throwaway SQLite ``videos`` table through the requested sizes,
+seeding synthetic rows, and at each size drives the FastAPI app in-process
+with concurrent clients while simulated background jobs write status
+updates. Reports latency percentiles per route and event-loop lag.
+
+Usage (from the backend directory):
+    python -m benchmarks.catalog_bench --sizes 1000,10000,100000,1000000 --clients 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.stats import LoopLagSampler, format_table, peak_rss_mb, summarize
+
+SCRIPT_TEXT = (
+    "Narration: The city wakes slowly. Steam rises from the grates as the first trains "
+    "rumble underground. A baker opens her shutters, and the smell of bread drifts into "
+    "the street. — Scene: wide shot of rooftops at dawn, warm light, long shadows. "
+) * 3
+
+PROMPTS = [f"Scene {i}: rooftops at dawn, warm light, long shadows, cinematic" for i in range(6)]
+
+
+def configure_environment(workdir: Path):
+    """Settings are read at import time, so this must run before importing app modules"""
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": "http://127.0.0.1:9/v1",  # Never contacted: jobs are not run
+        "DATABASE_URL": f"sqlite:///{workdir / 'catalog.db'}",
+        "VIDEOS_DIR": str(workdir / "videos"),
+        "IMAGES_DIR": str(workdir / "images"),
+        "AUDIO_DIR": str(workdir / "audio"),
+        "EMBEDDED_WORKER": "false",  # Only measure enqueueing, never run the pipeline
+    })
+
+
+def seed_rows(start: int, stop: int, batch_size: int = 10000) -> list:
+    """Bulk insert rows ``start``..``stop`` and return a sample of their ids"""
+    from models.database import Video, engine
+
+    statuses = ["completed"] * 8 + ["failed", "processing"]
+    base_time = datetime.utcnow() - timedelta(days=365)
+    sample = []
+    with engine.begin() as conn:
+        for offset in range(start, stop, batch_size):
+            rows = []
+            for index in range(offset, min(offset + batch_size, stop)):
+                created = base_time + timedelta(seconds=index * 10)
+                video_id = str(uuid.uuid4())
+                rows.append({
+                    "id": video_id,
+                    "title": f"Synthetic video {index}",
+                    "script": SCRIPT_TEXT,
+                    "style": "cinematic",
+                    "voice": "alloy",
+                    "keywords": [],
+                    "negative_keywords": [],
+                    "prompts": PROMPTS,
+                    "image_paths": [f"/images/{video_id}/image_{i:03d}.png" for i in range(6)],
+                    "audio_path": f"/audio/{video_id}/narration.mp3",
+                    "video_path": f"/videos/{video_id}.mp4",
+                    "duration": 8,
+                    "status": statuses[index % len(statuses)],
+                    "created_at": created,
+                    "updated_at": created,
+                })
+                if index % 97 == 0:
+                    sample.append(video_id)
+            conn.execute(Video.__table__.insert(), rows)
+    return sample
+
+
+async def background_writer(video_ids: list, interval: float, stop: asyncio.Event):
+    """Mimic workflow status writes: synchronous ORM commits on the event loop thread"""
+    from models.database import SessionLocal, Video
+
+    rng = random.Random(7)
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            video = db.query(Video).filter(Video.id == rng.choice(video_ids)).first()
+            if video:
+                video.status = rng.choice(["processing", "completed"])
+                db.commit()
+        finally:
+            db.close()
+        await asyncio.sleep(interval)
+
+
+async def client_loop(client: httpx.AsyncClient, video_ids: list, requests: int, include_list: bool,
+                      latencies: dict, rng: random.Random):
+    """One simulated client issuing a mix of reads and writes"""
+    for _ in range(requests):
+        roll = rng.random()
+        if include_list and roll < 0.05:
+            name, call = "list_videos", client.get("/api/videos")
+        elif roll < 0.80:
+            name, call = "get_video", client.get(f"/api/videos/{rng.choice(video_ids)}")
+        elif roll < 0.95:
+            name, call = "create_video", client.post("/api/videos/create", json={
+                "title": "Bench", "script": SCRIPT_TEXT, "style": "cinematic", "voice": "alloy",
+            })
+        else:
+            name = "delete_video"
+            response = await client.post("/api/videos/create", json={
+                "title": "Bench delete", "script": SCRIPT_TEXT, "style": "cinematic", "voice": "alloy",
+            })
+            call = client.delete(f"/api/videos/{response.json()['id']}")
+        started = time.perf_counter()
+        response = await call
+        latencies.setdefault(name, []).append(time.perf_counter() - started)
+        response.raise_for_status()
+
+
+async def measure(app, video_ids: list, clients: int, requests: int, include_list: bool,
+                  writers: int, write_interval: float) -> dict:
+    latencies = {}
+    lag = LoopLagSampler()
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        lag.start()
+        writer_tasks = [asyncio.create_task(background_writer(video_ids, write_interval, stop)) for _ in range(writers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client_loop(client, video_ids, requests, include_list, latencies, random.Random(seed))
+            for seed in range(clients)
+        ))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*writer_tasks)
+        loop_lag = await lag.stop()
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "requests": total,
+        "requests_per_second": total / elapsed if elapsed else 0.0,
+        "routes": {name: summarize(values) for name, values in sorted(latencies.items())},
+        "loop_lag": loop_lag,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API routes as the videos table grows")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="Comma-separated table sizes")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent API clients")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per client at each size")
+    parser.add_argument("--writers", type=int, default=4, help="Simulated background jobs writing status")
+    parser.add_argument("--write-interval", type=float, default=0.05)
+    parser.add_argument("--list-max-rows", type=int, default=100000,
+                        help="Skip list_videos above this size (it returns every row)")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    reports = {}
+    with tempfile.TemporaryDirectory(prefix="visionpulse-catalog-") as tmp:
+        configure_environment(Path(tmp))
+        from config.settings import settings
+        from main import app
+        from models.database import init_db
+        # The ASGI transport does not run the app lifespan, so do its startup work here
+        settings.ensure_directories()
+        init_db()
+
+        seeded, sample = 0, []
+        for size in sizes:
+            started = time.perf_counter()
+            sample += seed_rows(seeded, size)
+            seeded = size
+            print(f"\n=== {size:,} rows (seeded in {time.perf_counter() - started:.1f}s) ===")
+
+            include_list = size <= args.list_max_rows
+            result = asyncio.run(measure(
+                app, sample, args.clients, args.requests, include_list, args.writers, args.write_interval
+            ))
+            result["list_videos_skipped"] = not include_list
+            reports[size] = result
+
+            print(f"{result['requests']} requests, {result['requests_per_second']:.0f} req/s"
+                  + ("" if include_list else "  (list_videos skipped)"))
+            print(format_table({**result["routes"], "event_loop_lag": result["loop_lag"]}))
+
+    print(f"\nPeak RSS: {peak_rss_mb():.1f} MiB")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"peak_rss_mb": peak_rss_mb(), "sizes": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
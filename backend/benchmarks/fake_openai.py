@@ -0,0 +1,391 @@
+"""
+Local stand-in for the OpenAI endpoints used by the video pipeline
+
+Serves chat completions, image generation, text-to-speech and the
+``/v1/videos`` job API with configurable latency distributions, failure
+rates and payload sizes, so the whole workflow can be exercised without
+spending money. With ``webhook_url`` set it also acts as the webhook
+sender, posting signed ``video.completed`` / ``video.failed`` events
+(optionally duplicated, to exercise dedup) when render jobs finish.
+
+Run standalone:
+    python -m benchmarks.fake_openai --port 8765 --profile realistic
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import math
+import random
+import re
+import struct
+import time
+import uuid
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+
+
+@dataclass
+class LatencyProfile:
+    """Latency distribution in seconds: constant, uniform or lognormal"""
+    distribution: str = "constant"
+    mean: float = 0.0
+    spread: float = 0.0  # uniform: +/- spread, lognormal: sigma
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(self.mean - self.spread, self.mean + self.spread))
+        if self.distribution == "lognormal" and self.mean > 0:
+            # Parameterised so the distribution's median equals ``mean``
+            return rng.lognormvariate(math.log(self.mean), self.spread)
+        return max(0.0, self.mean)
+
+
+@dataclass
+class EndpointProfile:
+    """Behaviour of a single endpoint"""
+    latency: LatencyProfile = field(default_factory=LatencyProfile)
+    failure_rate: float = 0.0  # Fraction of requests answered with HTTP 500
+    payload_bytes: int = 0  # Size of binary payloads (images, audio, video)
+
+
+@dataclass
+class FakeServerConfig:
+    """Full configuration of the fake server"""
+    chat: EndpointProfile = field(default_factory=EndpointProfile)
+    images: EndpointProfile = field(default_factory=lambda: EndpointProfile(payload_bytes=256 * 1024))
+    speech: EndpointProfile = field(default_factory=lambda: EndpointProfile(payload_bytes=128 * 1024))
+    videos: EndpointProfile = field(default_factory=lambda: EndpointProfile(payload_bytes=4 * 1024 * 1024))
+    video_render: LatencyProfile = field(default_factory=lambda: LatencyProfile(mean=2.0))
+    video_failure_rate: float = 0.0  # Fraction of video jobs that end in status "failed"
+    webhook_url: str = ""  # Post signed job events here when set
+    webhook_secret: str = ""
+    webhook_duplicate_rate: float = 0.0  # Fraction of events delivered twice
+    seed: int = 1234
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FakeServerConfig":
+        def endpoint(value: Optional[Dict]) -> EndpointProfile:
+            value = dict(value or {})
+            value["latency"] = LatencyProfile(**value.get("latency", {}))
+            return EndpointProfile(**value)
+
+        config = cls()
+        for name in ("chat", "images", "speech", "videos"):
+            if name in data:
+                setattr(config, name, endpoint(data[name]))
+        if "video_render" in data:
+            config.video_render = LatencyProfile(**data["video_render"])
+        config.video_failure_rate = data.get("video_failure_rate", config.video_failure_rate)
+        for name in ("webhook_url", "webhook_secret", "webhook_duplicate_rate"):
+            setattr(config, name, data.get(name, getattr(config, name)))
+        config.seed = data.get("seed", config.seed)
+        return config
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+PROFILES = {
+    # Near-zero latency: measures our own overhead
+    "fast": FakeServerConfig(
+        chat=EndpointProfile(latency=LatencyProfile(mean=0.01)),
+        images=EndpointProfile(latency=LatencyProfile(mean=0.02), payload_bytes=64 * 1024),
+        speech=EndpointProfile(latency=LatencyProfile(mean=0.02), payload_bytes=32 * 1024),
+        videos=EndpointProfile(latency=LatencyProfile(mean=0.01), payload_bytes=512 * 1024),
+        video_render=LatencyProfile(mean=0.5),
+    ),
+    # Rough shape of production latencies, scaled down ~10x
+    "realistic": FakeServerConfig(
+        chat=EndpointProfile(latency=LatencyProfile("lognormal", 0.8, 0.4)),
+        images=EndpointProfile(latency=LatencyProfile("lognormal", 1.5, 0.3), payload_bytes=1536 * 1024),
+        speech=EndpointProfile(latency=LatencyProfile("lognormal", 0.6, 0.3), payload_bytes=256 * 1024),
+        videos=EndpointProfile(latency=LatencyProfile("uniform", 0.1, 0.05), payload_bytes=8 * 1024 * 1024),
+        video_render=LatencyProfile("lognormal", 12.0, 0.3),
+    ),
+    # Realistic latencies plus transient upstream errors
+    "flaky": FakeServerConfig(
+        chat=EndpointProfile(latency=LatencyProfile("lognormal", 0.8, 0.4), failure_rate=0.05),
+        images=EndpointProfile(latency=LatencyProfile("lognormal", 1.5, 0.3), failure_rate=0.05, payload_bytes=1536 * 1024),
+        speech=EndpointProfile(latency=LatencyProfile("lognormal", 0.6, 0.3), failure_rate=0.05, payload_bytes=256 * 1024),
+        videos=EndpointProfile(latency=LatencyProfile("uniform", 0.1, 0.05), failure_rate=0.02, payload_bytes=8 * 1024 * 1024),
+        video_render=LatencyProfile("lognormal", 12.0, 0.3),
+        video_failure_rate=0.05,
+    ),
+}
+
+
+def load_config(profile: str) -> FakeServerConfig:
+    """Resolve a preset name or a path to a JSON config file"""
+    if profile in PROFILES:
+        return PROFILES[profile]
+    with open(profile) as f:
+        return FakeServerConfig.from_dict(json.load(f))
+
+
+def _sign(secret: str, webhook_id: str, timestamp: int, body: bytes) -> str:
+    """Standard Webhooks signature, implemented independently of the app's verifier"""
+    key = base64.b64decode(secret[len("whsec_"):]) if secret.startswith("whsec_") else secret.encode("utf-8")
+    digest = hmac.new(key, f"{webhook_id}.{timestamp}.".encode("utf-8") + body, hashlib.sha256).digest()
+    return "v1," + base64.b64encode(digest).decode("ascii")
+
+
+def _png_bytes(width: int, height: int, pad_to: int = 0) -> bytes:
+    """Build a valid solid-colour PNG, padded with a tEXt chunk up to ``pad_to`` bytes"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    raw = b"".join(b"\x00" + b"\x50\x50\x80" * width for _ in range(height))
+    png = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 9))
+    padding = pad_to - len(png) - 12 * 2 - 8
+    if padding > 0:
+        png += chunk(b"tEXt", b"Comment\x00" + b"x" * padding)
+    return png + chunk(b"IEND", b"")
+
+
+def _mp3_bytes(size: int) -> bytes:
+    """Silent MPEG-1 Layer III frames (128 kbps, 44.1 kHz, mono) totalling ~``size`` bytes"""
+    frame = b"\xff\xfb\x90\xc0" + b"\x00" * 413
+    return frame * max(1, size // len(frame))
+
+
+class FakeOpenAI:
+    """In-memory state of the fake server"""
+
+    def __init__(self, config: FakeServerConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.jobs: Dict[str, Dict] = {}
+        self._senders = set()
+        self.status_polls = 0
+        self.cancelled = 0
+        self.plan_calls: Dict[str, int] = {}  # Planning requests by structured-output schema
+        self.image = _png_bytes(1024, 1024, config.images.payload_bytes)
+        self.audio = _mp3_bytes(config.speech.payload_bytes)
+        self.video = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * max(0, config.videos.payload_bytes - 12)
+
+    async def behave(self, endpoint: EndpointProfile):
+        """Apply latency and injected failures for one request"""
+        await asyncio.sleep(endpoint.latency.sample(self.rng))
+        if self.rng.random() < endpoint.failure_rate:
+            raise HTTPException(status_code=500, detail="Injected upstream failure")
+
+    def chat_reply(self, body: Dict) -> str:
+        """Produce a reply matching the structured-output schema the workflow requested"""
+        text = body["messages"][-1]["content"]
+        if isinstance(text, list):
+            text = " ".join(part.get("text", "") for part in text)
+        schema_name = (body.get("response_format") or {}).get("json_schema", {}).get("name")
+        if schema_name:
+            self.plan_calls[schema_name] = self.plan_calls.get(schema_name, 0) + 1
+
+        def plan(number: int) -> Dict:
+            return {
+                "prompts": [f"Fake scene {i + 1} of script {number}, wide shot, soft light" for i in range(6)],
+                "best_prompt_number": 1,
+                "narration": "",
+            }
+
+        if schema_name == "BatchVideoPlan":
+            count = len(re.findall(r"^### Script \d+", text, flags=re.MULTILINE))
+            return json.dumps({"plans": [dict(plan(n), script_number=n) for n in range(1, count + 1)]})
+        if schema_name == "VideoPlan":
+            return json.dumps(plan(1))
+        return "This is a fake reply for benchmarking the pipeline."
+
+    def new_job(self, model: str, size: str, seconds: str, **extra) -> Dict:
+        now = time.monotonic()
+        job = {
+            "id": f"video_{uuid.uuid4().hex}",
+            "object": "video",
+            "model": model,
+            "size": size,
+            "seconds": seconds,
+            "status": "queued",
+            "progress": 0,
+            "created_at": int(time.time()),
+            **extra,
+            "_created": now,
+            "_ready_at": now + self.config.video_render.sample(self.rng),
+            "_fails": self.rng.random() < self.config.video_failure_rate,
+        }
+        self.jobs[job["id"]] = job
+        if self.config.webhook_url:
+            task = asyncio.create_task(self.send_webhook(job))
+            self._senders.add(task)
+            task.add_done_callback(self._senders.discard)
+        return job
+
+    async def send_webhook(self, job: Dict):
+        """Post the job's terminal event once it finishes rendering"""
+        await asyncio.sleep(max(0.0, job["_ready_at"] - time.monotonic()))
+        if job["id"] not in self.jobs:
+            return  # Deleted before it finished
+        event = {
+            "id": f"evt_{uuid.uuid4().hex}",
+            "object": "event",
+            "created_at": int(time.time()),
+            "type": "video.failed" if job["_fails"] else "video.completed",
+            "data": {"id": job["id"]},
+        }
+        body = json.dumps(event).encode("utf-8")
+        webhook_id = f"msg_{uuid.uuid4().hex}"
+        deliveries = 2 if self.rng.random() < self.config.webhook_duplicate_rate else 1
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            for _ in range(deliveries):
+                timestamp = int(time.time())
+                headers = {
+                    "content-type": "application/json",
+                    "webhook-id": webhook_id,
+                    "webhook-timestamp": str(timestamp),
+                    "webhook-signature": _sign(self.config.webhook_secret, webhook_id, timestamp, body),
+                }
+                try:
+                    await client.post(self.config.webhook_url, content=body, headers=headers)
+                except httpx.HTTPError as e:
+                    print(f"Webhook delivery for {job['id']} failed: {str(e)}")
+
+    def job_view(self, job: Dict) -> Dict:
+        now = time.monotonic()
+        view = {key: value for key, value in job.items() if not key.startswith("_")}
+        if now >= job["_ready_at"]:
+            if job["_fails"]:
+                view.update(status="failed", progress=100, error={"message": "Injected render failure"})
+            else:
+                view.update(status="completed", progress=100)
+        else:
+            elapsed = now - job["_created"]
+            total = max(job["_ready_at"] - job["_created"], 1e-6)
+            view.update(status="in_progress", progress=int(100 * elapsed / total))
+        return view
+
+
+def create_app(config: FakeServerConfig) -> FastAPI:
+    """Build the fake OpenAI ASGI app"""
+    app = FastAPI(title="Fake OpenAI")
+    fake = FakeOpenAI(config)
+    app.state.fake = fake
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "video_jobs": len(fake.jobs),
+            "status_polls": fake.status_polls,
+            "cancelled": fake.cancelled,
+            "plan_calls": fake.plan_calls,
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await fake.behave(config.chat)
+        content = fake.chat_reply(body)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+        }
+
+    @app.post("/v1/images/generations")
+    async def images_generations(request: Request):
+        await fake.behave(config.images)
+        url = str(request.base_url).rstrip("/") + f"/files/images/{uuid.uuid4().hex}.png"
+        return {"created": int(time.time()), "data": [{"url": url}]}
+
+    @app.get("/files/images/{name}")
+    async def image_file(name: str):
+        return Response(fake.image, media_type="image/png")
+
+    @app.post("/v1/audio/speech")
+    async def audio_speech(request: Request):
+        await request.body()
+        await fake.behave(config.speech)
+        return Response(fake.audio, media_type="audio/mpeg")
+
+    @app.post("/v1/videos")
+    async def create_video(request: Request):
+        if request.headers.get("content-type", "").startswith("multipart/"):
+            form = await request.form()
+            body = {key: value for key, value in form.items() if isinstance(value, str)}
+        else:
+            body = await request.json()
+        await fake.behave(config.videos)
+        job = fake.new_job(body.get("model", "sora-2"), body.get("size", "1280x720"), str(body.get("seconds", "8")))
+        return fake.job_view(job)
+
+    @app.post("/v1/videos/{job_id}/remix")
+    async def remix_video(job_id: str, request: Request):
+        source = fake.jobs.get(job_id)
+        if not source:
+            return JSONResponse(status_code=404, content={"error": {"message": "Not found"}})
+        await request.json()
+        await fake.behave(config.videos)
+        job = fake.new_job(source["model"], source["size"], source["seconds"], remixed_from_video_id=job_id)
+        return fake.job_view(job)
+
+    @app.get("/v1/videos/{job_id}")
+    async def retrieve_video(job_id: str):
+        job = fake.jobs.get(job_id)
+        if not job:
+            return JSONResponse(status_code=404, content={"error": {"message": "Not found"}})
+        fake.status_polls += 1
+        await fake.behave(EndpointProfile(latency=config.videos.latency, failure_rate=config.videos.failure_rate))
+        return fake.job_view(job)
+
+    @app.delete("/v1/videos/{job_id}")
+    async def delete_video(job_id: str):
+        job = fake.jobs.pop(job_id, None)
+        if not job:
+            return JSONResponse(status_code=404, content={"error": {"message": "Not found"}})
+        fake.cancelled += 1
+        return {"id": job_id, "object": "video.deleted", "deleted": True}
+
+    @app.get("/v1/videos/{job_id}/content")
+    async def video_content(job_id: str):
+        if job_id not in fake.jobs:
+            return JSONResponse(status_code=404, content={"error": {"message": "Not found"}})
+        await fake.behave(config.videos)
+        return Response(fake.video, media_type="video/mp4")
+
+    return app
+
+
+def serve(config: FakeServerConfig, host: str = "127.0.0.1", port: int = 8765):
+    """Run the fake server until interrupted (blocking)"""
+    import uvicorn
+    uvicorn.run(create_app(config), host=host, port=port, log_level="warning")
+
+
+def serve_from_dict(config: Dict, host: str, port: int):
+    """Process entry point: configs cross the process boundary as plain dicts"""
+    serve(FakeServerConfig.from_dict(config), host, port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", default="realistic", help=f"Preset ({', '.join(PROFILES)}) or JSON file")
+    args = parser.parse_args()
+    serve(load_config(args.profile), args.host, args.port)
@@ -0,0 +1,94 @@
+"""
+Import-time budget check for the API entry point
+
+Imports ``main`` in a fresh interpreter under ``python -X importtime`` and
+fails (exit code 1) when:
+  - the cumulative import time exceeds the budget,
+  - a heavy module that should only load on first job (LangChain, the
+    OpenAI SDK, Pillow, NumPy) is imported, or
+  - the import has side effects (creates output directories or the database).
+
+Usage (from the backend directory, e.g. in CI):
+    python -m benchmarks.import_budget --budget-ms 1500
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+DEFERRED_MODULES = ("langchain", "langchain_core", "langchain_openai", "openai", "PIL", "numpy")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str, workdir: Path) -> tuple:
+    """Return (cumulative microseconds of ``module``, set of imported module names)"""
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{workdir / 'import.db'}",
+        "VIDEOS_DIR": str(workdir / "videos"),
+        "IMAGES_DIR": str(workdir / "images"),
+        "AUDIO_DIR": str(workdir / "audio"),
+    })
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr}")
+
+    cumulative_us = 0
+    imported = set()
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name)
+        if name == module and len(match.group(3)) == 1:
+            cumulative_us = int(match.group(2))
+    return cumulative_us, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when importing the API regresses")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=3, help="Best of N runs to smooth out noise")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="visionpulse-import-") as tmp:
+        workdir = Path(tmp)
+        timings = []
+        imported = set()
+        for _ in range(args.runs):
+            cumulative_us, imported = measure(args.module, workdir)
+            timings.append(cumulative_us / 1000)
+        best_ms = min(timings)
+
+        leftovers = sorted(p.name for p in workdir.iterdir())
+        if leftovers:
+            failures.append(f"import has side effects, created: {', '.join(leftovers)}")
+
+    print(f"import {args.module}: {best_ms:.0f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    if best_ms > args.budget_ms:
+        failures.append(f"import took {best_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+
+    eager = sorted(name for name in DEFERRED_MODULES if name in imported)
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
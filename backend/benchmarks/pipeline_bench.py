@@ -0,0 +1,446 @@
+"""
+End-to-end pipeline benchmark
+
+Starts the fake OpenAI server in a separate process, points the services at
+it through ``OPENAI_BASE_URL``, runs N jobs through
+``process_video_generation`` with bounded concurrency and reports jobs/hour,
+p50/p95 per workflow stage and peak RSS.
+
+With ``--webhooks`` the API app is served in-process as the webhook
+receiver, the fake server posts signed completion events to it (some
+delivered twice) and Sora status polling drops to the safety-net interval;
+the report includes how many status polls reached the fake server.
+
+Event loop lag is sampled throughout the run (set LOOP_DEBUG=true to also
+log the stack of anything blocking the loop); ``--max-loop-lag-ms`` turns
+it into a pass/fail gate for changes that block the loop.
+
+With ``--batch`` the jobs are seeded as one batch (spread over ``--styles``)
+and run by a ``Worker``, the way POST /api/videos/batch submissions are.
+The run fails unless planning took exactly one batched LLM call per style
+and BATCH_PLAN_CHUNK_SIZE chunk (a leftover chunk of one script is planned
+with a per-job call) and no other planning calls.
+
+With ``--stop-mid-render`` a Worker is stopped as soon as its renders are
+submitted, the way a deploy stops it. The run fails if stopping deleted any
+Sora job upstream or left a job anywhere but back in the queue.
+
+With ``--followers`` a leader with an attached duplicate is claimed and
+handed back through the queue first; the run fails unless the duplicate's
+status followed the leader's both times.
+
+Usage (from the backend directory):
+    python -m benchmarks.pipeline_bench --jobs 50 --concurrency 10 --profile realistic
+    python -m benchmarks.pipeline_bench --jobs 50 --webhooks
+    python -m benchmarks.pipeline_bench --jobs 20 --max-loop-lag-ms 200
+    python -m benchmarks.pipeline_bench --jobs 30 --batch --styles cinematic,anime
+    python -m benchmarks.pipeline_bench --jobs 5 --stop-mid-render --profile realistic
+    python -m benchmarks.pipeline_bench --jobs 20 --followers
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_openai import PROFILES, FakeServerConfig, load_config, serve_from_dict
+from benchmarks.stats import format_table, peak_rss_mb, summarize
+
+
+def configure_environment(workdir: Path, port: int, poll_interval: float, webhook_secret: str = ""):
+    """Settings are read at import time, so this must run before importing app modules"""
+    if webhook_secret:
+        os.environ.update({
+            "SORA_WEBHOOK_SECRET": webhook_secret,
+            # Long enough that finishing quickly proves the webhooks did the work
+            "SORA_WEBHOOK_POLL_INTERVAL": "30",
+            "WEBHOOK_EVENT_CHECK_INTERVAL": "5",
+        })
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+        "DATABASE_URL": f"sqlite:///{workdir / 'bench.db'}",
+        "VIDEOS_DIR": str(workdir / "videos"),
+        "IMAGES_DIR": str(workdir / "images"),
+        "AUDIO_DIR": str(workdir / "audio"),
+        "SORA_POLL_INTERVAL": str(poll_interval),
+        "EMBEDDED_WORKER": "false",
+    })
+
+
+def start_fake_server(config, port: int) -> multiprocessing.Process:
+    """Run the fake server in its own process so it does not share our event loop"""
+    ctx = multiprocessing.get_context("spawn")
+    process = ctx.Process(target=serve_from_dict, args=(config.to_dict(), "127.0.0.1", port), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=0.5).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Fake OpenAI server did not start")
+
+
+def seed_jobs(count: int, styles: list, voice: str, size: str, duration: int, batch_id: str = None) -> list:
+    """Insert pending Video rows the way create_video (or create_video_batch) does"""
+    from models.database import SessionLocal, Video
+
+    db = SessionLocal()
+    try:
+        ids = []
+        for index in range(count):
+            video = Video(
+                id=str(uuid.uuid4()),
+                title=f"Benchmark {index}",
+                script=f"Narration: A short benchmark script number {index} about the sea at dawn.",
+                style=styles[index % len(styles)],
+                voice=voice,
+                keywords=[],
+                negative_keywords=[],
+                size=size,
+                duration=duration,
+                batch_id=batch_id,
+                status="pending",
+            )
+            db.add(video)
+            ids.append(video.id)
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+
+async def start_receiver(port: int):
+    """Serve the API app (and its webhook endpoint) in this event loop"""
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def run_jobs(ids: list, concurrency: int, receiver_port: int = 0) -> list:
+    from jobs.runner import process_video_generation
+    from services.loop_monitor import loop_monitor
+
+    loop_monitor.start()
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    receiver = await start_receiver(receiver_port) if receiver_port else None
+
+    async def run_one(video_id: str):
+        async with semaphore:
+            started = time.perf_counter()
+            state = await process_video_generation(video_id)
+            results.append({
+                "ok": bool(state) and not state.get("error"),
+                "total": time.perf_counter() - started,
+                "stages": dict(state.get("stage_durations", {})) if state else {},
+            })
+
+    try:
+        await asyncio.gather(*(run_one(video_id) for video_id in ids))
+    finally:
+        if receiver:
+            server, task = receiver
+            server.should_exit = True
+            await task
+        await loop_monitor.stop()
+    return results
+
+
+def _finished_rows(ids: list):
+    """Outcome of every job once all of them are done, else None (blocking)"""
+    from models.database import SessionLocal, Video
+
+    db = SessionLocal()
+    try:
+        rows = db.query(Video.status, Video.created_at, Video.updated_at).filter(Video.id.in_(ids)).all()
+        if any(row.status not in ("completed", "failed") for row in rows):
+            return None
+        return rows
+    finally:
+        db.close()
+
+
+async def run_worker(ids: list, concurrency: int) -> list:
+    """Run the jobs through a Worker, which claims them from the queue"""
+    from jobs.worker import Worker
+    from services.loop_monitor import loop_monitor
+
+    loop_monitor.start()
+    worker = Worker(concurrency=concurrency, poll_interval=0.1)
+    worker.start()
+    try:
+        while True:
+            await asyncio.sleep(0.2)
+            rows = await asyncio.to_thread(_finished_rows, ids)
+            if rows is not None:
+                break
+    finally:
+        await worker.stop()
+        await loop_monitor.stop()
+    # Stage timings stay inside the worker; only outcomes and totals are reported
+    return [
+        {"ok": row.status == "completed", "total": (row.updated_at - row.created_at).total_seconds(), "stages": {}}
+        for row in rows
+    ]
+
+
+def _statuses(ids: list) -> dict:
+    """Number of jobs per status (blocking)"""
+    from models.database import SessionLocal, Video
+
+    db = SessionLocal()
+    try:
+        counts = {}
+        for (status,) in db.query(Video.status).filter(Video.id.in_(ids)):
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+    finally:
+        db.close()
+
+
+def check_follower_status(style: str, voice: str, size: str, duration: int) -> list:
+    """
+    Attach a follower to a pending leader, claim the leader and hand it back
+
+    Returns the problems found; the rows are deleted afterwards (blocking)
+    """
+    from jobs.queue import claim_next_job, new_owner_id, release_lease
+    from models.database import SessionLocal, Video
+
+    leader_id, follower_id = seed_jobs(2, [style], voice, size, duration)
+    owner = new_owner_id()
+    problems = []
+    db = SessionLocal()
+    try:
+        # Attached the way create_video does it: the follower copies the leader's status
+        db.query(Video).filter(Video.id == follower_id).update({Video.coalesced_into: leader_id})
+        db.commit()
+        if claim_next_job(db, owner) != leader_id:
+            return ["the leader was not the job claimed"]
+        follower_status = lambda: db.query(Video.status).filter(Video.id == follower_id).scalar()
+        if follower_status() != "processing":
+            problems.append(f"follower is {follower_status()} after its leader was claimed")
+        release_lease(db, leader_id, owner, status="pending")
+        if follower_status() != "pending":
+            problems.append(f"follower is {follower_status()} after its leader was handed back")
+        return problems
+    finally:
+        db.query(Video).filter(Video.id.in_([leader_id, follower_id])).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+async def run_stop_mid_render(ids: list, concurrency: int, port: int) -> dict:
+    """Stop a Worker once it has submitted renders; report what stopping left behind"""
+    from jobs.worker import Worker
+
+    stats_url = f"http://127.0.0.1:{port}/stats"
+    worker = Worker(concurrency=concurrency, poll_interval=0.1)
+    worker.start()
+    async with httpx.AsyncClient() as client:
+        try:
+            deadline = time.monotonic() + 60
+            while (await client.get(stats_url)).json()["video_jobs"] == 0:
+                if time.monotonic() >= deadline:
+                    raise RuntimeError("No render was submitted within 60 seconds")
+                await asyncio.sleep(0.05)
+        finally:
+            await worker.stop()
+        stats = (await client.get(stats_url)).json()
+    return {
+        "renders_submitted": stats["video_jobs"] + stats["cancelled"],
+        "renders_deleted": stats["cancelled"],
+        "statuses": await asyncio.to_thread(_statuses, ids),
+    }
+
+
+def expected_plan_calls(count: int, styles: list, chunk_size: int) -> tuple:
+    """
+    (batched, per-job) planning calls for a batch: one call per style and
+    chunk of that style's scripts; a chunk of a single script is planned alone
+    """
+    chunk_size = max(1, chunk_size)
+    batched = single = 0
+    for index in range(len(styles)):
+        scripts = len(range(index, count, len(styles)))
+        if chunk_size == 1:
+            single += scripts
+            continue
+        alone = 1 if scripts % chunk_size == 1 else 0
+        batched += math.ceil(scripts / chunk_size) - alone
+        single += alone
+    return batched, single
+
+
+def report(results: list, wall_time: float) -> dict:
+    completed = [r for r in results if r["ok"]]
+    stage_names = sorted({name for r in results for name in r["stages"]})
+    stages = {name: summarize(r["stages"][name] for r in results if name in r["stages"]) for name in stage_names}
+    stages["total"] = summarize(r["total"] for r in results)
+    return {
+        "jobs": len(results),
+        "completed": len(completed),
+        "failed": len(results) - len(completed),
+        "wall_seconds": wall_time,
+        "jobs_per_hour": len(completed) / wall_time * 3600 if wall_time else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VideoGenerationWorkflow against a fake OpenAI server")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--profile", default="fast", help=f"Preset ({', '.join(PROFILES)}) or JSON file")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--duration", type=int, default=8)
+    parser.add_argument("--style", default="cinematic")
+    parser.add_argument("--styles", help="Comma-separated styles to spread the jobs over (overrides --style)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit the jobs as one batch, run them with a Worker and check batched planning")
+    parser.add_argument("--stop-mid-render", action="store_true",
+                        help="Stop a Worker while it renders and check that no Sora job is deleted")
+    parser.add_argument("--followers", action="store_true",
+                        help="First check that an attached duplicate follows its leader's status through the queue")
+    parser.add_argument("--voice", default="alloy")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="SORA_POLL_INTERVAL used during the run")
+    parser.add_argument("--webhooks", action="store_true", help="Complete Sora jobs through signed webhooks")
+    parser.add_argument("--receiver-port", type=int, default=8766, help="Port of the in-process webhook receiver")
+    parser.add_argument("--max-loop-lag-ms", type=float, default=0,
+                        help="Exit non-zero if the worst event loop lag exceeds this (0: report only)")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    config = load_config(args.profile)
+    webhook_secret = ""
+    if args.webhooks:
+        webhook_secret = "whsec_" + base64.b64encode(os.urandom(24)).decode("ascii")
+        config = FakeServerConfig.from_dict(dict(
+            config.to_dict(),
+            webhook_url=f"http://127.0.0.1:{args.receiver_port}/api/webhooks/openai",
+            webhook_secret=webhook_secret,
+            webhook_duplicate_rate=0.2,
+        ))
+    with tempfile.TemporaryDirectory(prefix="visionpulse-bench-") as tmp:
+        configure_environment(Path(tmp), args.port, args.poll_interval, webhook_secret)
+        server = start_fake_server(config, args.port)
+        try:
+            from config.settings import settings
+            from models.database import init_db
+            settings.ensure_directories()
+            init_db()
+            if args.followers:
+                problems = check_follower_status(args.style, args.voice, args.size, args.duration)
+                for problem in problems:
+                    print(f"FAIL: {problem}")
+                if problems:
+                    sys.exit(1)
+                print("Follower status check passed")
+            styles = args.styles.split(",") if args.styles else [args.style]
+            batch_id = str(uuid.uuid4()) if args.batch else None
+            ids = seed_jobs(args.jobs, styles, args.voice, args.size, args.duration, batch_id)
+
+            if args.stop_mid_render:
+                print(f"Stopping a worker mid-render ({args.jobs} jobs, profile={args.profile})...")
+                outcome = asyncio.run(run_stop_mid_render(ids, args.concurrency, args.port))
+                print(f"Renders submitted: {outcome['renders_submitted']}  deleted: {outcome['renders_deleted']}  "
+                      f"jobs: {outcome['statuses']}")
+                failed = False
+                if outcome["renders_deleted"]:
+                    print(f"FAIL: stopping the worker deleted {outcome['renders_deleted']} Sora jobs")
+                    failed = True
+                if set(outcome["statuses"]) - {"pending", "completed"}:
+                    print("FAIL: stopping the worker left jobs outside the queue")
+                    failed = True
+                if failed:
+                    sys.exit(1)
+                return
+
+            print(f"Running {args.jobs} jobs (concurrency={args.concurrency}, profile={args.profile}"
+                  f"{', batch' if args.batch else ''})...")
+            started = time.perf_counter()
+            if args.batch:
+                results = asyncio.run(run_worker(ids, args.concurrency))
+            else:
+                results = asyncio.run(run_jobs(ids, args.concurrency, args.receiver_port if args.webhooks else 0))
+            summary = report(results, time.perf_counter() - started)
+            from services.loop_monitor import loop_monitor
+            loop = loop_monitor.snapshot()
+            summary["event_loop"] = {
+                "lag_p99_ms": (loop["quantiles"][0.99] or 0.0) * 1000,
+                "lag_max_ms": loop["lag_max"] * 1000,
+                "slow_ticks": loop["slow_ticks"],
+                "blocked": loop["blocked"],
+            }
+            stats = httpx.get(f"http://127.0.0.1:{args.port}/stats").json()
+            summary["status_polls"] = stats["status_polls"]
+            summary["plan_calls"] = stats["plan_calls"]
+            if args.batch:
+                summary["expected_plan_calls"] = expected_plan_calls(
+                    args.jobs, styles, settings.BATCH_PLAN_CHUNK_SIZE
+                )
+        finally:
+            server.terminate()
+            server.join(timeout=5)
+
+    print()
+    print(f"Jobs: {summary['jobs']}  completed: {summary['completed']}  failed: {summary['failed']}")
+    print(f"Wall time: {summary['wall_seconds']:.1f}s  throughput: {summary['jobs_per_hour']:.0f} jobs/hour")
+    print(f"Peak RSS: {summary['peak_rss_mb']:.1f} MiB")
+    print(f"Sora status polls: {summary['status_polls']}")
+    print(f"Planning calls: {summary['plan_calls']}")
+    loop = summary["event_loop"]
+    print(f"Event loop lag: p99 {loop['lag_p99_ms']:.1f} ms  max {loop['lag_max_ms']:.1f} ms  "
+          f"slow ticks {loop['slow_ticks']}  blocked {loop['blocked']}")
+    print()
+    print(format_table(summary["stages"]))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    failed = False
+    if args.max_loop_lag_ms and loop["lag_max_ms"] > args.max_loop_lag_ms:
+        print(f"FAIL: event loop lag {loop['lag_max_ms']:.1f} ms exceeds {args.max_loop_lag_ms:.1f} ms")
+        failed = True
+    if args.batch:
+        expected = tuple(summary["expected_plan_calls"])
+        actual = (summary["plan_calls"].get("BatchVideoPlan", 0), summary["plan_calls"].get("VideoPlan", 0))
+        if config.chat.failure_rate > 0:
+            # Retried and fallback calls make the count meaningless
+            print("Planning call check skipped: the profile injects chat failures")
+        elif actual != expected:
+            print(f"FAIL: expected {expected[0]} batched and {expected[1]} per-job planning calls, "
+                  f"got {actual[0]} batched and {actual[1]} per-job")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Small statistics helpers shared by the benchmark scripts
+"""
+
+import asyncio
+import resource
+import sys
+from typing import Dict, Iterable, List
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of ``values`` (q in 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * (q / 100.0)
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: Iterable[float]) -> Dict[str, float]:
+    """Count, mean and the percentiles we report for every measurement"""
+    values = list(values)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def format_table(rows: Dict[str, Dict[str, float]], unit: str = "s") -> str:
+    """Render ``{name: summarize(...)}`` as a fixed-width text table"""
+    lines = [f"{'name':<24}{'count':>8}{'mean':>12}{'p50':>12}{'p95':>12}{'p99':>12}{'max':>12}"]
+    for name, stats in rows.items():
+        lines.append(
+            f"{name:<24}{stats['count']:>8}"
+            + "".join(f"{stats[key]:>11.3f}{unit}" for key in ("mean", "p50", "p95", "p99", "max"))
+        )
+    return "\n".join(lines)
+
+
+class LoopLagSampler:
+    """Measures event-loop lag as the overshoot of a short periodic sleep"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Dict[str, float]:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        return summarize(self.samples)
@@ -11,7 +11,11 @@ class Settings(BaseSettings):
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o")
     OPENAI_IMAGE_MODEL: str = os.getenv("OPENAI_IMAGE_MODEL", "dall-e-3")
     OPENAI_TTS_MODEL: str = os.getenv("OPENAI_TTS_MODEL", "tts-1")
+    TTS_CHUNK_CHARS: int = int(os.getenv("TTS_CHUNK_CHARS", "1000"))  # Max characters per TTS request (API limit is 4096)
+    TTS_CONCURRENCY: int = int(os.getenv("TTS_CONCURRENCY", "4"))  # TTS requests in flight per process
+    TTS_CACHE_MAX_AGE: int = int(os.getenv("TTS_CACHE_MAX_AGE", str(7 * 86400)))  # Unused cached chunks are pruned after this
     OPENAI_VIDEO_MODEL: str = os.getenv("OPENAI_VIDEO_MODEL", "sora-2-pro")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")  # Point at a local stand-in for benchmarks
     
     # API Configuration
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
@@ -22,9 +26,14 @@ class Settings(BaseSettings):
     VIDEOS_DIR: Path = Path(os.getenv("VIDEOS_DIR", "./output/videos"))
     IMAGES_DIR: Path = Path(os.getenv("IMAGES_DIR", "./output/images"))
     AUDIO_DIR: Path = Path(os.getenv("AUDIO_DIR", "./output/audio"))
+    STORAGE_QUOTA_BYTES: int = int(os.getenv("STORAGE_QUOTA_BYTES", "0"))  # Evict least recently used artifacts above this (0 = unlimited)
+    STORAGE_SWEEP_INTERVAL: int = int(os.getenv("STORAGE_SWEEP_INTERVAL", "600"))  # Seconds between maintenance passes (0 = disabled)
+    STORAGE_ORPHAN_GRACE_SECONDS: int = int(os.getenv("STORAGE_ORPHAN_GRACE_SECONDS", "3600"))  # Never sweep files newer than this
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./visionpulse.db")
+    SIMILARITY_INDEX_PATH: Path = Path(os.getenv("SIMILARITY_INDEX_PATH", str(VIDEOS_DIR.parent / "minhash.idx")))  # Persisted MinHash signatures; next to the output directories by default
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))  # Rows fetched and written per batch when exporting
     
     # Video Configuration
     DEFAULT_IMAGE_SIZE: str = "1024x1024"
@@ -32,21 +41,81 @@ class Settings(BaseSettings):
     DEFAULT_IMAGE_DURATION: float = 5.0  # seconds per image
     ENABLE_MOTION_EFFECTS: bool = os.getenv("ENABLE_MOTION_EFFECTS", "True").lower() == "true"
     
+    # Local Media Processing (ffmpeg)
+    ENABLE_AUDIO_MUX: bool = os.getenv("ENABLE_AUDIO_MUX", "True").lower() == "true"  # Put the narration into the final MP4
+    FFMPEG_PATH: str = os.getenv("FFMPEG_PATH", "ffmpeg")
+    FFMPEG_CONCURRENCY: int = int(os.getenv("FFMPEG_CONCURRENCY", "2"))  # ffmpeg processes run at once
+    FFMPEG_TIMEOUT: float = float(os.getenv("FFMPEG_TIMEOUT", "120"))  # Seconds before an ffmpeg run is killed
+    ENABLE_HLS: bool = os.getenv("ENABLE_HLS", "False").lower() == "true"  # Segment finished videos into an adaptive bitrate HLS ladder
+    HLS_RENDITIONS: str = os.getenv("HLS_RENDITIONS", "720,480,360")  # Short-side heights of the ladder (rungs above the source are skipped)
+    HLS_SEGMENT_SECONDS: int = int(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+    HLS_CONCURRENCY: int = int(os.getenv("HLS_CONCURRENCY", "1"))  # HLS transcodes run at once (each encodes every rung)
+    HLS_TIMEOUT: float = float(os.getenv("HLS_TIMEOUT", "600"))  # Seconds before an HLS transcode is killed
+    
     # Sora-2 Pro Configuration
     USE_SORA_WHEN_AVAILABLE: bool = os.getenv("USE_SORA_WHEN_AVAILABLE", "True").lower() == "true"
     SORA_MODEL: str = os.getenv("SORA_MODEL", "sora-2-pro")  # "sora-2" or "sora-2-pro"
     SORA_MAX_DURATION: int = 12  # Sora supports 4, 8, or 12 seconds only
     SORA_DEFAULT_SIZE: str = "720x1280"  # Default resolution for Sora (portrait)
-    SORA_POLL_INTERVAL: int = 5  # Seconds between status checks
-    SORA_MAX_WAIT_TIME: int = 300  # Max time to wait for video (5 minutes)
+    SORA_POLL_INTERVAL: float = float(os.getenv("SORA_POLL_INTERVAL", "5"))  # Seconds between status checks
+    SORA_MAX_WAIT_TIME: int = int(os.getenv("SORA_MAX_WAIT_TIME", "600"))  # Render timeout until there is enough history to adapt it
+    SORA_MIN_WAIT_TIME: int = int(os.getenv("SORA_MIN_WAIT_TIME", "180"))  # Lower bound of the adaptive timeout
+    SORA_TIMEOUT_CAP: int = int(os.getenv("SORA_TIMEOUT_CAP", "1800"))  # Upper bound of the adaptive timeout
+    SORA_TIMEOUT_FACTOR: float = float(os.getenv("SORA_TIMEOUT_FACTOR", "2.0"))  # Adaptive timeout = factor x p95 of past renders
+    SORA_CONCURRENCY: int = int(os.getenv("SORA_CONCURRENCY", "8"))  # Sora renders in flight per process (storyboard shots count individually)
+    STORYBOARD_MAX_SHOTS: int = int(os.getenv("STORYBOARD_MAX_SHOTS", "6"))  # Clips per storyboard video (each at most SORA_MAX_DURATION)
+    SORA_WEBHOOK_SECRET: str = os.getenv("SORA_WEBHOOK_SECRET", "")  # whsec_... signing secret; set to wait for webhooks instead of polling
+    SORA_WEBHOOK_POLL_INTERVAL: float = float(os.getenv("SORA_WEBHOOK_POLL_INTERVAL", "60"))  # Safety-net status checks when webhooks are enabled
+    WEBHOOK_EVENT_CHECK_INTERVAL: float = float(os.getenv("WEBHOOK_EVENT_CHECK_INTERVAL", "2"))  # Seconds between checks for events received by other processes
+    WEBHOOK_TOLERANCE_SECONDS: int = 300  # Reject deliveries signed longer ago than this
+    WEBHOOK_EVENT_RETENTION_SECONDS: int = 86400  # Stored events are pruned after a day
+    
+    # Preview Tier (quick draft before the full render)
+    PREVIEW_MODE: str = os.getenv("PREVIEW_MODE", "off")  # "off", "auto" (render right after) or "approval" (wait for approve)
+    PREVIEW_MODEL: str = os.getenv("PREVIEW_MODEL", "sora-2")
+    PREVIEW_DURATION: int = int(os.getenv("PREVIEW_DURATION", "4"))
+    
+    # Batch Submission
+    MAX_BATCH_SIZE: int = int(os.getenv("MAX_BATCH_SIZE", "500"))  # Max scripts per POST /api/videos/batch
+    BATCH_PLAN_CHUNK_SIZE: int = int(os.getenv("BATCH_PLAN_CHUNK_SIZE", "10"))  # Scripts planned per LLM call
+    
+    # Plan Pre-warming (POST /api/plan while the user reviews the form)
+    PLAN_TTL_SECONDS: int = int(os.getenv("PLAN_TTL_SECONDS", "900"))  # Unclaimed plans and their files are dropped after this
+    PLAN_WAIT_SECONDS: float = float(os.getenv("PLAN_WAIT_SECONDS", "120"))  # How long a job waits for its plan to finish before planning itself
+    PLAN_POLL_INTERVAL: float = float(os.getenv("PLAN_POLL_INTERVAL", "1"))  # Seconds between checks while waiting for a plan
+    
+    # Job Workers
+    EMBEDDED_WORKER: bool = os.getenv("EMBEDDED_WORKER", "True").lower() == "true"  # Run a worker inside the API process
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", "4"))  # Jobs run at once per worker process
+    WORKER_POLL_INTERVAL: float = float(os.getenv("WORKER_POLL_INTERVAL", "2"))  # Seconds between queue checks when idle
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "60"))  # Lease length; expired leases can be stolen
+    JOB_HEARTBEAT_INTERVAL: int = int(os.getenv("JOB_HEARTBEAT_INTERVAL", "20"))  # Seconds between lease renewals
+    ENABLE_JOB_COALESCING: bool = os.getenv("ENABLE_JOB_COALESCING", "True").lower() == "true"  # Attach duplicate submissions to in-flight jobs
+    NEAR_DUP_MODE: str = os.getenv("NEAR_DUP_MODE", "offer")  # "off", "offer" (report a similar past job) or "auto" (reuse its plan and images)
+    NEAR_DUP_THRESHOLD: float = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))  # Estimated Jaccard similarity of script shingles
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))  # Claims before an abandoned job is failed
+    
+    # Status Cache (GET /api/videos/{id} polling)
+    STATUS_CACHE_SIZE: int = int(os.getenv("STATUS_CACHE_SIZE", "1000"))  # Video responses kept per process; 0 disables the cache
+    STATUS_CACHE_TTL: float = float(os.getenv("STATUS_CACHE_TTL", "15"))  # Seconds an entry is served without a database check
+    STATUS_CACHE_SYNC_INTERVAL: float = float(os.getenv("STATUS_CACHE_SYNC_INTERVAL", "2"))  # Seconds between checks for rows written by other processes; 0 disables
+    
+    # Completion Estimates (ETAs and Sora timeouts from stage history)
+    ETA_MIN_SAMPLES: int = int(os.getenv("ETA_MIN_SAMPLES", "5"))  # Finished runs before a stage's history is trusted
+    ETA_REFRESH_INTERVAL: float = float(os.getenv("ETA_REFRESH_INTERVAL", "30"))  # Seconds between reloads of the stage history
+    
+    # Event Loop Monitoring
+    LOOP_MONITOR_INTERVAL: float = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.5"))  # Seconds between lag samples; 0 disables the monitor
+    LOOP_LAG_WARN_MS: float = float(os.getenv("LOOP_LAG_WARN_MS", "100"))  # Log samples lagging at least this much
+    LOOP_DEBUG: bool = os.getenv("LOOP_DEBUG", "False").lower() == "true"  # Watchdog thread logs the stack of anything blocking the loop
+    LOOP_BLOCK_THRESHOLD_MS: float = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "250"))  # Blocking time before the watchdog reports
     
     class Config:
         env_file = ".env"
         extra = "ignore"  # Ignore extra fields from .env
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Create directories if they don't exist
+    def ensure_directories(self):
+        """Create the output directories if they don't exist (called at startup, not import)"""
         self.VIDEOS_DIR.mkdir(parents=True, exist_ok=True)
         self.IMAGES_DIR.mkdir(parents=True, exist_ok=True)
         self.AUDIO_DIR.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,35 @@
+"""Export the video catalog as NDJSON (optionally gzipped) without loading it into memory"""
+import sys
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path to make imports work
+sys.path.insert(0, str(Path(__file__).parent))
+
+from services.export_service import iter_ndjson, gzip_stream
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the VisionPulse catalog as NDJSON")
+    parser.add_argument("--status", action="append", help="Only this status (repeatable)")
+    parser.add_argument("--from", dest="created_from", type=datetime.fromisoformat,
+                        help="Created at or after (ISO 8601)")
+    parser.add_argument("--to", dest="created_to", type=datetime.fromisoformat,
+                        help="Created before (ISO 8601)")
+    parser.add_argument("--batch-size", type=int, help="Rows per batch (default EXPORT_BATCH_SIZE)")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+    parser.add_argument("-o", "--output", help="Output file (default stdout)")
+    args = parser.parse_args()
+
+    stream = iter_ndjson(args.status, args.created_from, args.created_to, args.batch_size)
+    if args.gzip:
+        stream = gzip_stream(stream)
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in stream:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
@@ -0,0 +1,47 @@
+"""
+Cancelling jobs
+
+A cancelled row is marked ``cancelled`` and loses its lease. The worker
+running it notices through its heartbeat (or at once when the worker is in
+the same process), cancels the task, which also cancels the upstream Sora
+job, and frees the slot. Partial artifacts are deleted.
+"""
+
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from models.database import Video
+from jobs.coalescing import IN_FLIGHT_STATUSES, promote_follower
+from services.storage_service import storage
+
+
+def mark_cancelled(db: Session, video: Video) -> Optional[str]:
+    """
+    Cancel an unfinished job (caller commits)
+
+    Attached duplicates don't lose their job: the oldest one is promoted to
+    run it on its own. A cancelled duplicate just stops following.
+
+    Returns:
+        The promoted follower's id, if any (it needs to be enqueued)
+    """
+    promoted = None
+    if video.coalesced_into is None:
+        promoted = promote_follower(db, video.id)
+    video.coalesced_into = None
+    video.status = "cancelled"
+    video.error_message = "Cancelled"
+    video.lease_owner = None
+    video.lease_expires_at = None
+    return promoted
+
+
+def is_cancellable(video: Video) -> bool:
+    return video.status in IN_FLIGHT_STATUSES
+
+
+async def discard_artifacts(db: Session, video_id: str):
+    """Delete a cancelled or deleted job's partial artifacts unless another row still shares them"""
+    if db.query(Video.id).filter(Video.coalesced_into == video_id).first() is None:
+        await storage.delete_artifacts(video_id)
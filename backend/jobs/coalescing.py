@@ -0,0 +1,130 @@
+"""
+Single-flight coalescing of identical generation jobs
+
+A submission whose normalized parameters match a job that is still in
+flight is attached to it (``coalesced_into``) instead of starting a second,
+separately billed pipeline. Followers are never claimed by workers; they
+follow the leader's status as it is claimed or handed back, and when the
+leader finishes, its outcome and artifacts are copied onto them.
+"""
+
+from typing import List, Optional
+import hashlib
+import json
+import re
+
+from sqlalchemy.orm import Session
+
+from models.database import Video
+
+IN_FLIGHT_STATUSES = ("pending", "processing", "awaiting_approval")
+
+# Result fields a follower shares with its leader
+SHARED_FIELDS = (
+    "status", "error_message", "prompts", "best_prompt", "narration_text",
+    "image_paths", "audio_path", "video_path", "duration", "sora_job_id",
+    "preview_path", "hls_path",
+)
+
+# Fields reset when a follower is promoted to run the job itself. The
+# duration is kept: while the leader was in flight it still held the request's.
+PROMOTION_RESET_FIELDS = tuple(
+    field for field in SHARED_FIELDS if field not in ("status", "duration")
+) + ("preview_decision", "stage", "stage_started_at", "render_progress")
+
+
+def normalize_text(text: str) -> str:
+    """Script text with surrounding and repeated whitespace collapsed, for comparing submissions"""
+    return re.sub(r"\s+", " ", (text or "").strip())
+
+
+def normalize_keywords(keywords: Optional[List[str]]) -> List[str]:
+    """Keywords lowercased, deduplicated and sorted, for comparing submissions"""
+    return sorted({k.strip().lower() for k in keywords or [] if k and k.strip()})
+
+
+def job_fingerprint(
+    script: str,
+    style: str,
+    voice: str,
+    size: str,
+    duration: int,
+    keywords: Optional[List[str]],
+    negative_keywords: Optional[List[str]],
+    preview_mode: str = "off",
+    storyboard: bool = False
+) -> str:
+    """Stable hash of the parameters that determine a job's output"""
+    key = {
+        "script": normalize_text(script),
+        "style": style,
+        "voice": voice,
+        "size": size,
+        "duration": duration,
+        "keywords": normalize_keywords(keywords),
+        "negative_keywords": normalize_keywords(negative_keywords),
+    }
+    # Only part of the key when used, so fingerprints of earlier jobs still match
+    if preview_mode != "off":
+        key["preview_mode"] = preview_mode
+    if storyboard:
+        key["storyboard"] = True
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def find_inflight_leader(db: Session, fingerprint: str) -> Optional[Video]:
+    """The oldest in-flight job with this fingerprint that is itself a leader"""
+    return (
+        db.query(Video)
+        .filter(
+            Video.fingerprint == fingerprint,
+            Video.status.in_(IN_FLIGHT_STATUSES),
+            Video.coalesced_into.is_(None)
+        )
+        .order_by(Video.created_at)
+        .first()
+    )
+
+
+def propagate_to_followers(db: Session, leader: Video):
+    """Copy the leader's outcome and artifacts onto every attached row (caller commits)"""
+    db.query(Video).filter(Video.coalesced_into == leader.id).update(
+        {getattr(Video, field): getattr(leader, field) for field in SHARED_FIELDS},
+        synchronize_session=False
+    )
+
+
+def propagate_status(db: Session, leader_id: str, status: str):
+    """Move every attached row to the leader's new status, e.g. when it is claimed (caller commits)"""
+    db.query(Video).filter(Video.coalesced_into == leader_id).update(
+        {Video.status: status}, synchronize_session=False
+    )
+
+
+def promote_follower(db: Session, leader_id: str) -> Optional[str]:
+    """
+    Hand an unfinished job over to its oldest follower (e.g. the leader was deleted)
+
+    Returns:
+        The new leader's id, or None if there were no followers
+    """
+    followers = (
+        db.query(Video)
+        .filter(Video.coalesced_into == leader_id)
+        .order_by(Video.created_at)
+        .all()
+    )
+    if not followers:
+        return None
+
+    new_leader = followers[0]
+    for follower in followers:
+        # The copied plan and artifacts belong to the old leader, whose files
+        # are deleted with it, so the new leader starts over from planning
+        for field in PROMOTION_RESET_FIELDS:
+            setattr(follower, field, None)
+        follower.status = "pending"
+        follower.attempts = 0
+        follower.coalesced_into = new_leader.id
+    new_leader.coalesced_into = None
+    return new_leader.id
@@ -0,0 +1,210 @@
+"""
+Plans prepared before submission (POST /api/plan)
+
+While the user is still reviewing the create form, planning (and optionally
+reference images and narration) runs under a plan id instead of a video id,
+so its files are stored under that id. A job created with the plan id takes
+over the finished work; if the plan is still being built, the job waits for
+it instead of planning the same script a second time.
+
+Plans are rows in the database so workers in other processes can use plans
+built by the API process. A "planning" row whose process died is abandoned
+once it passes expires_at, like an expired job lease. Unclaimed plans are
+pruned with their files after PLAN_TTL_SECONDS.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+import asyncio
+import hashlib
+import json
+import time
+
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from models.database import SessionLocal, Plan
+from jobs.coalescing import normalize_text, normalize_keywords
+from services.storage_service import storage
+
+
+def plan_fingerprint(
+    script: str,
+    style: str,
+    voice: Optional[str],
+    keywords: Optional[List[str]],
+    negative_keywords: Optional[List[str]],
+    with_images: bool,
+    with_audio: bool
+) -> str:
+    """Stable hash of the inputs that determine a plan and its prepared files"""
+    key = {
+        "script": normalize_text(script),
+        "style": style,
+        "keywords": normalize_keywords(keywords),
+        "negative_keywords": normalize_keywords(negative_keywords),
+        "images": with_images,
+        # The voice only matters for the narration
+        "voice": voice if with_audio else None,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def plan_matches(
+    plan: Plan,
+    script: str,
+    style: str,
+    keywords: Optional[List[str]],
+    negative_keywords: Optional[List[str]]
+) -> bool:
+    """Whether a plan was built from the same script, style and keywords as a submission"""
+    return (
+        normalize_text(plan.script) == normalize_text(script)
+        and plan.style == style
+        and normalize_keywords(plan.keywords) == normalize_keywords(keywords)
+        and normalize_keywords(plan.negative_keywords) == normalize_keywords(negative_keywords)
+    )
+
+
+def find_plan(db: Session, fingerprint: str) -> Optional[Plan]:
+    """A live plan (being built or ready) for the same inputs"""
+    return (
+        db.query(Plan)
+        .filter(
+            Plan.fingerprint == fingerprint,
+            Plan.status != "failed",
+            Plan.expires_at > datetime.utcnow()
+        )
+        .order_by(Plan.created_at.desc())
+        .first()
+    )
+
+
+def new_plan_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.PLAN_TTL_SECONDS)
+
+
+# --- Building ----------------------------------------------------------------
+
+_builds: Set[asyncio.Task] = set()
+
+def start_build(plan_id: str):
+    """Build a plan in the background of this process"""
+    task = asyncio.create_task(_build(plan_id))
+    _builds.add(task)
+    task.add_done_callback(_builds.discard)
+
+async def stop_builds():
+    """Cancel plan builds still running (called on shutdown)"""
+    for task in list(_builds):
+        task.cancel()
+    await asyncio.gather(*_builds, return_exceptions=True)
+
+async def _build(plan_id: str):
+    # Imported here: the runner imports this module
+    from jobs.runner import get_workflow
+
+    db = SessionLocal()
+    try:
+        plan = db.query(Plan).filter(Plan.id == plan_id).first()
+        if not plan:
+            return
+        state = {
+            "video_id": plan.id,
+            "script": plan.script,
+            "style": plan.style,
+            "voice": plan.voice,
+            "keywords": plan.keywords or [],
+            "negative_keywords": plan.negative_keywords or [],
+            "prompts": [],
+            "best_prompt": "",
+            "narration_text": None,
+            "error": None,
+            "current_step": "initializing",
+        }
+        workflow = get_workflow()
+        state = await workflow.plan_video(state)
+        if plan.with_images and not state.get("error"):
+            state = await workflow.generate_images(state)
+        if plan.with_audio and not state.get("error"):
+            state = await workflow.generate_audio(state)
+
+        db.expire_all()
+        plan = db.query(Plan).filter(Plan.id == plan_id).first()
+        if not plan:
+            # Pruned while building
+            await storage.delete_artifacts(plan_id)
+            return
+        if state.get("error"):
+            plan.status = "failed"
+            plan.error_message = state["error"]
+        else:
+            plan.status = "ready"
+            plan.prompts = state.get("prompts")
+            plan.best_prompt = state.get("best_prompt")
+            plan.narration_text = state.get("narration_text")
+            plan.image_paths = state.get("image_paths")
+            plan.audio_path = state.get("audio_path")
+            # Give the user the full TTL from when the plan was ready
+            plan.expires_at = new_plan_expiry()
+            print(f"[{plan_id}] Plan ready")
+        db.commit()
+    except Exception as e:
+        print(f"[{plan_id}] Plan build failed: {str(e)}")
+        db.rollback()
+        plan = db.query(Plan).filter(Plan.id == plan_id).first()
+        if plan:
+            plan.status = "failed"
+            plan.error_message = str(e)
+            db.commit()
+    finally:
+        db.close()
+
+
+# --- Claiming ----------------------------------------------------------------
+
+def _load(plan_id: str) -> Optional[Plan]:
+    """The plan row, detached from its session (blocking)"""
+    db = SessionLocal()
+    try:
+        plan = db.query(Plan).filter(Plan.id == plan_id).first()
+        if plan:
+            db.expunge(plan)
+        return plan
+    finally:
+        db.close()
+
+async def wait_for_plan(plan_id: str) -> Optional[Plan]:
+    """
+    The plan once it is ready, or None if it failed, expired or took longer
+    than PLAN_WAIT_SECONDS (the job then plans by itself)
+    """
+    deadline = time.monotonic() + settings.PLAN_WAIT_SECONDS
+    while True:
+        plan = await asyncio.to_thread(_load, plan_id)
+        if not plan or plan.status == "failed":
+            return None
+        if plan.status == "ready":
+            return plan
+        if time.monotonic() >= deadline or plan.expires_at <= datetime.utcnow():
+            return None
+        await asyncio.sleep(settings.PLAN_POLL_INTERVAL)
+
+
+# --- Pruning -----------------------------------------------------------------
+
+async def prune_plans() -> int:
+    """Delete expired plans and their files; returns the number pruned"""
+    db = SessionLocal()
+    try:
+        expired = [row.id for row in db.query(Plan.id).filter(Plan.expires_at <= datetime.utcnow())]
+        if not expired:
+            return 0
+        db.query(Plan).filter(Plan.id.in_(expired)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    for plan_id in expired:
+        await storage.delete_artifacts(plan_id)
+    print(f"Pruned {len(expired)} expired plans")
+    return len(expired)
@@ -0,0 +1,162 @@
+"""
+Database-backed job queue
+
+The ``videos`` table is the queue: a row is enqueued by inserting it as
+``pending``. Workers claim rows with an atomic compare-and-set on the lease
+columns, renew the lease with heartbeats while the job runs, and release it
+when done. A lease that expires (the worker died or stalled) can be stolen
+by any other worker.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+import os
+import socket
+import uuid
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from models.database import Video
+from jobs.coalescing import propagate_status, propagate_to_followers
+
+# Statuses a worker can pick up (processing rows only once their lease expired)
+CLAIMABLE_STATUSES = ("pending", "processing")
+
+# Candidates inspected per claim attempt; losing a race just moves on to the next
+CLAIM_SCAN_LIMIT = 20
+
+
+def new_owner_id() -> str:
+    """Unique lease owner id for a worker: host, pid and a random suffix"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _claimable(now: datetime):
+    return and_(
+        Video.status.in_(CLAIMABLE_STATUSES),
+        Video.coalesced_into.is_(None),  # Followers ride on their leader's job
+        or_(Video.lease_owner.is_(None), Video.lease_expires_at < now)
+    )
+
+
+def _lease_until(now: datetime) -> datetime:
+    return now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+def claim_next_job(db: Session, owner: str) -> Optional[str]:
+    """
+    Claim the oldest claimable job for ``owner``
+
+    Args:
+        db: Database session
+        owner: Lease owner id of the claiming worker
+
+    Returns:
+        The claimed video id, or None if the queue is empty
+    """
+    now = datetime.utcnow()
+    candidates = (
+        db.query(Video.id, Video.attempts)
+        .filter(_claimable(now))
+        .order_by(Video.created_at)
+        .limit(CLAIM_SCAN_LIMIT)
+        .all()
+    )
+
+    for video_id, attempts in candidates:
+        if (attempts or 0) >= settings.JOB_MAX_ATTEMPTS:
+            # Every previous holder died mid-job; stop retrying it
+            abandoned = db.query(Video).filter(Video.id == video_id, _claimable(now)).update({
+                Video.status: "failed",
+                Video.error_message: f"Job abandoned after {attempts} attempts",
+                Video.lease_owner: None,
+                Video.lease_expires_at: None,
+            }, synchronize_session=False)
+            if abandoned:
+                propagate_to_followers(db, db.query(Video).filter(Video.id == video_id).one())
+            db.commit()
+            continue
+
+        claimed = db.query(Video).filter(Video.id == video_id, _claimable(now)).update({
+            Video.status: "processing",
+            Video.lease_owner: owner,
+            Video.lease_expires_at: _lease_until(now),
+            Video.heartbeat_at: now,
+            Video.attempts: func.coalesce(Video.attempts, 0) + 1,
+        }, synchronize_session=False)
+        if claimed:
+            # Followers still show the status they attached with (usually pending)
+            propagate_status(db, video_id, "processing")
+        db.commit()
+        if claimed:
+            return video_id
+
+    return None
+
+
+def lease_pending(db: Session, video_ids: List[str], owner: str) -> List[str]:
+    """
+    Lease pending rows without starting them (e.g. to plan them together)
+
+    Returns:
+        The ids that were leased; the rest are held by someone else
+    """
+    now = datetime.utcnow()
+    leased = []
+    for video_id in video_ids:
+        claimed = db.query(Video).filter(
+            Video.id == video_id,
+            Video.status == "pending",
+            or_(Video.lease_owner.is_(None), Video.lease_expires_at < now)
+        ).update({
+            Video.lease_owner: owner,
+            Video.lease_expires_at: _lease_until(now),
+        }, synchronize_session=False)
+        if claimed:
+            leased.append(video_id)
+    db.commit()
+    return leased
+
+
+def renew_lease(db: Session, video_id: str, owner: str) -> bool:
+    """
+    Extend the lease on a running job
+
+    Returns:
+        False if the lease was lost (stolen, released, or the row is no
+        longer processing), in which case the caller must stop the job
+    """
+    now = datetime.utcnow()
+    renewed = db.query(Video).filter(
+        Video.id == video_id,
+        Video.lease_owner == owner,
+        Video.status == "processing"
+    ).update({
+        Video.lease_expires_at: _lease_until(now),
+        Video.heartbeat_at: now,
+    }, synchronize_session=False)
+    db.commit()
+    return bool(renewed)
+
+
+def release_lease(db: Session, video_id: str, owner: str, status: Optional[str] = None):
+    """Give up the lease on a job, optionally resetting its status (e.g. back to pending)"""
+    values = {Video.lease_owner: None, Video.lease_expires_at: None}
+    if status:
+        values[Video.status] = status
+    if status == "pending":
+        # Handing a job back (e.g. on shutdown) doesn't count as a failed attempt
+        values[Video.attempts] = func.coalesce(Video.attempts, 1) - 1
+    released = db.query(Video).filter(Video.id == video_id, Video.lease_owner == owner).update(
+        values, synchronize_session=False
+    )
+    if released and status:
+        propagate_status(db, video_id, status)
+    db.commit()
+
+
+def queue_depth(db: Session) -> int:
+    """Number of jobs waiting to be claimed"""
+    return db.query(func.count(Video.id)).filter(Video.status == "pending").scalar() or 0
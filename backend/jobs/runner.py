@@ -0,0 +1,334 @@
+"""
+Runs one video generation job against its database row
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, TYPE_CHECKING
+import asyncio
+
+from sqlalchemy import and_, or_
+
+from config.settings import settings
+from models.database import SessionLocal, Video
+from jobs.queue import lease_pending, release_lease
+from jobs.coalescing import propagate_to_followers
+from jobs.storage_maintenance import record_manifest
+from jobs.plan_cache import wait_for_plan
+from services.storage_service import storage
+from services.eta_service import record_stage_durations
+
+if TYPE_CHECKING:
+    from workflows.video_workflow import VideoGenerationWorkflow, VideoGenerationState
+
+# The workflow pulls in LangChain and builds several API clients, so it is
+# constructed on first use instead of at import time
+_workflow: Optional["VideoGenerationWorkflow"] = None
+
+def get_workflow() -> "VideoGenerationWorkflow":
+    """Return the shared workflow, constructing it on first use"""
+    global _workflow
+    if _workflow is None:
+        from workflows.video_workflow import VideoGenerationWorkflow
+        _workflow = VideoGenerationWorkflow()
+    return _workflow
+
+def reset_workflow():
+    """Drop the shared workflow (called on shutdown)"""
+    global _workflow
+    _workflow = None
+
+def _stored_plan(video: Video) -> Optional[Dict]:
+    """Plan fields already persisted on the row, if planning was done"""
+    if video.prompts and video.best_prompt:
+        return {
+            "prompts": video.prompts,
+            "best_prompt": video.best_prompt,
+            "narration_text": video.narration_text,
+        }
+    return None
+
+# Batch planning calls running in this process, by video id, so a sibling
+# claimed by the same worker waits for the shared call instead of planning alone
+_batch_plans: Dict[str, "asyncio.Future[Optional[Dict]]"] = {}
+
+async def _plan_batch(db, video: Video, owner: str) -> Optional[Dict]:
+    """
+    Plan this job together with unplanned siblings from the same batch
+
+    Siblings are either still pending, in which case they are leased while
+    planning so no other worker plans them too and are then handed back to
+    the queue, or already claimed by this worker (a worker claims up to
+    WORKER_CONCURRENCY jobs at once) and not yet started on planning; those
+    wait for this call instead of making their own. Plans are written to the
+    siblings' rows. Returns this job's plan, or None to fall back to
+    planning alone.
+    """
+    shared = _batch_plans.get(video.id)
+    if shared is not None:
+        return await asyncio.shield(shared)
+
+    now = datetime.utcnow()
+    siblings = (
+        db.query(Video.id, Video.status)
+        .filter(
+            Video.batch_id == video.batch_id,
+            Video.style == video.style,
+            Video.best_prompt.is_(None),
+            Video.id != video.id,
+            # Rows in another batch call already have their plan on the way
+            Video.id.notin_(list(_batch_plans)),
+            or_(
+                and_(
+                    Video.status == "pending",
+                    or_(Video.lease_owner.is_(None), Video.lease_expires_at < now)
+                ),
+                and_(Video.status == "processing", Video.lease_owner == owner, Video.stage.is_(None))
+            )
+        )
+        .order_by(Video.created_at)
+        .limit(max(1, settings.BATCH_PLAN_CHUNK_SIZE) - 1)
+        .all()
+    )
+    if not siblings:
+        return None
+
+    claimed = [row.id for row in siblings if row.status == "processing"]
+    leased = lease_pending(db, [row.id for row in siblings if row.status == "pending"], owner)
+    if not claimed and not leased:
+        return None
+
+    loop = asyncio.get_running_loop()
+    waiting = {video_id: loop.create_future() for video_id in [video.id] + claimed}
+    _batch_plans.update(waiting)
+    planned: Dict[str, Dict] = {}
+    try:
+        rows = db.query(Video).filter(Video.id.in_(claimed + leased)).all()
+        jobs = [
+            {
+                "video_id": row.id,
+                "script": row.script,
+                "style": row.style,
+                "keywords": row.keywords or [],
+                "negative_keywords": row.negative_keywords or [],
+            }
+            for row in [video] + rows
+        ]
+        planned = await get_workflow().plan_videos_batch(jobs)
+
+        for row in rows:
+            plan = planned.get(row.id)
+            if plan:
+                row.prompts = plan["prompts"]
+                row.best_prompt = plan["best_prompt"]
+                row.narration_text = plan["narration_text"]
+        db.commit()
+        return planned.get(video.id)
+    except Exception as e:
+        print(f"[{video.id}] Batch planning failed: {str(e)}")
+        db.rollback()
+        return None
+    finally:
+        # Siblings without a plan (failure, cancellation) plan alone
+        for video_id, future in waiting.items():
+            _batch_plans.pop(video_id, None)
+            if not future.done():
+                future.set_result(planned.get(video_id))
+        for video_id in leased:
+            release_lease(db, video_id, owner)
+
+def _store_plan_and_assets(video: Video, result: "VideoGenerationState"):
+    video.prompts = result.get("prompts")
+    video.best_prompt = result.get("best_prompt")
+    video.narration_text = result.get("narration_text")
+    video.image_paths = result.get("image_paths")
+    video.audio_path = result.get("audio_path")
+    video.preview_path = result.get("preview_path")
+
+async def _copy_reused_images(db, video: Video):
+    """Give a job reusing another job's plan its own copies of that job's reference images"""
+    source = db.query(Video).filter(Video.id == video.reused_from).first()
+    if not source or not source.image_paths:
+        return
+    # If the source's images were evicted meanwhile, the workflow generates new ones
+    video.image_paths = await storage.copy_images(source.image_paths, video.id) or None
+    db.commit()
+
+async def _adopt_plan(db, video: Video):
+    """Take over the plan, reference images and narration prepared by POST /api/plan"""
+    plan = await wait_for_plan(video.plan_id)
+    if not plan:
+        print(f"[{video.id}] Plan {video.plan_id} is not available; planning from scratch")
+        return
+    if not video.best_prompt:
+        video.prompts = plan.prompts
+        video.best_prompt = plan.best_prompt
+        video.narration_text = plan.narration_text
+    # The plan keeps its own files until it expires, so a retried job can copy them again
+    if plan.image_paths and not video.image_paths:
+        video.image_paths = await storage.copy_images(plan.image_paths, video.id) or None
+    if plan.audio_path and plan.voice == video.voice and not video.audio_path:
+        video.audio_path = await storage.copy_audio(plan.id, video.id)
+    db.commit()
+    print(f"[{video.id}] Using plan {plan.id}")
+
+def _index_script(video_id: str, script: str):
+    """Add a completed job to the near-duplicate index (best effort)"""
+    try:
+        # Imported here: NumPy is only needed once jobs complete
+        from services.similarity_service import get_index
+        get_index().add(video_id, script)
+    except Exception as e:
+        print(f"[{video_id}] Could not index script for near-duplicate detection: {str(e)}")
+
+async def _run_remix(db, video: Video, state: "VideoGenerationState") -> "VideoGenerationState":
+    """Remix the source video's Sora job; the source's plan carries over"""
+    source = db.query(Video).filter(Video.id == video.remix_of).first()
+    if not source or not source.sora_job_id:
+        state["error"] = "Source video has no Sora job to remix"
+        return state
+    state["prompts"] = source.prompts or []
+    state["best_prompt"] = video.remix_prompt
+    state["narration_text"] = source.narration_text
+    # Followers share their leader's files, including the narration
+    audio_owner = source.coalesced_into or source.id
+    return await get_workflow().remix(state, audio_owner, source.sora_job_id, video.remix_prompt)
+
+async def process_video_generation(video_id: str, owner: Optional[str] = None):
+    """
+    Run the workflow for one video and store the result on its row
+
+    Args:
+        video_id: Video to generate; its row holds the job parameters
+        owner: Lease owner id when run by a worker. Results are only written
+            while the lease is still held, so a stolen job can't be
+            overwritten by a stale worker.
+
+    Returns:
+        The final workflow state (or None if the job could not run) so
+        callers such as the benchmark harness can inspect per-stage timings
+    """
+    db = SessionLocal()
+
+    try:
+        # Get video from database
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            return None
+
+        # Update status to processing (workers already did this when claiming)
+        if video.status != "processing":
+            video.status = "processing"
+            db.commit()
+
+        if video.reused_from and not video.image_paths:
+            await _copy_reused_images(db, video)
+        if video.plan_id and not (video.best_prompt and video.image_paths and video.audio_path):
+            await _adopt_plan(db, video)
+
+        plan = None
+        if not video.remix_of:
+            plan = _stored_plan(video)
+            if plan is None and video.batch_id and owner:
+                plan = await _plan_batch(db, video, owner)
+
+        # Create initial state
+        initial_state: "VideoGenerationState" = {
+            "video_id": video_id,
+            "script": video.script,
+            "style": video.style,
+            "voice": video.voice,
+            "size": video.size or "1280x720",
+            "keywords": video.keywords or [],
+            "negative_keywords": video.negative_keywords or [],
+            "prompts": [],
+            "best_prompt": "",
+            # Steps finished before an approval pause are resumed, not redone
+            "image_paths": video.image_paths or [],
+            "audio_path": video.audio_path or "",
+            "video_path": "",
+            "duration": video.duration or 8,
+            "narration_text": None,
+            "error": None,
+            "current_step": "initializing",
+            "stage_durations": {},
+            "sora_job_id": None,
+            "preview_mode": video.preview_mode or "off",
+            "preview_path": video.preview_path,
+            "preview_approved": video.preview_decision == "approved",
+            "hls_path": None,
+            "storyboard": bool(video.storyboard)
+        }
+        if plan:
+            initial_state.update(plan)
+
+        # Run workflow - using await since it's async
+        if video.remix_of:
+            result = await _run_remix(db, video, initial_state)
+        else:
+            result = await get_workflow().run(initial_state)
+
+        # Size up what was written before touching the row again
+        manifest = await storage.build_manifest_async(video_id)
+        
+        # Update database with results
+        db.expire_all()
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            print(f"[{video_id}] Video was deleted while generating; discarding result")
+            return result
+        if owner and video.lease_owner != owner:
+            print(f"[{video_id}] Lease lost while generating; discarding result")
+            return result
+        # Stage history is keyed by what was asked for, which is what lookups know
+        requested = (video.size, video.duration, video.style)
+
+        if result.get("error"):
+            video.status = "failed"
+            video.error_message = result["error"]
+        elif result.get("current_step") == "awaiting_approval":
+            # Keep the work done so far; approval re-queues the job for the full render
+            _store_plan_and_assets(video, result)
+            if video.preview_decision == "approved":
+                # Approved while the preview was still rendering
+                video.status = "pending"
+                video.attempts = 0
+            else:
+                video.status = "awaiting_approval"
+        else:
+            video.status = "completed"
+            _store_plan_and_assets(video, result)
+            video.video_path = result["video_path"]
+            video.duration = result.get("duration")
+            video.sora_job_id = result.get("sora_job_id")
+            video.hls_path = result.get("hls_path")
+        record_manifest(video, manifest)
+        video.lease_owner = None
+        video.lease_expires_at = None
+        propagate_to_followers(db, video)
+
+        db.commit()
+
+        if not result.get("error"):
+            # Failed runs would skew the history towards however far they got
+            try:
+                await asyncio.to_thread(record_stage_durations, *requested, result.get("stage_durations") or {})
+            except Exception as e:
+                print(f"[{video_id}] Could not record stage durations: {str(e)}")
+        if video.status == "completed" and not video.remix_of and settings.NEAR_DUP_MODE != "off":
+            await asyncio.to_thread(_index_script, video.id, video.script)
+        return result
+
+    except Exception as e:
+        print(f"Error processing video {video_id}: {str(e)}")
+        db.rollback()
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if video and (not owner or video.lease_owner == owner):
+            video.status = "failed"
+            video.error_message = str(e)
+            video.lease_owner = None
+            video.lease_expires_at = None
+            propagate_to_followers(db, video)
+            db.commit()
+        return None
+    finally:
+        db.close()
@@ -0,0 +1,156 @@
+"""
+Background storage maintenance: access-time flushing, orphan sweeping,
+disk-quota enforcement with LRU eviction (intermediates first) and pruning
+of expired plans and old webhook deliveries
+"""
+
+from datetime import datetime
+from typing import List
+import asyncio
+
+from sqlalchemy import func
+
+from config.settings import settings
+from models.database import SessionLocal, Video, Plan
+from services.storage_service import storage
+from services.webhook_service import webhooks
+from jobs.coalescing import propagate_to_followers
+from jobs.plan_cache import prune_plans
+
+# Ids checked per IN (...) query while sweeping
+SWEEP_CHUNK_SIZE = 500
+
+
+def record_manifest(video: Video, manifest: dict):
+    """Store a manifest and its size totals on the row (caller commits)"""
+    video.artifacts = manifest
+    video.storage_bytes = manifest["total_bytes"]
+    video.intermediate_bytes = manifest["intermediate_bytes"]
+
+
+def flush_access_times():
+    """Persist the last-served times collected by the static file mounts"""
+    accessed = storage.drain_access_log()
+    if not accessed:
+        return
+    db = SessionLocal()
+    try:
+        for video_id, timestamp in accessed.items():
+            db.query(Video).filter(Video.id == video_id).update(
+                {Video.last_accessed_at: datetime.utcfromtimestamp(timestamp)},
+                synchronize_session=False
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def sweep_orphans() -> int:
+    """Delete artifacts whose video no longer exists; returns bytes freed"""
+    stored = await asyncio.to_thread(storage.stored_video_ids, settings.STORAGE_ORPHAN_GRACE_SECONDS)
+    if not stored:
+        return 0
+
+    candidates = list(stored)
+    live = set()
+    db = SessionLocal()
+    try:
+        for start in range(0, len(candidates), SWEEP_CHUNK_SIZE):
+            chunk = candidates[start:start + SWEEP_CHUNK_SIZE]
+            live.update(row.id for row in db.query(Video.id).filter(Video.id.in_(chunk)))
+            # Followers keep their leader's artifacts alive
+            live.update(row.coalesced_into for row in db.query(Video.coalesced_into).filter(Video.coalesced_into.in_(chunk)))
+            # Plans own their files until prune_plans drops them
+            live.update(row.id for row in db.query(Plan.id).filter(Plan.id.in_(chunk)))
+    finally:
+        db.close()
+
+    orphans: List = [entry for video_id in candidates if video_id not in live for entry in stored[video_id]]
+    if not orphans:
+        return 0
+    freed = await asyncio.to_thread(storage.remove_entries, orphans)
+    print(f"Storage sweep: removed {len(orphans)} orphaned entries ({freed} bytes)")
+    return freed
+
+
+def _lru_order():
+    return func.coalesce(Video.last_accessed_at, Video.updated_at)
+
+
+async def enforce_quota() -> int:
+    """Evict artifacts until usage is under STORAGE_QUOTA_BYTES; returns bytes freed"""
+    quota = settings.STORAGE_QUOTA_BYTES
+    if quota <= 0:
+        return 0
+
+    db = SessionLocal()
+    try:
+        usage = db.query(func.coalesce(func.sum(Video.storage_bytes), 0)).scalar()
+        if usage <= quota:
+            return 0
+        start_usage = usage
+
+        # Phase 1: intermediates (previews, HLS renditions, reference images) of finished videos
+        candidates = (
+            db.query(Video)
+            .filter(Video.status == "completed", Video.intermediate_bytes > 0, Video.coalesced_into.is_(None))
+            .order_by(_lru_order())
+            .limit(1000)
+            .all()
+        )
+        for video in candidates:
+            if usage <= quota:
+                break
+            await storage.delete_intermediates(video.id)
+            video.image_paths = []
+            video.preview_path = None
+            video.hls_path = None
+            record_manifest(video, await storage.build_manifest_async(video.id))
+            propagate_to_followers(db, video)
+            db.commit()
+            usage = db.query(func.coalesce(func.sum(Video.storage_bytes), 0)).scalar()
+
+        # Phase 2: whole finished videos, least recently used first
+        if usage > quota:
+            candidates = (
+                db.query(Video)
+                .filter(Video.status == "completed", Video.storage_bytes > 0, Video.coalesced_into.is_(None))
+                .order_by(_lru_order())
+                .limit(1000)
+                .all()
+            )
+            for video in candidates:
+                if usage <= quota:
+                    break
+                await storage.delete_artifacts(video.id)
+                video.status = "evicted"
+                video.video_path = None
+                video.audio_path = None
+                video.hls_path = None
+                video.preview_path = None
+                video.image_paths = []
+                record_manifest(video, await storage.build_manifest_async(video.id))
+                propagate_to_followers(db, video)
+                db.commit()
+                usage = db.query(func.coalesce(func.sum(Video.storage_bytes), 0)).scalar()
+
+        freed = start_usage - usage
+        print(f"Storage quota: evicted {freed} bytes (usage {usage}/{quota})")
+        return freed
+    finally:
+        db.close()
+
+
+async def run_maintenance_loop():
+    """Flush access times, prune expired plans, sweep orphans and enforce the quota every STORAGE_SWEEP_INTERVAL"""
+    while True:
+        await asyncio.sleep(settings.STORAGE_SWEEP_INTERVAL)
+        try:
+            flush_access_times()
+            await prune_plans()
+            await sweep_orphans()
+            await enforce_quota()
+            await asyncio.to_thread(storage.prune_cache, settings.TTS_CACHE_MAX_AGE)
+            webhooks.prune(settings.WEBHOOK_EVENT_RETENTION_SECONDS)
+        except Exception as e:
+            print(f"Storage maintenance failed: {str(e)}")
@@ -0,0 +1,173 @@
+"""
+Job worker: claims leased jobs from the videos table and runs them
+
+Runs either standalone (``python worker.py``) or embedded in the API
+process (``EMBEDDED_WORKER``). Any number of workers can run against the
+same database; leases make sure each job runs once.
+"""
+
+import asyncio
+from typing import Dict, Optional
+
+from config.settings import settings
+from models.database import SessionLocal, Video
+from jobs.queue import claim_next_job, new_owner_id, release_lease, renew_lease
+from jobs.cancellation import discard_artifacts
+from jobs.runner import process_video_generation
+from services.sora_service import render_abandoned
+
+
+class Worker:
+    """Claims up to ``concurrency`` jobs at a time and keeps their leases alive"""
+
+    def __init__(self, concurrency: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.concurrency = max(1, concurrency or settings.WORKER_CONCURRENCY)
+        self.poll_interval = poll_interval or settings.WORKER_POLL_INTERVAL
+        self.owner = new_owner_id()
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the claim loop in the background"""
+        print(f"Worker {self.owner} started (concurrency={self.concurrency})")
+        self._task = asyncio.create_task(self.run())
+
+    def notify(self):
+        """Wake the claim loop early, e.g. right after a job was enqueued"""
+        self._wakeup.set()
+
+    async def run(self):
+        while not self._stopping:
+            while len(self._jobs) < self.concurrency and not self._stopping:
+                video_id = await asyncio.to_thread(self._claim)
+                if not video_id:
+                    break
+                if self._stopping:
+                    # stop() was called while the claim was running
+                    await asyncio.to_thread(self._hand_back, video_id)
+                    break
+                self._jobs[video_id] = asyncio.create_task(self._run_job(video_id))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        """
+        Stop claiming, cancel running jobs and hand them back to the queue
+
+        Their upstream Sora jobs are left alone: the job isn't abandoned, and
+        deleting paid renders on every restart would only waste them.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+        for task in list(self._jobs.values()):
+            task.cancel()
+        await asyncio.gather(*self._jobs.values(), return_exceptions=True)
+        print(f"Worker {self.owner} stopped")
+
+    def cancel(self, video_id: str) -> bool:
+        """Cancel a job running in this worker right away; returns False if it isn't running here"""
+        task = self._jobs.get(video_id)
+        if not task:
+            return False
+        task.cancel()
+        return True
+
+    def _claim(self) -> Optional[str]:
+        """Claim the next job (blocking: may wait on the database's write lock)"""
+        db = SessionLocal()
+        try:
+            return claim_next_job(db, self.owner)
+        except Exception as e:
+            print(f"Worker {self.owner} failed to claim a job: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    async def _run_job(self, video_id: str):
+        # Renders cancelled by stop() go back to the queue, so they are not deleted upstream
+        render_abandoned.set(lambda: not self._stopping)
+        heartbeat = asyncio.create_task(self._heartbeat(video_id, asyncio.current_task()))
+        try:
+            await process_video_generation(video_id, owner=self.owner)
+        except asyncio.CancelledError:
+            db = SessionLocal()
+            try:
+                if self._stopping:
+                    release_lease(db, video_id, self.owner, status="pending")
+                else:
+                    # Cancelled, deleted or lease stolen: drop partial files unless another worker now runs it
+                    video = db.query(Video).filter(Video.id == video_id).first()
+                    if video is None or video.status == "cancelled":
+                        await discard_artifacts(db, video_id)
+            finally:
+                db.close()
+            raise
+        finally:
+            heartbeat.cancel()
+            self._jobs.pop(video_id, None)
+            self._wakeup.set()
+
+    def _hand_back(self, video_id: str):
+        """Return a claimed job to the queue (blocking)"""
+        db = SessionLocal()
+        try:
+            release_lease(db, video_id, self.owner, status="pending")
+        finally:
+            db.close()
+
+    def _renew(self, video_id: str) -> bool:
+        """Renew a job's lease (blocking)"""
+        db = SessionLocal()
+        try:
+            return renew_lease(db, video_id, self.owner)
+        finally:
+            db.close()
+
+    async def _heartbeat(self, video_id: str, job: asyncio.Task):
+        """Renew the lease periodically; stop the job if the lease is lost"""
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+            try:
+                renewed = await asyncio.to_thread(self._renew, video_id)
+            except Exception as e:
+                # Transient DB errors: try again next beat, the lease has slack
+                print(f"[{video_id}] Heartbeat failed: {str(e)}")
+                continue
+            if not renewed:
+                print(f"[{video_id}] Lease lost, stopping job")
+                job.cancel()
+                return
+
+
+# Worker running inside this process, if any (see EMBEDDED_WORKER)
+_embedded: Optional[Worker] = None
+
+def start_embedded_worker() -> Worker:
+    """Start a worker in the current event loop (API process)"""
+    global _embedded
+    _embedded = Worker()
+    _embedded.start()
+    return _embedded
+
+async def stop_embedded_worker():
+    global _embedded
+    if _embedded:
+        await _embedded.stop()
+        _embedded = None
+
+def cancel_local_job(video_id: str) -> bool:
+    """Cancel a job if the in-process worker is running it (other workers find out by heartbeat)"""
+    return bool(_embedded and _embedded.cancel(video_id))
+
+def notify_new_jobs():
+    """Tell the in-process worker, if any, that jobs were enqueued"""
+    if _embedded:
+        _embedded.notify()
@@ -1,4 +1,7 @@
 import sys
+import asyncio
+import mimetypes
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 # Add parent directory to path to make imports work
@@ -6,20 +9,52 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
 from api.routes import router
 from models.database import init_db
 from config.settings import settings
+from jobs.runner import reset_workflow
+from jobs.worker import start_embedded_worker, stop_embedded_worker
+from jobs.storage_maintenance import run_maintenance_loop
+from jobs.plan_cache import stop_builds
+from services.storage_service import storage
+from services.loop_monitor import loop_monitor
+from services.status_cache import status_cache, run_sync_loop
 
-# Initialize database
-init_db()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup side effects live here so importing this module stays cheap;
+    # the workflow and its API clients are built on first use
+    settings.ensure_directories()
+    init_db()
+    loop_monitor.start()
+    # Without an embedded worker this process only enqueues; run `python worker.py`
+    if settings.EMBEDDED_WORKER:
+        start_embedded_worker()
+    maintenance = asyncio.create_task(run_maintenance_loop()) if settings.STORAGE_SWEEP_INTERVAL > 0 else None
+    # Rows written by other processes never reach this process's session events
+    status_sync = (
+        asyncio.create_task(run_sync_loop())
+        if status_cache.enabled and settings.STATUS_CACHE_SYNC_INTERVAL > 0 else None
+    )
+    yield
+    if maintenance:
+        maintenance.cancel()
+    if status_sync:
+        status_sync.cancel()
+    await stop_embedded_worker()
+    await stop_builds()
+    await loop_monitor.stop()
+    reset_workflow()
 
 # Create FastAPI app
 app = FastAPI(
     title="VisionPulse API",
     description="AI-powered video creation system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -39,13 +74,30 @@ app.add_middleware(
 # Include API routes
 app.include_router(router)
 
+class TrackedStaticFiles(StaticFiles):
+    """Static files that record when each video's artifacts were last served (for LRU eviction)"""
+    
+    def __init__(self, *args, prefix: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefix = prefix
+    
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code < 400:
+            video_id = storage.url_video_id(f"{self.prefix}{path}")
+            if video_id:
+                storage.touch(video_id)
+        return response
+
+# HLS playlists and segments (some systems map .ts to TypeScript or Qt files)
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/mp2t", ".ts")
+
 # Serve static files (videos, images, audio)
-if settings.VIDEOS_DIR.exists():
-    app.mount("/videos", StaticFiles(directory=str(settings.VIDEOS_DIR)), name="videos")
-if settings.IMAGES_DIR.exists():
-    app.mount("/images", StaticFiles(directory=str(settings.IMAGES_DIR)), name="images")
-if settings.AUDIO_DIR.exists():
-    app.mount("/audio", StaticFiles(directory=str(settings.AUDIO_DIR)), name="audio")
+# Directories are created by the lifespan handler, so don't check them at import
+app.mount("/videos", TrackedStaticFiles(directory=str(settings.VIDEOS_DIR), check_dir=False, prefix="/videos/"), name="videos")
+app.mount("/images", TrackedStaticFiles(directory=str(settings.IMAGES_DIR), check_dir=False, prefix="/images/"), name="images")
+app.mount("/audio", TrackedStaticFiles(directory=str(settings.AUDIO_DIR), check_dir=False, prefix="/audio/"), name="audio")
 
 @app.get("/")
 async def root():
@@ -59,6 +111,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Event loop lag, blocking and status cache metrics (Prometheus text format)"""
+    return loop_monitor.prometheus() + status_cache.prometheus()
+
 if __name__ == "__main__":
     import uvicorn
     print("Starting VisionPulse API Server...")
@@ -1,26 +1,77 @@
-"""Add duration column to existing database"""
+"""Add new columns and indexes to an existing database"""
 import sqlite3
 from pathlib import Path
 
 # Database path
 db_path = Path("visionpulse.db")
 
+# Columns added to the videos table since the first release
+COLUMNS = [
+    ("duration", "INTEGER"),
+    ("size", "VARCHAR"),
+    ("batch_id", "VARCHAR"),
+    ("best_prompt", "TEXT"),
+    ("narration_text", "TEXT"),
+    ("lease_owner", "VARCHAR"),
+    ("lease_expires_at", "DATETIME"),
+    ("heartbeat_at", "DATETIME"),
+    ("attempts", "INTEGER DEFAULT 0"),
+    ("fingerprint", "VARCHAR"),
+    ("coalesced_into", "VARCHAR"),
+    ("idempotency_key", "VARCHAR"),
+    ("artifacts", "JSON"),
+    ("storage_bytes", "INTEGER DEFAULT 0"),
+    ("intermediate_bytes", "INTEGER DEFAULT 0"),
+    ("last_accessed_at", "DATETIME"),
+    ("sora_job_id", "VARCHAR"),
+    ("remix_of", "VARCHAR"),
+    ("remix_prompt", "TEXT"),
+    ("preview_mode", "VARCHAR"),
+    ("preview_path", "VARCHAR"),
+    ("preview_decision", "VARCHAR"),
+    ("similar_to", "VARCHAR"),
+    ("similarity", "FLOAT"),
+    ("reused_from", "VARCHAR"),
+    ("stage", "VARCHAR"),
+    ("stage_started_at", "DATETIME"),
+    ("render_progress", "INTEGER"),
+    ("hls_path", "VARCHAR"),
+    ("storyboard", "BOOLEAN DEFAULT 0"),
+    ("plan_id", "VARCHAR"),
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_videos_status_created_at ON videos (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_videos_fingerprint ON videos (fingerprint)",
+    "CREATE INDEX IF NOT EXISTS ix_videos_coalesced_into ON videos (coalesced_into)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_videos_idempotency_key ON videos (idempotency_key)",
+    "CREATE INDEX IF NOT EXISTS ix_videos_remix_of ON videos (remix_of)",
+]
+
 if db_path.exists():
     conn = sqlite3.connect(str(db_path))
     cursor = conn.cursor()
-    
-    # Check if duration column exists
+
+    # Check which columns exist
     cursor.execute("PRAGMA table_info(videos)")
     columns = [column[1] for column in cursor.fetchall()]
-    
-    if 'duration' not in columns:
-        print("Adding duration column to videos table...")
-        cursor.execute("ALTER TABLE videos ADD COLUMN duration INTEGER")
-        conn.commit()
+
+    added = 0
+    for name, column_type in COLUMNS:
+        if name not in columns:
+            print(f"Adding {name} column to videos table...")
+            cursor.execute(f"ALTER TABLE videos ADD COLUMN {name} {column_type}")
+            added += 1
+
+    for statement in INDEXES:
+        cursor.execute(statement)
+
+    conn.commit()
+    if added:
         print("✓ Migration completed successfully!")
     else:
-        print("Duration column already exists, no migration needed.")
-    
+        print("All columns already exist, no migration needed.")
+
     conn.close()
 else:
     print("Database doesn't exist yet. It will be created with the new schema.")
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, Text, JSON
+from sqlalchemy import create_engine, event, text, Column, String, DateTime, Integer, Float, Boolean, Text, JSON, Index
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -7,7 +8,17 @@ import uuid
 from config.settings import settings
 
 Base = declarative_base()
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False, "timeout": 30})
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets API processes read while workers write job state
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 class Video(Base):
@@ -20,22 +31,70 @@ class Video(Base):
     voice = Column(String, nullable=False)
     keywords = Column(JSON, nullable=True)
     negative_keywords = Column(JSON, nullable=True)
+    size = Column(String, nullable=True)  # Requested resolution, e.g. "1280x720"
+    batch_id = Column(String, nullable=True)  # Set for rows created by POST /api/videos/batch
+    
+    # Single-flight coalescing
+    fingerprint = Column(String, nullable=True, index=True)  # Hash of the normalized job parameters
+    coalesced_into = Column(String, nullable=True, index=True)  # Leader job whose artifacts this row shares
+    idempotency_key = Column(String, nullable=True, unique=True)  # From the Idempotency-Key header
     
     # Generated content
     prompts = Column(JSON, nullable=True)
+    best_prompt = Column(Text, nullable=True)
+    narration_text = Column(Text, nullable=True)
     image_paths = Column(JSON, nullable=True)
     audio_path = Column(String, nullable=True)
     video_path = Column(String, nullable=True)
-    duration = Column(Integer, nullable=True)  # Duration in seconds
+    duration = Column(Integer, nullable=True)  # Duration in seconds (requested until completed)
+    storyboard = Column(Boolean, default=False)  # One Sora clip per scene, joined and stretched to the narration
+    sora_job_id = Column(String, nullable=True)  # Upstream Sora job that produced video_path
+    
+    # Near-duplicate reuse
+    similar_to = Column(String, nullable=True)  # Most similar completed job found at submission
+    similarity = Column(Float, nullable=True)  # Estimated script similarity to similar_to
+    reused_from = Column(String, nullable=True)  # Job whose plan and reference images were reused
+    plan_id = Column(String, nullable=True)  # Plan prepared by POST /api/plan before submission
+    
+    # Preview tier
+    preview_mode = Column(String, nullable=True)  # off, auto or approval
+    preview_path = Column(String, nullable=True)  # Short sora-2 draft rendered before the full video
+    hls_path = Column(String, nullable=True)  # HLS master playlist of the final video's rendition ladder
+    preview_decision = Column(String, nullable=True)  # approved or rejected (approval mode)
+    
+    # Remixes
+    remix_of = Column(String, nullable=True, index=True)  # Source video this row remixes
+    remix_prompt = Column(Text, nullable=True)  # Change requested from the source
+    
+    # Stored artifacts
+    artifacts = Column(JSON, nullable=True)  # Manifest: files with url, bytes and kind (final/intermediate)
+    storage_bytes = Column(Integer, default=0)  # Total bytes on disk, summed for quota checks
+    intermediate_bytes = Column(Integer, default=0)  # Bytes evictable without losing the final video
+    last_accessed_at = Column(DateTime, nullable=True)  # Last time an artifact was served
     
     # Status
-    status = Column(String, default="pending")  # pending, processing, completed, failed
+    status = Column(String, default="pending")  # pending, processing, awaiting_approval, completed, failed, cancelled, evicted
     error_message = Column(Text, nullable=True)
     
+    # Live progress, for completion estimates
+    stage = Column(String, nullable=True)  # Workflow step being run (plan, images, audio, preview, video, mux, remix)
+    stage_started_at = Column(DateTime, nullable=True)
+    render_progress = Column(Integer, nullable=True)  # Sora's progress (0-100) while rendering
+    
+    # Job lease, held by the worker running this video
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index("ix_videos_status_created_at", "status", "created_at"),
+    )
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -49,13 +108,81 @@ class Video(Base):
             "image_paths": self.image_paths,
             "audio_path": self.audio_path,
             "video_path": self.video_path,
+            "preview_path": self.preview_path,
+            "preview_mode": self.preview_mode,
+            "hls_path": self.hls_path,
             "duration": self.duration,
+            "storyboard": bool(self.storyboard),
             "status": self.status,
             "error_message": self.error_message,
+            "coalesced_into": self.coalesced_into,
+            "remix_of": self.remix_of,
+            "similar_to": self.similar_to,
+            "similarity": self.similarity,
+            "reused_from": self.reused_from,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
 
+class WebhookEvent(Base):
+    """A verified inbound webhook delivery; the primary key deduplicates retries"""
+    __tablename__ = "webhook_events"
+    
+    id = Column(String, primary_key=True)  # webhook-id header
+    job_id = Column(String, nullable=True, index=True)  # Upstream Sora job id
+    type = Column(String, nullable=True)
+    payload = Column(JSON, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class StageEstimate(Base):
+    """Streaming quantile sketches of one workflow stage's duration (see services.eta_service)"""
+    __tablename__ = "stage_estimates"
+    
+    key = Column(String, primary_key=True)  # stage|model|size|duration|style, "*" for any
+    stage = Column(String, nullable=False)
+    samples = Column(Integer, default=0)
+    sketches = Column(JSON, nullable=True)  # P² marker state per quantile
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class Plan(Base):
+    """A plan (and optionally reference images and narration) prepared ahead of submission"""
+    __tablename__ = "plans"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    fingerprint = Column(String, nullable=False, index=True)  # Hash of the inputs, so repeated requests share a plan
+    script = Column(Text, nullable=False)
+    style = Column(String, nullable=False)
+    voice = Column(String, nullable=True)
+    keywords = Column(JSON, nullable=True)
+    negative_keywords = Column(JSON, nullable=True)
+    with_images = Column(Boolean, default=False)
+    with_audio = Column(Boolean, default=False)
+    
+    prompts = Column(JSON, nullable=True)
+    best_prompt = Column(Text, nullable=True)
+    narration_text = Column(Text, nullable=True)
+    image_paths = Column(JSON, nullable=True)
+    audio_path = Column(String, nullable=True)
+    
+    status = Column(String, default="planning")  # planning, ready or failed
+    error_message = Column(Text, nullable=True)
+    # A "planning" row past this was abandoned by its process; any row past it is pruned
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "prompts": self.prompts,
+            "best_prompt": self.best_prompt,
+            "narration_text": self.narration_text,
+            "image_paths": self.image_paths,
+            "audio_path": self.audio_path,
+            "error_message": self.error_message,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None
+        }
+
 def get_db():
     db = SessionLocal()
     try:
@@ -63,5 +190,49 @@ def get_db():
     finally:
         db.close()
 
+# Full-text index over title, script and prompts. It is an external-content
+# FTS5 table (rows are read back from videos by rowid) kept in sync by
+# triggers; the update trigger only fires when an indexed column changes.
+# VACUUM can renumber videos rowids, so run rebuild_search_index() after one.
+SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+        title, script, prompts,
+        content='videos', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS videos_fts_insert AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts(rowid, title, script, prompts) VALUES (new.rowid, new.title, new.script, new.prompts);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS videos_fts_delete AFTER DELETE ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, script, prompts) VALUES ('delete', old.rowid, old.title, old.script, old.prompts);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS videos_fts_update AFTER UPDATE OF title, script, prompts ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, script, prompts) VALUES ('delete', old.rowid, old.title, old.script, old.prompts);
+        INSERT INTO videos_fts(rowid, title, script, prompts) VALUES (new.rowid, new.title, new.script, new.prompts);
+    END""",
+]
+
+def init_search_index() -> bool:
+    """Create the FTS5 index and its triggers; returns False if FTS5 is unavailable"""
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'videos_fts'")).first()
+            for statement in SEARCH_INDEX_DDL:
+                conn.execute(text(statement))
+            if not existed:
+                # Index rows written before the index existed
+                conn.execute(text("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')"))
+        return True
+    except OperationalError as e:
+        print(f"Full-text search disabled: {str(e)}")
+        return False
+
+def rebuild_search_index():
+    """Re-index every row from scratch (e.g. after VACUUM)"""
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')"))
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    init_search_index()
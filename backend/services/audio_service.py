@@ -1,25 +1,126 @@
 from pathlib import Path
+from typing import List
+import asyncio
+import hashlib
+import os
+import re
 from openai import AsyncOpenAI
 
 from config.settings import settings
 from config.presets import NARRATION_VOICES
+from services.storage_service import storage
+
+# MPEG audio Layer III bitrates (kbps) by header index, for MPEG-1 and MPEG-2/2.5
+_MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+def split_narration(text: str, max_chars: int) -> List[str]:
+    """
+    Split text into chunks of at most ``max_chars``, breaking between sentences
+
+    A sentence longer than ``max_chars`` is broken between words instead.
+    """
+    sentences = [s for s in re.split(r"(?<=[.!?…])\s+", text.strip()) if s]
+    chunks: List[str] = []
+    current = ""
+    for sentence in sentences:
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _mp3_frame_length(header: bytes) -> int:
+    """Byte length of the Layer III frame starting with ``header``, or 0 if it isn't one"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return 0
+    version = (header[1] >> 3) & 0x03  # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or (header[1] >> 1) & 0x03 != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return 0
+    bitrate = _MP3_BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    return (144 if version == 3 else 72) * bitrate // sample_rate + padding
+
+def mp3_duration(path: Path) -> float:
+    """
+    Playing time of an MP3 in seconds, by walking its Layer III frames
+
+    Works on narration files (plain concatenated frames) without decoding;
+    bytes that aren't a frame header (tags, junk) are skipped. Blocking.
+    """
+    data = Path(path).read_bytes()
+    seconds = 0.0
+    position = 0
+    while position + 4 <= len(data):
+        header = data[position:position + 4]
+        frame_length = _mp3_frame_length(header)
+        if not frame_length:
+            position += 1
+            continue
+        version = (header[1] >> 3) & 0x03
+        sample_rate = _MP3_SAMPLE_RATES[version][(header[2] >> 2) & 0x03]
+        seconds += (1152 if version == 3 else 576) / sample_rate
+        position += frame_length
+    return seconds
+
+def strip_mp3_metadata(data: bytes) -> bytes:
+    """
+    Remove ID3 tags and the Xing/Info header frame from an MP3
+
+    What remains is plain audio frames, so several files can be joined by
+    concatenating bytes (no decode/re-encode) without stale tags or a
+    duration header describing only the first piece.
+    """
+    start, end = 0, len(data)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        start = 10 + size + footer
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    frame_length = _mp3_frame_length(data[start:start + 4])
+    if frame_length and (b"Xing" in data[start:start + 64] or b"Info" in data[start:start + 64]):
+        start += frame_length
+    return data[start:end]
 
 class AudioService:
     """Service for generating narration audio using OpenAI TTS"""
     
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        self.audio_dir = settings.AUDIO_DIR
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+        self._slots = asyncio.Semaphore(max(1, settings.TTS_CONCURRENCY))
     
     async def generate_narration(self, text: str, voice: str, video_id: str) -> str:
         """
         Generate narration audio from text
         
+        Long text is split at sentence boundaries into chunks of at most
+        TTS_CHUNK_CHARS that are synthesized concurrently (TTS_CONCURRENCY at
+        a time) and joined frame-by-frame. Chunks are cached by content, so
+        editing one paragraph only re-synthesizes that chunk.
+        
         Args:
             text: Script text to narrate
             voice: Voice ID to use
             video_id: Unique identifier for the video
-            
+        
         Returns:
             File path to generated audio
         """
@@ -28,32 +129,65 @@ class AudioService:
             voice_config = NARRATION_VOICES.get(voice, NARRATION_VOICES["alloy"])
             voice_id = voice_config["voice_id"]
             
-            print(f"  Generating narration with voice: {voice_config['name']}...")
+            chunks = split_narration(text, settings.TTS_CHUNK_CHARS)
+            if not chunks:
+                raise Exception("No narration text")
+            print(f"  Generating narration with voice: {voice_config['name']} ({len(chunks)} chunks)...")
             
-            # Generate audio with OpenAI TTS
-            response = await self.client.audio.speech.create(
-                model=settings.OPENAI_TTS_MODEL,
-                voice=voice_id,
-                input=text,
-                response_format="mp3"
-            )
+            # Generate audio with OpenAI TTS, one cached file per chunk
+            chunk_files = await asyncio.gather(*(self._synthesize_chunk(chunk, voice_id) for chunk in chunks))
             
             # Save audio file
             audio_path = self._get_audio_path(video_id)
             audio_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Stream to file
-            await response.astream_to_file(str(audio_path))
+            await asyncio.to_thread(self._concatenate, chunk_files, audio_path)
             
             print(f"  ✓ Audio saved: {audio_path}")
             
             # Return URL path instead of file system path
-            return f"/audio/{video_id}/narration.mp3"
-            
+            return storage.audio_url(video_id)
+        
         except Exception as e:
             print(f"  ✗ Failed to generate audio: {str(e)}")
             raise
     
+    async def _synthesize_chunk(self, text: str, voice_id: str) -> Path:
+        """Synthesize one chunk, or reuse the cached audio for identical text and voice"""
+        key = hashlib.sha256(f"{settings.OPENAI_TTS_MODEL}\0{voice_id}\0mp3\0{text}".encode("utf-8")).hexdigest()
+        cached = storage.tts_cache_file(key)
+        if cached.exists():
+            # Refresh the mtime so the cache pruner keeps recently used chunks
+            os.utime(cached)
+            return cached
+        
+        async with self._slots:
+            response = await self.client.audio.speech.create(
+                model=settings.OPENAI_TTS_MODEL,
+                voice=voice_id,
+                input=text,
+                response_format="mp3"
+            )
+            data = await response.aread()
+        
+        await asyncio.to_thread(self._write_cache, cached, strip_mp3_metadata(data))
+        return cached
+    
+    @staticmethod
+    def _write_cache(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent jobs may synthesize the same chunk; the rename keeps the file whole
+        partial = path.with_name(f"{path.name}.{os.getpid()}.{id(data)}.partial")
+        partial.write_bytes(data)
+        partial.replace(path)
+    
+    @staticmethod
+    def _concatenate(chunk_files: List[Path], target: Path):
+        with open(target, "wb") as out:
+            for chunk_file in chunk_files:
+                with open(chunk_file, "rb") as f:
+                    while block := f.read(1024 * 1024):
+                        out.write(block)
+    
     def _get_audio_path(self, video_id: str) -> Path:
         """Get the path for the audio file"""
-        return self.audio_dir / video_id / "narration.mp3"
+        return storage.audio_file(video_id)
@@ -0,0 +1,408 @@
+"""
+Completion estimates from historical stage durations
+
+Every finished job adds its per-stage wall-clock times to P² streaming
+quantile sketches (five markers each, constant memory, no stored samples)
+keyed by stage, Sora model, size, duration and style. The sketches live in
+the ``stage_estimates`` table so API and worker processes share them.
+
+The medians give a job's ETA, combined with its place in the queue and the
+live Sora ``progress`` of the render; the 95th percentiles set the Sora
+timeout, so it follows how long renders of that kind actually take.
+"""
+
+from bisect import insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+import math
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from models.database import SessionLocal, StageEstimate, Video
+
+ETA_QUANTILE = 0.5
+TIMEOUT_QUANTILE = 0.95
+QUANTILES = (ETA_QUANTILE, TIMEOUT_QUANTILE)
+
+RENDER_STAGES = ("preview", "video", "remix")
+
+# Attempts to add a sample to a sketch another process is writing at the same time
+RECORD_ATTEMPTS = 5
+
+# Overall progress (%) of a typical job when each stage starts, and where
+# renders end (Sora's own progress moves a job between the two)
+STAGE_PROGRESS = {"plan": 0, "images": 5, "audio": 20, "preview": 30, "video": 40, "remix": 0, "mux": 95, "hls": 97}
+RENDER_END_PROGRESS = {"preview": 40, "video": 95, "remix": 95}
+
+# Guesses used until a stage has ETA_MIN_SAMPLES finished runs
+DEFAULT_STAGE_SECONDS = {
+    "plan": 15.0,
+    "images": 30.0,
+    "audio": 15.0,
+    "preview": 90.0,
+    "video": 240.0,
+    "mux": 5.0,
+    "hls": 60.0,
+    "remix": 240.0,
+}
+
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile (Jain & Chlamtac's P² algorithm)
+
+    Keeps five markers: the minimum, the maximum, the target quantile and
+    the two half-way quantiles. Each new value shifts marker positions and
+    adjusts heights with a piecewise-parabolic fit.
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self.heights: List[float] = []
+        self.positions = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.desired = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, value: float):
+        self.count += 1
+        q = self.heights
+        if len(q) < 5:
+            insort(q, value)
+            return
+
+        if value < q[0]:
+            q[0] = value
+            cell = 0
+        elif value >= q[4]:
+            q[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if q[i] <= value < q[i + 1])
+
+        n = self.positions
+        for i in range(cell + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            offset = self.desired[i] - n[i]
+            if (offset >= 1 and n[i + 1] - n[i] > 1) or (offset <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = height
+                n[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if not self.heights:
+            return None
+        if len(self.heights) < 5:
+            # Too few values for markers yet: the exact quantile of what we have
+            return self.heights[min(len(self.heights) - 1, round(self.p * (len(self.heights) - 1)))]
+        return self.heights[2]
+
+    def to_dict(self) -> Dict:
+        return {
+            "p": self.p,
+            "count": self.count,
+            "heights": self.heights,
+            "positions": self.positions,
+            "desired": self.desired,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "P2Quantile":
+        sketch = cls(data["p"])
+        sketch.count = data["count"]
+        sketch.heights = list(data["heights"])
+        sketch.positions = list(data["positions"])
+        sketch.desired = list(data["desired"])
+        return sketch
+
+
+def sora_clip_seconds(duration: Optional[int]) -> int:
+    """Length of the clip Sora renders for a requested duration (4, 8 or 12 seconds)"""
+    duration = duration or 8
+    if duration <= 4:
+        return 4
+    if duration <= 8:
+        return 8
+    return 12
+
+
+def stage_keys(stage: str, size: Optional[str], duration: Optional[int], style: Optional[str]) -> List[str]:
+    """
+    Sketch keys for a stage, most specific first
+
+    Each sample is recorded at every level, so a combination with little
+    history falls back to the same stage for any style, then for any job.
+    Durations are keyed by the clip length Sora renders, so a job asking for
+    10 seconds shares its history with the 12-second renders it produces.
+    """
+    if stage == "preview":
+        model, duration = settings.PREVIEW_MODEL, settings.PREVIEW_DURATION
+    else:
+        model = settings.SORA_MODEL
+    seconds = sora_clip_seconds(duration)
+    keys = [
+        f"{stage}|{model}|{size or '*'}|{seconds}|{style or '*'}",
+        f"{stage}|{model}|{size or '*'}|{seconds}|*",
+        f"{stage}|*|*|*|*",
+    ]
+    return list(dict.fromkeys(keys))
+
+
+class StageHistory:
+    """Per-process cache of the stage sketches, refreshed every ETA_REFRESH_INTERVAL"""
+
+    def __init__(self):
+        self._sketches: Dict[str, Dict[float, P2Quantile]] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        if time.monotonic() - self._loaded_at < settings.ETA_REFRESH_INTERVAL:
+            return
+        db = SessionLocal()
+        try:
+            rows = db.query(StageEstimate.key, StageEstimate.sketches).all()
+        finally:
+            db.close()
+        self._sketches = {key: _load_sketches(data) for key, data in rows}
+        self._loaded_at = time.monotonic()
+
+    def quantile(self, keys: Iterable[str], q: float) -> Optional[float]:
+        """The ``q`` quantile from the most specific key with enough history"""
+        with self._lock:
+            self._refresh()
+            for key in keys:
+                sketch = self._sketches.get(key, {}).get(q)
+                if sketch and sketch.count >= settings.ETA_MIN_SAMPLES:
+                    return sketch.value()
+        return None
+
+    def expected(self, stage: str, size: Optional[str], duration: Optional[int], style: Optional[str]) -> float:
+        seconds = self.quantile(stage_keys(stage, size, duration, style), ETA_QUANTILE)
+        return seconds if seconds is not None else DEFAULT_STAGE_SECONDS.get(stage, 0.0)
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+
+stage_history = StageHistory()
+
+
+def _load_sketches(data: Optional[Dict]) -> Dict[float, P2Quantile]:
+    return {float(q): P2Quantile.from_dict(sketch) for q, sketch in (data or {}).items()}
+
+
+def _add_sample(db: Session, key: str, stage: str, seconds: float) -> bool:
+    """
+    Add one value to a key's sketches; False if another writer got there first
+
+    The sample count acts as a version: the row is only rewritten if it
+    still has the count it was read with.
+    """
+    row = db.query(StageEstimate.samples, StageEstimate.sketches).filter(StageEstimate.key == key).first()
+    sketches = _load_sketches(row.sketches if row else None)
+    for q in QUANTILES:
+        sketches.setdefault(q, P2Quantile(q)).add(seconds)
+    values = {
+        "sketches": {str(q): sketch.to_dict() for q, sketch in sketches.items()},
+        "samples": sketches[ETA_QUANTILE].count,
+        "updated_at": datetime.utcnow(),
+    }
+    try:
+        if row is None:
+            db.add(StageEstimate(key=key, stage=stage, **values))
+            db.commit()
+            return True
+        updated = (
+            db.query(StageEstimate)
+            .filter(StageEstimate.key == key, StageEstimate.samples == row.samples)
+            .update(values, synchronize_session=False)
+        )
+        db.commit()
+        return bool(updated)
+    except IntegrityError:
+        # Another writer created the row first
+        db.rollback()
+        return False
+
+
+def record_stage_durations(size: Optional[str], duration: Optional[int], style: Optional[str], durations: Dict[str, float]):
+    """
+    Add a finished job's stage times to the shared sketches (blocking)
+
+    ``duration`` is the one the job asked for, as used by the lookups.
+    Workers in several processes record at once, so each sketch is updated
+    with a compare-and-swap and re-read if it changed underneath.
+    """
+    db = SessionLocal()
+    try:
+        for stage, seconds in durations.items():
+            for key in stage_keys(stage, size, duration, style):
+                if not any(_add_sample(db, key, stage, seconds) for _ in range(RECORD_ATTEMPTS)):
+                    print(f"Gave up recording a {stage} sample for {key} after {RECORD_ATTEMPTS} conflicting writes")
+    finally:
+        db.close()
+    stage_history.invalidate()
+
+
+def sora_timeout(stage: str, size: Optional[str], duration: Optional[int], style: Optional[str]) -> float:
+    """
+    How long to wait for a Sora render of this kind
+
+    SORA_TIMEOUT_FACTOR times the 95th percentile of past renders, within
+    [SORA_MIN_WAIT_TIME, SORA_TIMEOUT_CAP]; SORA_MAX_WAIT_TIME until there is
+    enough history. Blocking (may read the database).
+    """
+    p95 = stage_history.quantile(stage_keys(stage, size, duration, style), TIMEOUT_QUANTILE)
+    if p95 is None:
+        return float(settings.SORA_MAX_WAIT_TIME)
+    return min(max(p95 * settings.SORA_TIMEOUT_FACTOR, settings.SORA_MIN_WAIT_TIME), settings.SORA_TIMEOUT_CAP)
+
+
+def report_stage(video_id: str, stage: str):
+    """Note that a job entered ``stage`` (blocking; shown in its ETA)"""
+    db = SessionLocal()
+    try:
+        db.query(Video).filter(Video.id == video_id).update(
+            {Video.stage: stage, Video.stage_started_at: datetime.utcnow(), Video.render_progress: None},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def report_progress(video_id: str, progress: int):
+    """Store the live Sora progress (0-100) of a job's render (blocking)"""
+    db = SessionLocal()
+    try:
+        db.query(Video).filter(Video.id == video_id).update(
+            {Video.render_progress: progress}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def overall_progress(status: str, stage: Optional[str], render_progress: Optional[int]) -> Optional[int]:
+    """Rough 0-100 progress of a job from its stage and Sora render progress"""
+    if status == "completed":
+        return 100
+    if status == "pending":
+        return 0
+    if status != "processing" or stage not in STAGE_PROGRESS:
+        return None
+    start = STAGE_PROGRESS[stage]
+    if stage in RENDER_END_PROGRESS and render_progress:
+        return start + (RENDER_END_PROGRESS[stage] - start) * min(render_progress, 100) // 100
+    return start
+
+
+def _remaining_stages(video: Video) -> List[str]:
+    """Stages a job still has to run, in order"""
+    finishing = [stage for stage, enabled in (("mux", settings.ENABLE_AUDIO_MUX), ("hls", settings.ENABLE_HLS)) if enabled]
+    if video.remix_of:
+        return ["remix"] + finishing
+    stages = []
+    if not (video.prompts and video.best_prompt):
+        stages.append("plan")
+    if not video.image_paths:
+        stages.append("images")
+    if not video.audio_path:
+        stages.append("audio")
+    if (video.preview_mode or "off") != "off" and not video.preview_path:
+        stages.append("preview")
+    stages.append("video")
+    return stages + finishing
+
+
+def _remaining_seconds(video: Video, now: datetime) -> float:
+    expected = lambda stage: stage_history.expected(stage, video.size, video.duration, video.style)
+    stages = _remaining_stages(video)
+    if video.status != "processing" or video.stage not in stages:
+        return sum(expected(stage) for stage in stages)
+
+    current = stages.index(video.stage)
+    elapsed = (now - video.stage_started_at).total_seconds() if video.stage_started_at else 0.0
+    progress = video.render_progress or 0
+    if video.stage in RENDER_STAGES and progress >= 5:
+        # Extrapolate the render from Sora's own progress
+        left = elapsed * (100 - progress) / progress
+    else:
+        left = expected(video.stage) - elapsed
+        if left <= 0:
+            # Running long: assume it is somewhere towards the slow tail
+            slow = stage_history.quantile(stage_keys(video.stage, video.size, video.duration, video.style), TIMEOUT_QUANTILE)
+            left = max((slow or 0.0) - elapsed, expected(video.stage) * 0.1)
+    return left + sum(expected(stage) for stage in stages[current + 1:])
+
+
+def estimate_etas(db: Session, videos: List[Video]) -> Dict[str, float]:
+    """
+    Seconds until each unfinished job is expected to complete
+
+    Pending jobs also wait for the jobs queued ahead of them, spread over
+    the running workers' slots. Followers of a coalesced job get their
+    leader's estimate. Finished jobs and jobs waiting for a person
+    (preview approval) have no estimate.
+    """
+    waiting = {"pending", "processing"}
+    leader_ids = {v.coalesced_into for v in videos if v.coalesced_into and v.status in waiting}
+    leaders = {v.id: v for v in videos}
+    missing = leader_ids - set(leaders)
+    if missing:
+        leaders.update({v.id: v for v in db.query(Video).filter(Video.id.in_(list(missing)))})
+
+    now = datetime.utcnow()
+    slots: Optional[int] = None
+    etas: Dict[str, float] = {}
+    for video in videos:
+        job = leaders.get(video.coalesced_into, video) if video.coalesced_into else video
+        if video.status not in waiting or job.status not in waiting:
+            continue
+        seconds = _remaining_seconds(job, now)
+        if job.status == "pending":
+            if slots is None:
+                slots = _worker_slots(db)
+            # Jobs ahead drain through the slots at about one job length each
+            seconds += math.floor(_queued_ahead(db, job.created_at) / slots) * seconds
+        etas[video.id] = round(seconds, 1)
+    return etas
+
+
+def _queued_ahead(db: Session, created_at: datetime) -> int:
+    """Queued leaders created before ``created_at`` (counted on ix_videos_status_created_at)"""
+    return (
+        db.query(func.count(Video.id))
+        .filter(Video.status == "pending", Video.created_at < created_at, Video.coalesced_into.is_(None))
+        .scalar()
+    ) or 0
+
+
+def _worker_slots(db: Session) -> int:
+    """Jobs the running workers can take at once"""
+    workers = (
+        db.query(func.count(func.distinct(Video.lease_owner)))
+        .filter(Video.status == "processing", Video.lease_owner.isnot(None))
+        .scalar()
+    ) or 1
+    return max(1, workers * settings.WORKER_CONCURRENCY)
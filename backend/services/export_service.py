@@ -0,0 +1,63 @@
+"""
+Streaming NDJSON export of the video catalog
+
+Rows are read through a server-side cursor in fixed-size batches and
+encoded one batch at a time, so memory stays flat no matter how large the
+table is. Used by GET /api/videos/export and export_catalog.py.
+"""
+
+from datetime import datetime
+from typing import Iterator, List, Optional
+import json
+import zlib
+
+from config.settings import settings
+from models.database import SessionLocal, Video
+
+
+def iter_ndjson(
+    statuses: Optional[List[str]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    Yield the catalog as NDJSON, one chunk per batch of rows
+
+    Opens its own session (a streaming response outlives the request's
+    session) and orders by (created_at, id) so the output is stable.
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    db = SessionLocal()
+    try:
+        query = db.query(Video)
+        if statuses:
+            query = query.filter(Video.status.in_(statuses))
+        if created_from:
+            query = query.filter(Video.created_at >= created_from)
+        if created_to:
+            query = query.filter(Video.created_at < created_to)
+        query = query.order_by(Video.created_at, Video.id).execution_options(stream_results=True)
+
+        lines = []
+        for video in query.yield_per(batch_size):
+            lines.append(json.dumps(video.to_dict(), ensure_ascii=False))
+            if len(lines) >= batch_size:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+                lines.clear()
+                # Drop the yielded rows from the session so it doesn't grow
+                db.expunge_all()
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+    finally:
+        db.close()
+
+
+def gzip_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -2,16 +2,17 @@ import asyncio
 from pathlib import Path
 from typing import List
 from openai import AsyncOpenAI
+import aiofiles
 import httpx
 
 from config.settings import settings
+from services.storage_service import storage
 
 class ImageService:
     """Service for generating images using DALL-E 3"""
     
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        self.images_dir = settings.IMAGES_DIR
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
     
     async def generate_images(self, prompts: List[str], video_id: str) -> List[str]:
         """
@@ -78,7 +79,7 @@ class ImageService:
                         raise
         
         # Convert file paths to URL paths
-        url_paths = [f"/images/{video_id}/image_{idx:03d}.png" for idx in range(len(image_paths))]
+        url_paths = [storage.image_url(video_id, idx) for idx in range(len(image_paths))]
         return url_paths
     
     def _sanitize_prompt(self, prompt: str) -> str:
@@ -98,12 +99,16 @@ class ImageService:
     
     async def _create_placeholder_image(self, video_id: str, index: int, message: str) -> Path:
         """Create a simple placeholder image when generation fails"""
-        from PIL import Image, ImageDraw, ImageFont
-        
-        video_dir = self.images_dir / video_id
-        video_dir.mkdir(parents=True, exist_ok=True)
+        image_path = storage.image_file(video_id, index)
+        # Pillow rendering and the PNG encode are CPU-bound: keep them off the event loop
+        await asyncio.to_thread(self._render_placeholder, image_path, index, message)
+        return image_path
+    
+    @staticmethod
+    def _render_placeholder(image_path: Path, index: int, message: str):
+        from PIL import Image, ImageDraw
         
-        image_path = video_dir / f"image_{index:03d}.png"
+        image_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Create a simple colored image with text
         img = Image.new('RGB', (1024, 1024), color=(50, 50, 80))
@@ -118,20 +123,18 @@ class ImageService:
         draw.text(position, text, fill=(200, 200, 200))
         
         img.save(image_path)
-        return image_path
     
     async def _download_image(self, url: str, video_id: str, index: int) -> Path:
         """Download image from URL and save to disk"""
-        video_dir = self.images_dir / video_id
-        video_dir.mkdir(parents=True, exist_ok=True)
-        
-        image_path = video_dir / f"image_{index:03d}.png"
+        image_path = storage.image_file(video_id, index)
+        await asyncio.to_thread(image_path.parent.mkdir, parents=True, exist_ok=True)
         
         async with httpx.AsyncClient() as client:
             response = await client.get(url)
             response.raise_for_status()
             
-            with open(image_path, "wb") as f:
-                f.write(response.content)
+            # Write without blocking the loop that every other job's polls run on
+            async with aiofiles.open(image_path, "wb") as f:
+                await f.write(response.content)
         
         return image_path
@@ -0,0 +1,163 @@
+"""
+Event loop lag monitor and blocking-call detector
+
+The API, the embedded worker and every Sora poll share one event loop, so
+any synchronous work in a coroutine (a blocking file write, Pillow
+rendering, a slow sync query) stalls all of them. A sampler task sleeps for
+LOOP_MONITOR_INTERVAL and measures how late it wakes up: that delay is the
+loop lag. With LOOP_DEBUG, a watchdog thread also notices when the sampler
+has not run for LOOP_BLOCK_THRESHOLD_MS and logs the loop thread's stack
+while it is still blocked, which names the offending call.
+
+Both are exported by ``GET /metrics`` (Prometheus text format).
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+import asyncio
+import sys
+import threading
+import time
+import traceback
+
+from config.settings import settings
+from services.eta_service import P2Quantile
+
+LAG_QUANTILES = (0.5, 0.99)
+
+
+class LoopMonitor:
+    """Samples the running loop's lag and, in debug mode, captures blocking stacks"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._loop_thread_id: Optional[int] = None
+        self._beat = time.monotonic()
+        self._quantiles = {q: P2Quantile(q) for q in LAG_QUANTILES}
+        self.samples = 0
+        self.lag_sum = 0.0
+        self.lag_max = 0.0
+        self.last_lag = 0.0
+        self.slow_ticks = 0  # Samples lagging more than LOOP_LAG_WARN_MS
+        self.blocked = 0  # Stalls over LOOP_BLOCK_THRESHOLD_MS caught by the watchdog
+        self.stalls: Deque[Dict] = deque(maxlen=20)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """Start sampling the current event loop (and the watchdog with LOOP_DEBUG)"""
+        if self._task or settings.LOOP_MONITOR_INTERVAL <= 0:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._sample())
+        if settings.LOOP_DEBUG:
+            self._stopping.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        print(f"Event loop monitor started (debug={'on' if settings.LOOP_DEBUG else 'off'})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._stopping.set()
+            await asyncio.to_thread(self._watchdog.join, 1.0)
+            self._watchdog = None
+
+    async def _sample(self):
+        interval = settings.LOOP_MONITOR_INTERVAL
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._beat = now
+            self._record(max(0.0, now - started - interval))
+
+    def _record(self, lag: float):
+        with self._lock:
+            self.samples += 1
+            self.lag_sum += lag
+            self.last_lag = lag
+            self.lag_max = max(self.lag_max, lag)
+            for sketch in self._quantiles.values():
+                sketch.add(lag)
+            slow = lag * 1000 >= settings.LOOP_LAG_WARN_MS
+            if slow:
+                self.slow_ticks += 1
+        if slow:
+            print(f"⚠ Event loop lagged {lag * 1000:.0f} ms")
+
+    def _watch(self):
+        """Watchdog thread: report the loop thread's stack while it is blocked"""
+        threshold = settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+        interval = settings.LOOP_MONITOR_INTERVAL
+        reported = None
+        while not self._stopping.wait(max(threshold / 4, 0.01)):
+            beat = self._beat
+            blocked_for = time.monotonic() - beat - interval
+            if blocked_for < threshold or beat == reported:
+                continue
+            # Report each stall once, while the blocking call is still on the stack
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            with self._lock:
+                self.blocked += 1
+                self.stalls.append({
+                    "at": datetime.utcnow().isoformat(),
+                    "blocked_ms": round(blocked_for * 1000),
+                    "stack": stack,
+                })
+            print(f"⚠ Event loop blocked for {blocked_for * 1000:.0f} ms+, loop thread stack:\n{stack}")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "samples": self.samples,
+                "lag_sum": self.lag_sum,
+                "lag_max": self.lag_max,
+                "last_lag": self.last_lag,
+                "quantiles": {q: sketch.value() for q, sketch in self._quantiles.items()},
+                "slow_ticks": self.slow_ticks,
+                "blocked": self.blocked,
+                "stalls": list(self.stalls),
+            }
+
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        stats = self.snapshot()
+        lines: List[str] = [
+            "# HELP visionpulse_event_loop_lag_seconds Delay of the loop monitor's wake-ups",
+            "# TYPE visionpulse_event_loop_lag_seconds summary",
+        ]
+        for q, value in stats["quantiles"].items():
+            lines.append(f'visionpulse_event_loop_lag_seconds{{quantile="{q}"}} {value or 0.0:.6f}')
+        lines += [
+            f"visionpulse_event_loop_lag_seconds_sum {stats['lag_sum']:.6f}",
+            f"visionpulse_event_loop_lag_seconds_count {stats['samples']}",
+            "# HELP visionpulse_event_loop_lag_max_seconds Largest lag seen since start",
+            "# TYPE visionpulse_event_loop_lag_max_seconds gauge",
+            f"visionpulse_event_loop_lag_max_seconds {stats['lag_max']:.6f}",
+            "# HELP visionpulse_event_loop_slow_ticks_total Samples lagging more than LOOP_LAG_WARN_MS",
+            "# TYPE visionpulse_event_loop_slow_ticks_total counter",
+            f"visionpulse_event_loop_slow_ticks_total {stats['slow_ticks']}",
+            "# HELP visionpulse_event_loop_blocked_total Stalls over LOOP_BLOCK_THRESHOLD_MS (LOOP_DEBUG only)",
+            "# TYPE visionpulse_event_loop_blocked_total counter",
+            f"visionpulse_event_loop_blocked_total {stats['blocked']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,228 @@
+"""
+Local media processing with ffmpeg
+
+ffmpeg runs as a child process, so muxing and transcoding never block the
+event loop, and semaphores bound how many run at once. HLS transcodes get
+their own, smaller pool since each one encodes every rendition.
+"""
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+import asyncio
+import shutil
+
+from config.settings import settings
+
+# Video bitrate (kbps) per rendition short side; maxrate/bufsize derive from it
+HLS_BITRATES = {1080: 5000, 720: 2800, 480: 1400, 360: 800, 240: 400}
+
+
+def hls_ladder(size: str) -> List[Tuple[int, int]]:
+    """
+    (short side, kbps) rungs for a source of ``size`` ("WIDTHxHEIGHT")
+
+    Rungs larger than the source are dropped; a source smaller than every
+    configured rung gets a single rendition at its own size.
+    """
+    try:
+        width, height = (int(n) for n in size.lower().split("x"))
+        source = min(width, height)
+    except (AttributeError, ValueError):
+        source = 720
+    rungs = sorted({int(r) for r in settings.HLS_RENDITIONS.split(",") if r.strip()}, reverse=True)
+    rungs = [r for r in rungs if r <= source][:3] or [source - source % 2]
+    return [(r, HLS_BITRATES.get(r) or HLS_BITRATES[min(HLS_BITRATES, key=lambda k: abs(k - r))]) for r in rungs]
+
+
+class MediaService:
+    """Service for combining generated media files with ffmpeg"""
+
+    def __init__(self):
+        self._slots = asyncio.Semaphore(max(1, settings.FFMPEG_CONCURRENCY))
+        self._hls_slots = asyncio.Semaphore(max(1, settings.HLS_CONCURRENCY))
+
+    @property
+    def available(self) -> bool:
+        return shutil.which(settings.FFMPEG_PATH) is not None
+
+    async def mux_narration(self, video_path: Path, audio_path: Path) -> bool:
+        """
+        Add the narration as the video's audio track, in place
+
+        The video stream is copied, not re-encoded. The narration is encoded
+        to AAC and padded with silence or trimmed to the video's length.
+
+        Returns:
+            False if ffmpeg is unavailable or failed (the video is left untouched)
+        """
+        if not self.available:
+            print(f"  ⚠ {settings.FFMPEG_PATH} not found, keeping narration as a separate file")
+            return False
+
+        muxed = video_path.with_name(f"{video_path.stem}.muxing.mp4")
+        args = [
+            "-i", str(video_path),
+            "-i", str(audio_path),
+            "-map", "0:v:0",
+            "-map", "1:a:0",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            "-b:a", "128k",
+            "-af", "apad",  # Pad short narration with silence...
+            "-shortest",  # ...and cut everything at the end of the video
+            "-movflags", "+faststart",
+            str(muxed),
+        ]
+        if not await self.run_ffmpeg(args):
+            muxed.unlink(missing_ok=True)
+            return False
+
+        muxed.replace(video_path)
+        return True
+
+    async def concat_clips(self, clips: List[Path], target: Path) -> bool:
+        """
+        Join clips end to end into ``target`` with the concat demuxer (stream copy)
+
+        The clips must share codecs and parameters, as Sora renders of one
+        model and size do. Nothing is re-encoded, so this takes about as long
+        as copying the files.
+
+        Returns:
+            False if ffmpeg is unavailable or failed
+        """
+        if not self.available:
+            return False
+
+        listing = target.with_name(f"{target.stem}.concat.txt")
+        joined = target.with_name(f"{target.stem}.joining.mp4")
+        # Single quotes inside paths are escaped as the concat demuxer expects
+        lines = ["file '{}'".format(str(clip.resolve()).replace("'", "'\\''")) for clip in clips]
+        await asyncio.to_thread(listing.write_text, "\n".join(lines) + "\n")
+        try:
+            ok = await self.run_ffmpeg([
+                "-f", "concat",
+                "-safe", "0",
+                "-i", str(listing),
+                "-c", "copy",
+                "-movflags", "+faststart",
+                str(joined),
+            ])
+        finally:
+            listing.unlink(missing_ok=True)
+        if not ok:
+            joined.unlink(missing_ok=True)
+            return False
+
+        joined.replace(target)
+        return True
+
+    async def segment_hls(self, video_path: Path, target_dir: Path, size: str, with_audio: bool) -> bool:
+        """
+        Transcode a video into an HLS rendition ladder with a master playlist
+
+        One ffmpeg run decodes the source once and encodes every rung
+        (H.264 + AAC, keyframes forced on segment boundaries so players can
+        switch renditions at any segment). Output goes to a scratch directory
+        that replaces ``target_dir`` only when complete.
+
+        Returns:
+            False if ffmpeg is unavailable or failed
+        """
+        if not self.available:
+            print(f"  ⚠ {settings.FFMPEG_PATH} not found, skipping HLS")
+            return False
+
+        ladder = hls_ladder(size)
+        portrait = self._is_portrait(size)
+        scratch = target_dir.with_name(f"{target_dir.name}.partial")
+        await asyncio.to_thread(shutil.rmtree, scratch, True)
+        segment = settings.HLS_SEGMENT_SECONDS
+
+        splits = "".join(f"[s{i}]" for i in range(len(ladder)))
+        filters = [f"[0:v]split={len(ladder)}{splits}"]
+        outputs = []
+        streams = []
+        for i, (side, kbps) in enumerate(ladder):
+            scale = f"{side}:-2" if portrait else f"-2:{side}"
+            filters.append(f"[s{i}]scale={scale}[v{i}]")
+            outputs += [
+                "-map", f"[v{i}]",
+                f"-b:v:{i}", f"{kbps}k",
+                f"-maxrate:v:{i}", f"{int(kbps * 1.07)}k",
+                f"-bufsize:v:{i}", f"{int(kbps * 1.5)}k",
+            ]
+            streams.append(f"v:{i},a:{i},name:{side}p" if with_audio else f"v:{i},name:{side}p")
+        if with_audio:
+            for _ in ladder:
+                outputs += ["-map", "0:a:0"]
+            outputs += ["-c:a", "aac", "-b:a", "128k", "-ac", "2"]
+        args = ["-i", str(video_path), "-filter_complex", ";".join(filters), *outputs]
+        args += [
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-profile:v", "main",
+            "-pix_fmt", "yuv420p",
+            "-force_key_frames", f"expr:gte(t,n_forced*{segment})",
+            "-sc_threshold", "0",
+            "-f", "hls",
+            "-hls_time", str(segment),
+            "-hls_playlist_type", "vod",
+            "-hls_flags", "independent_segments",
+            "-hls_segment_filename", str(scratch / "%v" / "segment_%03d.ts"),
+            "-master_pl_name", "master.m3u8",
+            "-var_stream_map", " ".join(streams),
+            str(scratch / "%v" / "index.m3u8"),
+        ]
+
+        await asyncio.to_thread(scratch.mkdir, parents=True, exist_ok=True)
+        try:
+            ok = await self.run_ffmpeg(args, timeout=settings.HLS_TIMEOUT, slots=self._hls_slots)
+        except BaseException:
+            await asyncio.to_thread(shutil.rmtree, scratch, True)
+            raise
+        if not ok:
+            await asyncio.to_thread(shutil.rmtree, scratch, True)
+            return False
+        await asyncio.to_thread(self._publish, scratch, target_dir)
+        return True
+
+    @staticmethod
+    def _is_portrait(size: str) -> bool:
+        try:
+            width, height = (int(n) for n in size.lower().split("x"))
+            return height > width
+        except (AttributeError, ValueError):
+            return False
+
+    @staticmethod
+    def _publish(scratch: Path, target_dir: Path):
+        if target_dir.exists():
+            shutil.rmtree(target_dir)
+        scratch.replace(target_dir)
+
+    async def run_ffmpeg(
+        self,
+        args: List[str],
+        timeout: Optional[float] = None,
+        slots: Optional[asyncio.Semaphore] = None
+    ) -> bool:
+        """Run ffmpeg with ``args`` under a concurrency limit (default FFMPEG_CONCURRENCY); returns True on success"""
+        async with slots or self._slots:
+            process = await asyncio.create_subprocess_exec(
+                settings.FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-y", *args,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout or settings.FFMPEG_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                process.kill()
+                await process.wait()
+                raise
+
+        if process.returncode != 0:
+            print(f"  ✗ ffmpeg failed ({process.returncode}): {stderr.decode(errors='replace').strip()[-500:]}")
+            return False
+        return True
@@ -0,0 +1,105 @@
+"""
+Full-text search over the video catalog (SQLite FTS5)
+
+Queries the ``videos_fts`` index maintained by triggers (see
+models.database.SEARCH_INDEX_DDL), ranks with bm25 and pages with a keyset
+cursor on (score, rowid) so deep pages cost the same as the first.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import base64
+import json
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models.database import Video
+
+# bm25 column weights: title, script, prompts
+BM25_WEIGHTS = (10.0, 1.0, 2.0)
+
+SNIPPET_TOKENS = 16
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 query
+
+    Every word must match (quoted, so FTS5 operators in user input are just
+    words) and the last word also matches as a prefix, for search-as-you-type.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def encode_cursor(score: float, rowid: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, rowid]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        score, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(score), int(rowid)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def search_videos(db: Session, query: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Rank videos matching ``query``
+
+    Returns:
+        (hits, next_cursor): hits in rank order, each with the Video, its
+        bm25 score (lower is better) and a highlighted snippet;
+        next_cursor is None on the last page
+    """
+    match = build_match_query(query)
+    if not match:
+        return [], None
+
+    params = {"match": match, "limit": limit + 1}
+    after = ""
+    if cursor:
+        params["after_score"], params["after_rowid"] = decode_cursor(cursor)
+        after = "WHERE score > :after_score OR (score = :after_score AND rid > :after_rowid)"
+
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    # Rank and page first; snippets are only built for the rows returned
+    page = db.execute(text(f"""
+        SELECT rid, score FROM (
+            SELECT rowid AS rid, bm25(videos_fts, {weights}) AS score
+            FROM videos_fts WHERE videos_fts MATCH :match
+        )
+        {after}
+        ORDER BY score, rid
+        LIMIT :limit
+    """), params).all()
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    if not page:
+        return [], None
+
+    rowids = [row.rid for row in page]
+    placeholders = ", ".join(f":r{i}" for i in range(len(rowids)))
+    row_params = {f"r{i}": rowid for i, rowid in enumerate(rowids)}
+    snippets = dict(db.execute(text(f"""
+        SELECT rowid, snippet(videos_fts, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS})
+        FROM videos_fts WHERE videos_fts MATCH :match AND rowid IN ({placeholders})
+    """), dict(row_params, match=match)).all())
+    ids = dict(db.execute(text(f"SELECT rowid, id FROM videos WHERE rowid IN ({placeholders})"), row_params).all())
+    videos = {video.id: video for video in db.query(Video).filter(Video.id.in_(list(ids.values())))}
+
+    hits = []
+    for row in page:
+        video = videos.get(ids.get(row.rid))
+        if video:
+            hits.append({"video": video, "score": row.score, "snippet": snippets.get(row.rid, "")})
+
+    next_cursor = encode_cursor(page[-1].score, page[-1].rid) if has_more else None
+    return hits, next_cursor
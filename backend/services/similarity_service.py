@@ -0,0 +1,212 @@
+"""
+Near-duplicate script detection with MinHash and LSH
+
+Scripts are normalized and cut into word shingles. Each script's MinHash
+signature (NUM_PERM hash minima, computed with NumPy over all shingles at
+once) estimates Jaccard similarity between scripts, and LSH banding turns
+"find similar" into a few dictionary lookups instead of a table scan.
+
+Signatures of completed jobs are appended to a binary file, so the index
+survives restarts, grows incrementally, and processes sharing the file (API
+and workers) pick up each other's additions by reading the new tail.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from config.settings import settings
+from models.database import SessionLocal, Video
+
+NUM_PERM = 128
+BANDS = 32  # 32 bands x 4 rows: pairs above ~0.45 similarity usually share a bucket
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+SEED = 20240601
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_MAGIC = b"VPMH1\0\0\0"
+_RECORD = np.dtype([("id", "S36"), ("signature", "<u4", (NUM_PERM,))])
+
+
+def normalize_script(script: str) -> List[str]:
+    """Lowercased words without punctuation"""
+    return re.findall(r"\w+", (script or "").lower())
+
+
+def shingle_hashes(script: str) -> np.ndarray:
+    """32-bit hashes of the script's word shingles"""
+    words = normalize_script(script)
+    if len(words) < SHINGLE_WORDS:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in set(shingles)), dtype=np.uint64)
+
+
+class MinHashIndex:
+    """Persistent MinHash LSH index of completed scripts"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        rng = np.random.RandomState(SEED)
+        self._a = rng.randint(1, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+        self._b = rng.randint(0, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = {}
+        self._offset = 0  # Bytes of the file already loaded
+        self._lock = threading.Lock()
+
+    def signature(self, script: str) -> Optional[np.ndarray]:
+        hashes = shingle_hashes(script)
+        if hashes.size == 0:
+            return None
+        # (permutations x shingles) in one shot, then the minimum per permutation
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _insert(self, video_id: str, signature: np.ndarray):
+        if video_id in self._signatures:
+            return
+        self._signatures[video_id] = signature
+        for band in range(BANDS):
+            key = (band, signature[band * ROWS:(band + 1) * ROWS].tobytes())
+            self._buckets.setdefault(key, []).append(video_id)
+
+    def _refresh(self):
+        """Load records appended since the last read (by any process)"""
+        if not self.path.exists():
+            self._backfill()
+            return
+        with open(self.path, "rb") as f:
+            if self._offset == 0:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    raise ValueError(f"{self.path} is not a compatible MinHash index; delete it to rebuild")
+                self._offset = len(_MAGIC)
+            f.seek(self._offset)
+            data = f.read()
+        # A record still being written by another process is picked up next time
+        usable = len(data) - len(data) % _RECORD.itemsize
+        records = np.frombuffer(data[:usable], dtype=_RECORD)
+        for record in records:
+            self._insert(record["id"].decode("ascii"), record["signature"].copy())
+        self._offset += usable
+
+    def _backfill(self):
+        """Create the index file from completed jobs already in the database"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(f"{self.path.name}.{os.getpid()}.partial")
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Video.id, Video.script)
+                .filter(Video.status == "completed", Video.coalesced_into.is_(None), Video.remix_of.is_(None))
+                .execution_options(stream_results=True)
+                .yield_per(1000)
+            )
+            with open(partial, "wb") as f:
+                f.write(_MAGIC)
+                for video_id, script in rows:
+                    signature = self.signature(script)
+                    if signature is not None:
+                        f.write(self._record(video_id, signature))
+        finally:
+            db.close()
+        partial.replace(self.path)
+        self._offset = 0
+        self._refresh()
+        print(f"MinHash index built with {len(self._signatures)} scripts")
+
+    @staticmethod
+    def _record(video_id: str, signature: np.ndarray) -> bytes:
+        record = np.zeros(1, dtype=_RECORD)
+        record["id"] = video_id.encode("ascii")
+        record["signature"] = signature
+        return record.tobytes()
+
+    def add(self, video_id: str, script: str):
+        """Index a completed job (appends one record to the file)"""
+        signature = self.signature(script)
+        if signature is None:
+            return
+        with self._lock:
+            self._refresh()
+            if video_id in self._signatures:
+                return
+            with open(self.path, "ab") as f:
+                f.write(self._record(video_id, signature))
+
+    def nearest(self, script: str, threshold: float, limit: int = 5) -> List[Tuple[str, float]]:
+        """
+        Indexed jobs whose estimated similarity to ``script`` is at least ``threshold``
+
+        Returns:
+            (video_id, similarity) pairs, most similar first
+        """
+        signature = self.signature(script)
+        if signature is None:
+            return []
+        with self._lock:
+            self._refresh()
+            candidates = set()
+            for band in range(BANDS):
+                key = (band, signature[band * ROWS:(band + 1) * ROWS].tobytes())
+                candidates.update(self._buckets.get(key, ()))
+            if not candidates:
+                return []
+            ids = list(candidates)
+            matrix = np.stack([self._signatures[video_id] for video_id in ids])
+        similarities = (matrix == signature).mean(axis=1)
+        ranked = sorted(zip(ids, similarities.tolist()), key=lambda pair: -pair[1])
+        return [(video_id, sim) for video_id, sim in ranked if sim >= threshold][:limit]
+
+
+_index: Optional[MinHashIndex] = None
+_index_lock = threading.Lock()
+
+def get_index() -> MinHashIndex:
+    """Shared index, loaded (or built from the database) on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MinHashIndex(settings.SIMILARITY_INDEX_PATH)
+        return _index
+
+
+def find_reusable(script: str, style: str, exclude_id: Optional[str] = None) -> Optional[Tuple[Video, float]]:
+    """
+    Most similar completed job whose plan and reference images can be reused
+
+    Reuse needs the same style (prompts carry the style) and a job that
+    still has its prompts and images. Returns (video, similarity) or None.
+    Blocking; call through asyncio.to_thread from async code.
+    """
+    matches = get_index().nearest(script, settings.NEAR_DUP_THRESHOLD)
+    if not matches:
+        return None
+    db = SessionLocal()
+    try:
+        similarity = dict(matches)
+        candidates = (
+            db.query(Video)
+            .filter(Video.id.in_(list(similarity)), Video.status == "completed", Video.style == style)
+            .all()
+        )
+        usable = [
+            video for video in candidates
+            if video.id != exclude_id and video.prompts and video.best_prompt and video.image_paths
+        ]
+        if not usable:
+            return None
+        best = max(usable, key=lambda video: similarity[video.id])
+        db.expunge(best)
+        return best, similarity[best.id]
+    finally:
+        db.close()
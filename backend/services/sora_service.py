@@ -3,13 +3,24 @@ OpenAI Sora-2 Pro Video Generation Service
 Direct HTTP integration with Sora API endpoints
 """
 
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 import asyncio
+import time
+import uuid
 import aiofiles
 import httpx
 
 from config.settings import settings
+from services.storage_service import storage
+from services.webhook_service import webhooks
+from services.eta_service import report_progress, sora_clip_seconds
+
+# Asked when a render is cancelled: whether the job is being abandoned (user
+# cancel, delete, preview reject, lost lease) rather than handed back to the
+# queue by a stopping worker. Only abandoned renders are deleted upstream.
+render_abandoned: ContextVar[Callable[[], bool]] = ContextVar("render_abandoned", default=lambda: True)
 
 
 class SoraService:
@@ -17,12 +28,12 @@ class SoraService:
     
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
-        self.base_url = "https://api.openai.com/v1/videos"
-        self.videos_dir = settings.VIDEOS_DIR
+        self.base_url = f"{settings.OPENAI_BASE_URL.rstrip('/')}/videos"
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self._slots = asyncio.Semaphore(max(1, settings.SORA_CONCURRENCY))
     
     async def generate_video(
         self, 
@@ -31,7 +42,9 @@ class SoraService:
         video_id: str,
         size: str = "1280x720",
         use_pro: bool = True,
-        reference_images: list = None
+        reference_images: list = None,
+        variant: Optional[str] = None,
+        max_wait_time: Optional[float] = None
     ) -> dict:
         """
         Generate video using OpenAI Sora-2 or Sora-2 Pro API
@@ -43,108 +56,96 @@ class SoraService:
             size: Output resolution (e.g., "1280x720", "720x1280")
             use_pro: Use sora-2-pro (slower, higher quality) vs sora-2 (faster)
             reference_images: List of paths to reference images (max 2)
+            variant: Store the result as a variant of the video (e.g. "preview")
+            max_wait_time: Render timeout in seconds (default SORA_MAX_WAIT_TIME)
             
         Returns:
-            Dictionary with video_path and duration
+            Dictionary with video_path, duration and sora_job_id
         """
         model = "sora-2-pro" if use_pro else "sora-2"
         print(f"[{video_id}] Generating video with {model}...")
         print(f"[{video_id}] Prompt: {prompt[:100]}...")
         print(f"[{video_id}] Size: {size}")
         
-        # Default to 8 seconds if not specified
+        # Default to 8 seconds if not specified; 12 is the max for Sora
         duration = duration or 8
-        if duration <= 4:
-            seconds = "4"
-        elif duration <= 8:
-            seconds = "8"
-        else:
-            seconds = "12"  # Max for Sora
-        
-        # Create video generation job
-        print(f"[{video_id}] Creating video job (size={size}, duration={seconds}s)...")
-        
-        # Prepare request body
-        request_body = {
-            "model": model,
-            "prompt": prompt,
-            "size": size,
-            "seconds": seconds
-        }
-        
-        # Add reference images if provided (first 2 images)
-        if reference_images:
-            # For now, use first image as input_reference
-            # Note: Sora API may support multiple images in future
-            first_img = reference_images[0]
-            print(f"[{video_id}] Using reference image: {first_img}")
-            # Note: input_reference would need multipart upload
-            # For HTTP implementation, this may require different approach
-        
-        # POST to https://api.openai.com/v1/videos
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                self.base_url,
-                headers=self.headers,
-                json=request_body
-            )
-            response.raise_for_status()
-            video_job = response.json()
-        
-        job_id = video_job["id"]
-        print(f"[{video_id}] ✅ Job created: {job_id}")
-        print(f"[{video_id}] Status: {video_job['status']}")
-        print(f"[{video_id}] Polling for completion...")
+        seconds = str(sora_clip_seconds(duration))
+        if duration > settings.SORA_MAX_DURATION:
+            print(f"[{video_id}] ⚠ {duration}s is longer than one Sora clip; rendering {seconds}s (use storyboard mode for longer videos)")
         
-        # Poll until the video is ready (with timeout)
-        max_wait_time = 600  # 10 minutes max (Sora can take longer)
-        poll_interval = 5  # Check every 5 seconds
-        elapsed_time = 0
-        
-        while elapsed_time < max_wait_time:
-            # GET https://api.openai.com/v1/videos/{video_id}
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/{job_id}",
-                    headers=self.headers
-                )
+        # Storyboard shots and concurrent jobs share the per-process render cap
+        async with self._slots:
+            # Create video generation job
+            print(f"[{video_id}] Creating video job (size={size}, duration={seconds}s)...")
+            
+            # Prepare request body
+            request_body = {
+                "model": model,
+                "prompt": prompt,
+                "size": size,
+                "seconds": seconds
+            }
+            
+            # Sora takes a single input_reference that must match the output size,
+            # so only the first image is used
+            reference_path = None
+            if reference_images:
+                try:
+                    reference_path = await self._prepare_reference(Path(reference_images[0]), size)
+                    print(f"[{video_id}] Using reference image: {reference_path}")
+                except Exception as e:
+                    print(f"[{video_id}] ⚠ Skipping reference image: {str(e)}")
+            
+            # POST to https://api.openai.com/v1/videos
+            async with httpx.AsyncClient(timeout=60.0) as client:
+                if reference_path:
+                    # Multipart upload; httpx streams the file from disk in chunks
+                    with open(reference_path, "rb") as reference_file:
+                        response = await client.post(
+                            self.base_url,
+                            headers={"Authorization": f"Bearer {self.api_key}"},
+                            data=request_body,
+                            files={"input_reference": (reference_path.name, reference_file, "image/png")}
+                        )
+                else:
+                    response = await client.post(
+                        self.base_url,
+                        headers=self.headers,
+                        json=request_body
+                    )
                 response.raise_for_status()
-                job_status = response.json()
+                video_job = response.json()
             
-            status = job_status["status"]
-            progress = job_status.get("progress", 0)
+            job_id = video_job["id"]
+            print(f"[{video_id}] ✅ Job created: {job_id}")
+            print(f"[{video_id}] Status: {video_job['status']}")
+            print(f"[{video_id}] Waiting for completion...")
+            
+            # Wait until the video is ready (with timeout)
+            job_status = await self._wait_for_job(job_id, video_id, max_wait_time or settings.SORA_MAX_WAIT_TIME)
             
-            print(f"[{video_id}] Status: {status} | Progress: {progress}% (elapsed: {elapsed_time}s)")
-            
-            if status == "completed":
-                print(f"[{video_id}] ✅ Video generation complete!")
-                
-                # Download the generated video
-                await self._download_video_from_api(job_id, video_id)
-                
-                return {
-                    "video_path": f"/videos/{video_id}.mp4",
-                    "duration": int(seconds)
-                }
-                
-            elif status == "failed":
-                error_info = job_status.get("error", {})
-                error_msg = error_info.get("message", "Unknown error") if isinstance(error_info, dict) else str(error_info)
+            if job_status["status"] == "failed":
+                error_msg = self._error_message(job_status)
                 print(f"[{video_id}] ❌ Video generation failed: {error_msg}")
                 raise Exception(f"Sora video generation failed: {error_msg}")
             
-            # Wait before polling again
-            await asyncio.sleep(poll_interval)
-            elapsed_time += poll_interval
-        
-        # Timeout
-        raise Exception(f"Video generation timed out after {max_wait_time} seconds")
+            print(f"[{video_id}] ✅ Video generation complete!")
+            
+            # Download the generated video
+            await self._download_video_from_api(job_id, video_id, variant)
+            
+            return {
+                "video_path": storage.video_url(video_id, variant),
+                "duration": int(seconds),
+                "sora_job_id": job_id
+            }
     
     async def remix_video(
         self,
         video_id: str,
         source_video_id: str,
-        prompt: str
+        prompt: str,
+        max_wait_time: Optional[float] = None
     ) -> dict:
         """
         Create a remix of a completed video using a refreshed prompt
@@ -153,75 +154,186 @@ class SoraService:
             video_id: New video identifier
             source_video_id: The OpenAI video job ID to remix
             prompt: Updated text prompt for remix
+            max_wait_time: Render timeout in seconds (default SORA_MAX_WAIT_TIME)
             
         Returns:
-            Dictionary with video_path and duration
+            Dictionary with video_path, duration and sora_job_id (of the remix)
         """
         print(f"[{video_id}] Remixing video {source_video_id}...")
         print(f"[{video_id}] Remix prompt: {prompt[:100]}...")
         
-        # POST to https://api.openai.com/v1/videos/{video_id}/remix
-        request_body = {"prompt": prompt}
-        
+        async with self._slots:
+            # POST to https://api.openai.com/v1/videos/{video_id}/remix
+            request_body = {"prompt": prompt}
+            
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                response = await client.post(
+                    f"{self.base_url}/{source_video_id}/remix",
+                    headers=self.headers,
+                    json=request_body
+                )
+                response.raise_for_status()
+                remix_job = response.json()
+            
+            job_id = remix_job["id"]
+            print(f"[{video_id}] ✅ Remix job created: {job_id}")
+            print(f"[{video_id}] Waiting for completion...")
+            
+            job_status = await self._wait_for_job(job_id, video_id, max_wait_time or settings.SORA_MAX_WAIT_TIME)
+            
+            if job_status["status"] == "failed":
+                error_msg = self._error_message(job_status)
+                print(f"[{video_id}] ❌ Remix failed: {error_msg}")
+                raise Exception(f"Video remix failed: {error_msg}")
+            
+            print(f"[{video_id}] ✅ Remix complete!")
+            
+            # Download the remixed video
+            await self._download_video_from_api(job_id, video_id)
+            
+            seconds = job_status.get("seconds") or remix_job.get("seconds") or "8"
+            return {
+                "video_path": storage.video_url(video_id),
+                "duration": int(seconds),
+                "sora_job_id": job_id
+            }
+    
+    async def _retrieve_job(self, job_id: str) -> dict:
+        # GET https://api.openai.com/v1/videos/{video_id}
         async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{self.base_url}/{source_video_id}/remix",
-                headers=self.headers,
-                json=request_body
+            response = await client.get(
+                f"{self.base_url}/{job_id}",
+                headers=self.headers
             )
             response.raise_for_status()
-            remix_job = response.json()
+            return response.json()
+    
+    async def _wait_for_job(self, job_id: str, video_id: str, max_wait_time: float) -> dict:
+        """
+        Wait for a Sora job to reach "completed" or "failed"
         
-        job_id = remix_job["id"]
-        print(f"[{video_id}] ✅ Remix job created: {job_id}")
-        print(f"[{video_id}] Polling for completion...")
+        With SORA_WEBHOOK_SECRET set, completion arrives through the webhook
+        endpoint and the API is only polled every SORA_WEBHOOK_POLL_INTERVAL
+        as a safety net for lost deliveries. Otherwise the job is polled
+        every SORA_POLL_INTERVAL.
         
-        # Poll until ready
-        max_wait_time = 600
-        poll_interval = 5
-        elapsed_time = 0
+        If the calling task is cancelled, the Sora job is cancelled as well,
+        unless ``render_abandoned`` says the job is only being handed back to
+        the queue (the worker is shutting down).
         
-        while elapsed_time < max_wait_time:
-            # GET https://api.openai.com/v1/videos/{video_id}
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/{job_id}",
-                    headers=self.headers
-                )
-                response.raise_for_status()
-                job_status = response.json()
+        Returns:
+            The final job status (status, error, seconds when polled)
+        """
+        try:
+            return await self._poll_job(job_id, video_id, max_wait_time)
+        except asyncio.CancelledError:
+            if not render_abandoned.get()():
+                print(f"[{video_id}] Worker stopping; leaving Sora job {job_id} running")
+                raise
+            # Our job was cancelled: stop the render upstream too, without waiting long
+            try:
+                await asyncio.wait_for(asyncio.shield(self.cancel_job(job_id)), timeout=10)
+            except Exception as e:
+                print(f"[{video_id}] Could not cancel Sora job {job_id}: {e}")
+            raise
+    
+    async def cancel_job(self, job_id: str) -> bool:
+        """
+        Cancel (delete) a Sora job
+        
+        Returns:
+            False if the API doesn't support it or the job no longer exists
+        """
+        # DELETE https://api.openai.com/v1/videos/{video_id}
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.delete(
+                f"{self.base_url}/{job_id}",
+                headers=self.headers
+            )
+        if response.status_code in (404, 405, 409):
+            return False
+        response.raise_for_status()
+        print(f"  ✓ Cancelled Sora job {job_id}")
+        return True
+    
+    async def _poll_job(self, job_id: str, video_id: str, max_wait_time: float) -> dict:
+        use_webhooks = webhooks.enabled
+        poll_interval = settings.SORA_WEBHOOK_POLL_INTERVAL if use_webhooks else settings.SORA_POLL_INTERVAL
+        started = time.monotonic()
+        reported = None
+        
+        while True:
+            elapsed = time.monotonic() - started
+            if elapsed >= max_wait_time:
+                raise Exception(f"Sora job {job_id} timed out after {max_wait_time} seconds")
+            
+            if use_webhooks:
+                event_status = await webhooks.wait(job_id, timeout=min(poll_interval, max_wait_time - elapsed))
+                if event_status:
+                    print(f"[{video_id}] Webhook: {event_status['status']}")
+                    return event_status
             
+            job_status = await self._retrieve_job(job_id)
             status = job_status["status"]
             progress = job_status.get("progress", 0)
+            print(f"[{video_id}] Status: {status} | Progress: {progress}% (elapsed: {int(elapsed)}s)")
+            if progress != reported:
+                # Feeds the job's ETA; losing an update only makes it less precise
+                try:
+                    await asyncio.to_thread(report_progress, video_id, int(progress))
+                    reported = progress
+                except Exception as e:
+                    print(f"[{video_id}] Could not store progress: {e}")
             
-            print(f"[{video_id}] Status: {status} | Progress: {progress}% (elapsed: {elapsed_time}s)")
-            
-            if status == "completed":
-                print(f"[{video_id}] ✅ Remix complete!")
-                
-                # Download the remixed video
-                await self._download_video_from_api(job_id, video_id)
-                
-                seconds = job_status.get("seconds", "8")
-                return {
-                    "video_path": f"/videos/{video_id}.mp4",
-                    "duration": int(seconds)
-                }
-                
-            elif status == "failed":
-                error_info = job_status.get("error", {})
-                error_msg = error_info.get("message", "Unknown error") if isinstance(error_info, dict) else str(error_info)
-                print(f"[{video_id}] ❌ Remix failed: {error_msg}")
-                raise Exception(f"Video remix failed: {error_msg}")
+            if status in ("completed", "failed"):
+                return job_status
             
-            await asyncio.sleep(poll_interval)
-            elapsed_time += poll_interval
+            if not use_webhooks:
+                # Wait before polling again
+                await asyncio.sleep(poll_interval)
+    
+    @staticmethod
+    def _error_message(job_status: dict) -> str:
+        error_info = job_status.get("error", {})
+        return error_info.get("message", "Unknown error") if isinstance(error_info, dict) else str(error_info)
+    
+    async def _prepare_reference(self, image_path: Path, size: str) -> Path:
+        """
+        Resize and center-crop a reference image to exactly ``size``
+        
+        The result is cached next to the source image per (image, size) and
+        reused while it is newer than the source. The freshness check and
+        Pillow both run in a thread so the event loop isn't blocked.
+        """
+        return await asyncio.to_thread(self._cached_reference, image_path, size)
+    
+    @classmethod
+    def _cached_reference(cls, image_path: Path, size: str) -> Path:
+        """The fitted copy of ``image_path``, made if missing or stale (blocking)"""
+        cached = image_path.with_name(f"{image_path.stem}.ref_{size}.png")
+        if not (cached.exists() and cached.stat().st_mtime >= image_path.stat().st_mtime):
+            cls._fit_image(image_path, cached, size)
+        return cached
+    
+    @staticmethod
+    def _fit_image(source: Path, target: Path, size: str):
+        from PIL import Image, ImageOps
         
-        raise Exception(f"Remix timed out after {max_wait_time} seconds")
+        width, height = (int(part) for part in size.lower().split("x"))
+        with Image.open(source) as img:
+            fitted = ImageOps.fit(img.convert("RGB"), (width, height), method=Image.LANCZOS)
+        # Write under a name of our own so a concurrent reader never sees a partial
+        # file and jobs fitting the same image at once don't write into each other's
+        partial = target.with_name(f"{target.name}.{uuid.uuid4().hex}.partial")
+        try:
+            fitted.save(partial, format="PNG")
+            partial.replace(target)
+        finally:
+            partial.unlink(missing_ok=True)
     
-    async def _download_video_from_api(self, job_id: str, video_id: str) -> Path:
+    async def _download_video_from_api(self, job_id: str, video_id: str, variant: Optional[str] = None) -> Path:
         """Download video content using Sora API"""
-        video_path = self.videos_dir / f"{video_id}.mp4"
+        video_path = storage.video_file(video_id, variant)
         video_path.parent.mkdir(parents=True, exist_ok=True)
         
         print(f"[{video_id}] Downloading video from Sora API...")
@@ -0,0 +1,275 @@
+"""
+Hot-row cache of video responses for status polling
+
+Clients poll ``GET /api/videos/{id}`` every few seconds, but only the few
+in-flight rows change between polls. Serialized responses are kept in a
+bounded LRU and invalidated when their row is written:
+
+- In this process, session events collect the ids written by every commit:
+  rows flushed through the unit of work, and bulk ``query(Video).update()``
+  / ``delete()`` statements, whose ids are read from their WHERE clause.
+- Rows written by other processes (separate workers, other API processes)
+  are caught by a sync loop that compares the cached ids' ``updated_at``
+  with the database every STATUS_CACHE_SYNC_INTERVAL. Call
+  ``status_cache.invalidate()`` from any other cross-process channel.
+- Entries also expire after STATUS_CACHE_TTL as a safety net.
+
+ETAs are stored as a deadline, so a cached response keeps counting down.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+from config.settings import settings
+from models.database import SessionLocal, Video
+
+# Ids checked per IN (...) query while syncing
+SYNC_CHUNK_SIZE = 500
+
+# session.info keys for writes waiting for their commit
+_PENDING_IDS = "status_cache_ids"
+_PENDING_LEADERS = "status_cache_leaders"
+_PENDING_ALL = "status_cache_all"
+
+
+class StatusCache:
+    """Bounded LRU of serialized VideoResponse payloads with hit-rate counters"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Dict, Optional[float], float]]" = OrderedDict()
+        # Bumped on invalidation so a read that raced a write can't store stale data
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, video_id: str) -> Optional[Dict]:
+        """The cached payload, with its ETA counted down, or None"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None or entry[2] <= now:
+                if entry is not None:
+                    del self._entries[video_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(video_id)
+            self.hits += 1
+        payload, eta_at, _ = entry
+        if eta_at is None:
+            return payload
+        return dict(payload, eta_seconds=round(max(0.0, eta_at - now), 1))
+
+    def token(self, video_id: str) -> Tuple[int, int]:
+        """Take before reading the row; ``put`` ignores the result if the row was written meanwhile"""
+        with self._lock:
+            return self._epoch, self._versions.get(video_id, 0)
+
+    def put(self, video_id: str, payload: Dict, token: Tuple[int, int]):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        eta = payload.get("eta_seconds")
+        with self._lock:
+            if token != (self._epoch, self._versions.get(video_id, 0)):
+                return
+            self._entries[video_id] = (payload, now + eta if eta is not None else None, now + self.ttl)
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, video_ids: Iterable[str]):
+        """Drop entries for rows that were written"""
+        with self._lock:
+            for video_id in video_ids:
+                self._versions[video_id] = self._versions.get(video_id, 0) + 1
+                if self._entries.pop(video_id, None) is not None:
+                    self.invalidations += 1
+            if len(self._versions) > 4 * max(self.max_entries, 1):
+                # Forget old versions; the new epoch still rejects reads in flight
+                self._versions.clear()
+                self._epoch += 1
+
+    def invalidate_followers(self, leader_ids: Set[str]):
+        """Drop entries attached to these leaders (their shared fields were copied)"""
+        with self._lock:
+            followers = [vid for vid, entry in self._entries.items() if entry[0].get("coalesced_into") in leader_ids]
+        self.invalidate(followers)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._versions.clear()
+            self._epoch += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def cached_versions(self) -> Dict[str, Optional[str]]:
+        """updated_at of each cached payload, keyed by id"""
+        with self._lock:
+            return {vid: entry[0].get("updated_at") for vid, entry in self._entries.items()}
+
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        stats = self.snapshot()
+        lookups = stats["hits"] + stats["misses"]
+        lines: List[str] = [
+            "# HELP visionpulse_status_cache_hits_total Video reads served from the status cache",
+            "# TYPE visionpulse_status_cache_hits_total counter",
+            f"visionpulse_status_cache_hits_total {stats['hits']}",
+            "# HELP visionpulse_status_cache_misses_total Video reads that went to the database",
+            "# TYPE visionpulse_status_cache_misses_total counter",
+            f"visionpulse_status_cache_misses_total {stats['misses']}",
+            "# HELP visionpulse_status_cache_hit_ratio Hits over lookups since start",
+            "# TYPE visionpulse_status_cache_hit_ratio gauge",
+            f"visionpulse_status_cache_hit_ratio {stats['hits'] / lookups if lookups else 0.0:.4f}",
+            "# HELP visionpulse_status_cache_evictions_total Entries dropped to stay within STATUS_CACHE_SIZE",
+            "# TYPE visionpulse_status_cache_evictions_total counter",
+            f"visionpulse_status_cache_evictions_total {stats['evictions']}",
+            "# HELP visionpulse_status_cache_invalidations_total Entries dropped because their row was written",
+            "# TYPE visionpulse_status_cache_invalidations_total counter",
+            f"visionpulse_status_cache_invalidations_total {stats['invalidations']}",
+            "# HELP visionpulse_status_cache_entries Payloads currently cached",
+            "# TYPE visionpulse_status_cache_entries gauge",
+            f"visionpulse_status_cache_entries {stats['entries']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+status_cache = StatusCache(settings.STATUS_CACHE_SIZE, settings.STATUS_CACHE_TTL)
+
+
+# --- Write-through invalidation (this process) -----------------------------
+
+def _bulk_targets(statement) -> Tuple[Optional[Set[str]], Set[str]]:
+    """
+    Ids and coalescing leaders named by an UPDATE/DELETE's WHERE clause
+
+    Returns (ids, leaders); ids is None if the clause doesn't restrict the
+    statement to known ids or leaders, in which case every entry is dropped.
+    """
+    ids: Set[str] = set()
+    leaders: Set[str] = set()
+    where = statement.whereclause
+    for node in visitors.iterate(where) if where is not None else ():
+        if not isinstance(node, BinaryExpression) or not isinstance(node.right, BindParameter):
+            continue
+        column = node.left
+        if getattr(getattr(column, "table", None), "name", None) != Video.__tablename__:
+            continue
+        if node.operator is operators.eq:
+            values = [node.right.value]
+        elif node.operator is operators.in_op:
+            values = node.right.value or []
+        else:
+            continue
+        if column.name == "id":
+            ids.update(values)
+        elif column.name == "coalesced_into":
+            leaders.update(values)
+    if not ids and not leaders:
+        return None, leaders
+    return ids, leaders
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _collect_bulk_writes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Video:
+        return
+    info = orm_execute_state.session.info
+    ids, leaders = _bulk_targets(orm_execute_state.statement)
+    if ids is None:
+        info[_PENDING_ALL] = True
+        return
+    info.setdefault(_PENDING_IDS, set()).update(ids)
+    info.setdefault(_PENDING_LEADERS, set()).update(leaders)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_flushed_rows(session, flush_context):
+    written = session.info.setdefault(_PENDING_IDS, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Video) and obj.id:
+            written.add(obj.id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_committed(session):
+    # Dropped only once committed, so a concurrent read can't re-cache the old row
+    if session.info.pop(_PENDING_ALL, False):
+        status_cache.clear()
+    ids = session.info.pop(_PENDING_IDS, None)
+    leaders = session.info.pop(_PENDING_LEADERS, None)
+    if ids:
+        status_cache.invalidate(ids)
+    if leaders:
+        status_cache.invalidate_followers(leaders)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending(session):
+    for key in (_PENDING_IDS, _PENDING_LEADERS, _PENDING_ALL):
+        session.info.pop(key, None)
+
+
+# --- Cross-process sync ----------------------------------------------------
+
+def _stale_ids(cached: Dict[str, Optional[str]]) -> List[str]:
+    """Cached ids whose row was updated or deleted since it was cached (blocking)"""
+    stale = []
+    ids = list(cached)
+    db = SessionLocal()
+    try:
+        for start in range(0, len(ids), SYNC_CHUNK_SIZE):
+            chunk = ids[start:start + SYNC_CHUNK_SIZE]
+            current = {
+                row.id: row.updated_at.isoformat() if row.updated_at else None
+                for row in db.query(Video.id, Video.updated_at).filter(Video.id.in_(chunk))
+            }
+            stale.extend(vid for vid in chunk if vid not in current or current[vid] != cached[vid])
+    finally:
+        db.close()
+    return stale
+
+
+async def run_sync_loop():
+    """Drop entries written by other processes every STATUS_CACHE_SYNC_INTERVAL"""
+    while True:
+        await asyncio.sleep(settings.STATUS_CACHE_SYNC_INTERVAL)
+        try:
+            cached = status_cache.cached_versions()
+            if cached:
+                status_cache.invalidate(await asyncio.to_thread(_stale_ids, cached))
+        except Exception as e:
+            print(f"Status cache sync failed: {str(e)}")
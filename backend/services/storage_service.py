@@ -0,0 +1,281 @@
+"""
+Artifact storage manager
+
+Owns every on-disk artifact path (final videos, HLS renditions, reference
+images, narration audio), maps them to the URLs served by the static mounts, builds per-video
+manifests with file sizes and deletes artifacts off the event loop.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import asyncio
+import shutil
+import time
+
+from config.settings import settings
+
+# Artifact kinds: intermediates are only needed to produce the final video
+# and are evicted first under quota pressure
+FINAL = "final"
+INTERMEDIATE = "intermediate"
+
+
+class StorageManager:
+    """Paths, manifests and deletion for per-video artifacts"""
+
+    def __init__(self):
+        self.videos_dir = settings.VIDEOS_DIR
+        self.images_dir = settings.IMAGES_DIR
+        self.audio_dir = settings.AUDIO_DIR
+        self._background: Set[asyncio.Task] = set()
+        self._accessed: Dict[str, float] = {}
+
+    # --- Paths -------------------------------------------------------------
+
+    def video_file(self, video_id: str, variant: Optional[str] = None) -> Path:
+        return self.videos_dir / self._video_name(video_id, variant)
+
+    def video_url(self, video_id: str, variant: Optional[str] = None) -> str:
+        return f"/videos/{self._video_name(video_id, variant)}"
+
+    @staticmethod
+    def _video_name(video_id: str, variant: Optional[str]) -> str:
+        # Variants (e.g. "preview") sit next to the final video as <id>.<variant>.mp4
+        return f"{video_id}.{variant}.mp4" if variant else f"{video_id}.mp4"
+
+    def clip_files(self, video_id: str) -> List[Path]:
+        """Storyboard shots (<id>.shotNN.mp4) waiting to be joined into the final video"""
+        return sorted(self.videos_dir.glob(f"{video_id}.shot*.mp4"))
+
+    def hls_dir(self, video_id: str) -> Path:
+        # <id>.hls/ keeps the id as the first name component, like every other entry
+        return self.videos_dir / f"{video_id}.hls"
+
+    def hls_url(self, video_id: str) -> str:
+        return f"/videos/{video_id}.hls/master.m3u8"
+
+    def image_dir(self, video_id: str) -> Path:
+        return self.images_dir / video_id
+
+    def image_file(self, video_id: str, index: int) -> Path:
+        return self.image_dir(video_id) / f"image_{index:03d}.png"
+
+    def image_url(self, video_id: str, index: int) -> str:
+        return f"/images/{video_id}/image_{index:03d}.png"
+
+    def audio_dir_for(self, video_id: str) -> Path:
+        return self.audio_dir / video_id
+
+    def audio_file(self, video_id: str) -> Path:
+        return self.audio_dir_for(video_id) / "narration.mp3"
+
+    def audio_url(self, video_id: str) -> str:
+        return f"/audio/{video_id}/narration.mp3"
+
+    def tts_cache_file(self, key: str) -> Path:
+        """Cached narration chunk; "_" names are never treated as video artifacts"""
+        return self.audio_dir / "_cache" / f"{key}.mp3"
+
+    def resolve_url(self, url: str) -> Optional[Path]:
+        """Map a served URL (e.g. /images/<id>/image_000.png) back to its file"""
+        for prefix, root in (("/videos/", self.videos_dir), ("/images/", self.images_dir), ("/audio/", self.audio_dir)):
+            if url.startswith(prefix):
+                path = (root / url[len(prefix):]).resolve()
+                # Never resolve outside the storage root
+                if root.resolve() in path.parents:
+                    return path
+        return None
+
+    def url_video_id(self, url: str) -> Optional[str]:
+        """Video id that owns a served URL"""
+        for prefix in ("/videos/", "/images/", "/audio/"):
+            if url.startswith(prefix):
+                name = url[len(prefix):].split("/", 1)[0]
+                return name.split(".", 1)[0] or None
+        return None
+
+    # --- Manifests ---------------------------------------------------------
+
+    def _artifacts(self, video_id: str) -> Iterator[Tuple[Path, str, str]]:
+        """(path, url, kind) for every artifact stored for ``video_id``"""
+        video = self.video_file(video_id)
+        if video.exists():
+            yield video, self.video_url(video_id), FINAL
+        preview = self.video_file(video_id, "preview")
+        if preview.exists():
+            yield preview, self.video_url(video_id, "preview"), INTERMEDIATE
+        for clip in self.clip_files(video_id):
+            yield clip, f"/videos/{clip.name}", INTERMEDIATE
+        hls = self.hls_dir(video_id)
+        if hls.is_dir():
+            # Renditions can be rebuilt from the final video, so they are evicted first
+            for path in sorted(hls.rglob("*")):
+                if path.is_file():
+                    yield path, f"/videos/{hls.name}/{path.relative_to(hls).as_posix()}", INTERMEDIATE
+        for root, prefix, kind in (
+            (self.image_dir(video_id), "/images", INTERMEDIATE),
+            (self.audio_dir_for(video_id), "/audio", FINAL),
+        ):
+            if root.is_dir():
+                for path in sorted(root.iterdir()):
+                    if path.is_file():
+                        yield path, f"{prefix}/{video_id}/{path.name}", kind
+
+    def build_manifest(self, video_id: str) -> Dict:
+        """List every artifact of a video with its size (blocking; see build_manifest_async)"""
+        files = []
+        for path, url, kind in self._artifacts(video_id):
+            files.append({"url": url, "bytes": path.stat().st_size, "kind": kind})
+        return {
+            "files": files,
+            "total_bytes": sum(f["bytes"] for f in files),
+            "intermediate_bytes": sum(f["bytes"] for f in files if f["kind"] == INTERMEDIATE),
+        }
+
+    async def build_manifest_async(self, video_id: str) -> Dict:
+        return await asyncio.to_thread(self.build_manifest, video_id)
+
+    # --- Copies ------------------------------------------------------------
+
+    def _copy_audio(self, source_id: str, target_id: str) -> bool:
+        source = self.audio_file(source_id)
+        if not source.exists():
+            return False
+        target = self.audio_file(target_id)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, target)
+        return True
+
+    async def copy_audio(self, source_id: str, target_id: str) -> Optional[str]:
+        """Copy a video's narration to another video (e.g. a remix); returns the new URL"""
+        if await asyncio.to_thread(self._copy_audio, source_id, target_id):
+            return self.audio_url(target_id)
+        return None
+
+    def _copy_images(self, image_urls: List[str], target_id: str) -> List[str]:
+        copied = []
+        for url in image_urls:
+            source = self.resolve_url(url)
+            if not source or not source.exists():
+                continue
+            target = self.image_dir(target_id) / source.name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source, target)
+            copied.append(f"/images/{target_id}/{source.name}")
+        return copied
+
+    async def copy_images(self, image_urls: List[str], target_id: str) -> List[str]:
+        """Copy reference images to another video (e.g. near-duplicate reuse); returns the new URLs"""
+        return await asyncio.to_thread(self._copy_images, image_urls, target_id)
+
+    # --- Deletion ----------------------------------------------------------
+
+    def _delete(self, video_id: str, intermediates_only: bool = False) -> int:
+        """Remove a video's artifacts; returns bytes freed"""
+        freed = 0
+        for path, _, kind in list(self._artifacts(video_id)):
+            if intermediates_only and kind != INTERMEDIATE:
+                continue
+            try:
+                freed += path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        hls = self.hls_dir(video_id)
+        if hls.is_dir():
+            for directory in sorted((p for p in hls.rglob("*") if p.is_dir()), reverse=True):
+                if not any(directory.iterdir()):
+                    directory.rmdir()
+        for directory in (self.image_dir(video_id), self.audio_dir_for(video_id), hls):
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+        return freed
+
+    async def delete_artifacts(self, video_id: str) -> int:
+        """Delete every artifact of a video off the event loop"""
+        freed = await asyncio.to_thread(self._delete, video_id)
+        if freed:
+            print(f"[{video_id}] Deleted artifacts ({freed} bytes)")
+        return freed
+
+    async def delete_intermediates(self, video_id: str) -> int:
+        """Delete only intermediate artifacts (previews, HLS renditions, reference images) off the event loop"""
+        return await asyncio.to_thread(self._delete, video_id, True)
+
+    def delete_later(self, video_id: str):
+        """Schedule artifact deletion without waiting for it (e.g. after a row is deleted)"""
+        task = asyncio.create_task(self.delete_artifacts(video_id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    # --- Orphans -----------------------------------------------------------
+
+    def stored_video_ids(self, older_than: float) -> Dict[str, List[Path]]:
+        """
+        Ids with artifacts on disk, mapped to their top-level entries
+
+        Entries modified within ``older_than`` seconds are skipped so jobs
+        still writing files are never treated as orphans. Names starting
+        with "_" are reserved for shared caches.
+        """
+        cutoff = time.time() - older_than
+        found: Dict[str, List[Path]] = {}
+        for root in (self.videos_dir, self.images_dir, self.audio_dir):
+            if not root.is_dir():
+                continue
+            for entry in root.iterdir():
+                if entry.name.startswith(("_", ".")):
+                    continue
+                try:
+                    if entry.stat().st_mtime > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                video_id = entry.name.split(".", 1)[0]
+                found.setdefault(video_id, []).append(entry)
+        return found
+
+    def remove_entries(self, entries: List[Path]) -> int:
+        """Remove top-level entries found by stored_video_ids; returns bytes freed"""
+        freed = 0
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    freed += sum(p.stat().st_size for p in entry.rglob("*") if p.is_file())
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    freed += entry.stat().st_size
+                    entry.unlink()
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def prune_cache(self, max_age: float) -> int:
+        """Delete cached TTS chunks not used within ``max_age`` seconds; returns bytes freed"""
+        cache_dir = self.audio_dir / "_cache"
+        if not cache_dir.is_dir():
+            return 0
+        cutoff = time.time() - max_age
+        freed = 0
+        for path in cache_dir.iterdir():
+            try:
+                stat = path.stat()
+                if stat.st_mtime < cutoff:
+                    path.unlink()
+                    freed += stat.st_size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    # --- Access tracking ---------------------------------------------------
+
+    def touch(self, video_id: str):
+        """Record that a video's artifacts were served (flushed to the DB periodically)"""
+        self._accessed[video_id] = time.time()
+
+    def drain_access_log(self) -> Dict[str, float]:
+        accessed, self._accessed = self._accessed, {}
+        return accessed
+
+
+storage = StorageManager()
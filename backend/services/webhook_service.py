@@ -0,0 +1,188 @@
+"""
+Inbound OpenAI webhooks for Sora video jobs
+
+Events are signed per the Standard Webhooks spec (``webhook-id``,
+``webhook-timestamp`` and ``webhook-signature`` headers, HMAC-SHA256 with a
+``whsec_`` secret). Verified events are stored once per delivery id, which
+deduplicates retries and lets workers in other processes see them, and
+waiters in this process are woken immediately.
+"""
+
+from datetime import datetime
+from typing import Dict, Mapping, Optional
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from config.settings import settings
+from models.database import SessionLocal, WebhookEvent
+
+# Event types that end a video job
+TERMINAL_EVENTS = {"video.completed": "completed", "video.failed": "failed"}
+
+
+class WebhookVerificationError(Exception):
+    """The request is not a validly signed, fresh webhook delivery"""
+
+
+def _secret_bytes(secret: str) -> bytes:
+    if secret.startswith("whsec_"):
+        return base64.b64decode(secret[len("whsec_"):])
+    return secret.encode("utf-8")
+
+
+def sign_payload(secret: str, webhook_id: str, timestamp: int, body: bytes) -> str:
+    """Signature header value (``v1,<base64>``) for a delivery"""
+    signed = f"{webhook_id}.{timestamp}.".encode("utf-8") + body
+    digest = hmac.new(_secret_bytes(secret), signed, hashlib.sha256).digest()
+    return f"v1,{base64.b64encode(digest).decode('ascii')}"
+
+
+def verify_signature(secret: str, headers: Mapping[str, str], body: bytes) -> str:
+    """
+    Check a delivery's signature and timestamp
+
+    Returns:
+        The delivery's webhook-id
+
+    Raises:
+        WebhookVerificationError: Missing headers, stale timestamp or no matching signature
+    """
+    webhook_id = headers.get("webhook-id")
+    timestamp = headers.get("webhook-timestamp")
+    signatures = headers.get("webhook-signature")
+    if not (webhook_id and timestamp and signatures):
+        raise WebhookVerificationError("Missing webhook headers")
+
+    try:
+        sent_at = int(timestamp)
+    except ValueError:
+        raise WebhookVerificationError("Invalid webhook timestamp")
+    if abs(time.time() - sent_at) > settings.WEBHOOK_TOLERANCE_SECONDS:
+        raise WebhookVerificationError("Webhook timestamp outside tolerance")
+
+    expected = sign_payload(secret, webhook_id, sent_at, body)
+    # The header may carry several space-separated signatures (secret rotation)
+    if not any(hmac.compare_digest(expected, candidate) for candidate in signatures.split()):
+        raise WebhookVerificationError("No matching webhook signature")
+    return webhook_id
+
+
+class WebhookHub:
+    """Matches job completion events to the coroutines waiting on those jobs"""
+
+    def __init__(self):
+        self._waiters: Dict[str, asyncio.Event] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.SORA_WEBHOOK_SECRET)
+
+    def record(self, webhook_id: str, event: Dict) -> bool:
+        """
+        Store a verified event and wake its waiter
+
+        Returns:
+            False if this delivery was already received (a retry)
+        """
+        data = event.get("data") or {}
+        job_id = data.get("id")
+        db = SessionLocal()
+        try:
+            db.add(WebhookEvent(
+                id=webhook_id,
+                job_id=job_id,
+                type=event.get("type"),
+                payload=event,
+                received_at=datetime.utcnow()
+            ))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+        waiter = self._waiters.get(job_id)
+        if waiter:
+            waiter.set()
+        return True
+
+    def prune(self, max_age: float) -> int:
+        """Delete stored events older than ``max_age`` seconds; returns how many"""
+        cutoff = datetime.utcfromtimestamp(time.time() - max_age)
+        db = SessionLocal()
+        try:
+            deleted = db.query(WebhookEvent).filter(WebhookEvent.received_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def _terminal_event(self, job_id: str) -> Optional[Dict]:
+        """The first stored completed/failed event for a Sora job (blocking)"""
+        db = SessionLocal()
+        try:
+            event = (
+                db.query(WebhookEvent)
+                .filter(WebhookEvent.job_id == job_id, WebhookEvent.type.in_(TERMINAL_EVENTS))
+                .order_by(WebhookEvent.received_at)
+                .first()
+            )
+            return event.payload if event else None
+        finally:
+            db.close()
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """
+        Wait up to ``timeout`` seconds for a terminal event for ``job_id``
+
+        Deliveries to this process wake the waiter at once; the events table
+        is re-checked every WEBHOOK_EVENT_CHECK_INTERVAL for deliveries
+        received by another process.
+
+        Returns:
+            A job status dict shaped like GET /videos/{id} (status and
+            error), or None if nothing arrived in time
+        """
+        waiter = self._waiters.setdefault(job_id, asyncio.Event())
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                # Every waiting render checks this often, so keep the query off the loop
+                event = await asyncio.to_thread(self._terminal_event, job_id)
+                if event:
+                    data = event.get("data") or {}
+                    return {
+                        "id": job_id,
+                        "status": TERMINAL_EVENTS[event["type"]],
+                        "error": data.get("error") or {"message": "Reported failed by webhook"},
+                    }
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=min(remaining, settings.WEBHOOK_EVENT_CHECK_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+                waiter.clear()
+        finally:
+            self._waiters.pop(job_id, None)
+
+
+webhooks = WebhookHub()
+
+
+def parse_event(body: bytes) -> Dict:
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise WebhookVerificationError("Webhook body is not JSON")
+    if not isinstance(event, dict) or "type" not in event:
+        raise WebhookVerificationError("Webhook body is not an event")
+    return event
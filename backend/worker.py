@@ -0,0 +1,43 @@
+import sys
+import argparse
+import asyncio
+import signal
+from pathlib import Path
+
+# Add parent directory to path to make imports work
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config.settings import settings
+from models.database import init_db
+from jobs.worker import Worker
+from services.loop_monitor import loop_monitor
+
+
+async def run_worker(concurrency: int):
+    worker = Worker(concurrency=concurrency)
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    loop_monitor.start()
+    worker.start()
+    await stop.wait()
+    print("Shutting down worker, handing running jobs back to the queue...")
+    await worker.stop()
+    await loop_monitor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VisionPulse generation worker")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY,
+                        help="Jobs to run at once in this process")
+    args = parser.parse_args()
+
+    settings.ensure_directories()
+    init_db()
+
+    print("Starting VisionPulse worker...")
+    print(f"Database: {settings.DATABASE_URL}")
+    asyncio.run(run_worker(args.concurrency))
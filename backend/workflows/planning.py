@@ -0,0 +1,172 @@
+"""
+Structured planning for video generation
+
+A single LLM call returns the image prompts, the best prompt and the
+narration text together as schema-constrained JSON. ``parse_video_plan``
+validates and normalises the reply before the workflow uses it.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+from config.presets import VISUAL_STYLES
+
+
+class VideoPlan(BaseModel):
+    """Planning output for one script"""
+    prompts: List[str] = Field(description="5-6 detailed image prompts, one per key visual moment")
+    best_prompt_number: int = Field(description="1-based number of the prompt that is the strongest reference for the video")
+    narration: str = Field(description="Text to speak aloud, or an empty string when the whole script is the narration")
+
+
+class NumberedVideoPlan(VideoPlan):
+    """Planning output for one script of a batch"""
+    script_number: int = Field(description="Number of the script this plan belongs to")
+
+
+class BatchVideoPlan(BaseModel):
+    """Planning output for several scripts"""
+    plans: List[NumberedVideoPlan]
+
+
+class PlanValidationError(ValueError):
+    """Raised when an LLM planning reply cannot be turned into a usable plan"""
+
+
+def strip_code_fence(content: str) -> str:
+    """Remove a surrounding markdown code fence from an LLM reply"""
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    elif content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    return content.strip()
+
+
+def _coerce(raw: Any, model):
+    """Accept a model instance, a dict or a JSON string"""
+    if isinstance(raw, model):
+        return raw
+    try:
+        if isinstance(raw, str):
+            raw = json.loads(strip_code_fence(raw))
+        return model.model_validate(raw)
+    except (ValueError, ValidationError) as e:
+        raise PlanValidationError(f"Invalid plan: {e}") from e
+
+
+def parse_video_plan(raw: Any, script: str, style: str) -> Dict:
+    """
+    Validate a planning reply and turn it into workflow state fields
+
+    Args:
+        raw: VideoPlan, dict or JSON text returned by the LLM
+        script: Original script, used when no separate narration was extracted
+        style: Visual style whose prompt suffix is appended to every prompt
+
+    Returns:
+        Dictionary with prompts, best_prompt and narration_text
+    """
+    plan = _coerce(raw, VideoPlan)
+
+    prompts = [p.strip() for p in plan.prompts if isinstance(p, str) and p.strip()]
+    if not prompts:
+        raise PlanValidationError("Plan contains no prompts")
+
+    style_suffix = VISUAL_STYLES.get(style, VISUAL_STYLES["realistic"])["prompt_suffix"]
+    prompts = [f"{p}, {style_suffix}" for p in prompts]
+
+    # Out-of-range choices fall back to the first prompt
+    index = plan.best_prompt_number - 1
+    if not 0 <= index < len(prompts):
+        index = 0
+
+    narration = plan.narration.strip().strip('"')
+
+    return {
+        "prompts": prompts,
+        "best_prompt": prompts[index],
+        "narration_text": narration or script,
+    }
+
+
+def parse_batch_plan(raw: Any, jobs: List[Dict]) -> Dict[str, Dict]:
+    """
+    Validate a batch planning reply
+
+    Args:
+        raw: BatchVideoPlan, dict or JSON text returned by the LLM
+        jobs: The planned jobs in script-number order (video_id, script, style)
+
+    Returns:
+        Mapping of video_id to plan fields; invalid or missing plans are omitted
+    """
+    batch = _coerce(raw, BatchVideoPlan)
+
+    result = {}
+    for numbered in batch.plans:
+        index = numbered.script_number - 1
+        if not 0 <= index < len(jobs):
+            continue
+        job = jobs[index]
+        try:
+            result[job["video_id"]] = parse_video_plan(numbered, job["script"], job["style"])
+        except PlanValidationError as e:
+            print(f"[{job['video_id']}] Discarding batch plan: {e}")
+    return result
+
+
+def _keywords_block(keywords: Optional[List[str]], negative_keywords: Optional[List[str]]) -> str:
+    return f"Additional Keywords: {', '.join(keywords or [])}\nAvoid: {', '.join(negative_keywords or [])}"
+
+
+PLAN_REQUIREMENTS = """Image prompt requirements:
+1. Create 5-6 key scene prompts (these will be reference images for Sora)
+2. Each prompt should capture a different critical visual moment
+3. Include lighting, mood, composition, and camera angle details
+4. Make prompts suitable for DALL-E 3
+5. Keep prompts family-friendly and diverse
+
+Best prompt: pick the ONE prompt that would be the strongest visual reference for the video.
+Consider visual impact, clarity, alignment with the script, and video potential.
+
+Narration: if the script marks narration/voiceover text (e.g. after "narration:" markers or — dashes),
+return ONLY the text that should be spoken aloud, ignoring technical instructions, combined into one
+flowing script. If it has no such markers, return an empty string."""
+
+
+def build_plan_prompt(script: str, style: str, keywords: Optional[List[str]], negative_keywords: Optional[List[str]]) -> str:
+    """Prompt for planning a single script"""
+    style_info = VISUAL_STYLES.get(style, VISUAL_STYLES["realistic"])
+    return f"""Plan the reference images and narration for a generated video.
+
+Script:
+{script}
+
+Visual Style: {style_info['name']}
+Style Description: {style_info['description']}
+{_keywords_block(keywords, negative_keywords)}
+
+{PLAN_REQUIREMENTS}"""
+
+
+def build_batch_plan_prompt(jobs: List[Dict]) -> str:
+    """Prompt for planning several scripts that share a style"""
+    style_info = VISUAL_STYLES.get(jobs[0]["style"], VISUAL_STYLES["realistic"])
+    sections = "\n\n".join(
+        f"### Script {number}\n{job['script']}\n{_keywords_block(job.get('keywords'), job.get('negative_keywords'))}"
+        for number, job in enumerate(jobs, start=1)
+    )
+    return f"""Plan the reference images and narration for each of the following {len(jobs)} scripts.
+Return one plan per script, tagged with its script number.
+
+Visual Style: {style_info['name']}
+Style Description: {style_info['description']}
+
+{sections}
+
+{PLAN_REQUIREMENTS}"""
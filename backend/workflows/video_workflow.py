@@ -1,12 +1,24 @@
-from typing import TypedDict, List, Optional
-import json
+from typing import TypedDict, List, Optional, Dict
+import math
+import time
 import asyncio
 
 from config.settings import settings
 from config.presets import VISUAL_STYLES
 from services.sora_service import SoraService
 from services.image_service import ImageService
-from services.audio_service import AudioService
+from services.audio_service import AudioService, mp3_duration
+from services.storage_service import storage
+from services.media_service import MediaService
+from services.eta_service import report_stage, sora_timeout
+from workflows.planning import (
+    VideoPlan,
+    BatchVideoPlan,
+    build_plan_prompt,
+    build_batch_plan_prompt,
+    parse_video_plan,
+    parse_batch_plan
+)
 
 # Try to import langchain, but work without it if not available
 try:
@@ -17,6 +29,25 @@ except ImportError:
     USE_LANGCHAIN = False
     print("Warning: LangChain not available, using direct OpenAI API")
 
+SORA_CLIP_SECONDS = (4, 8, 12)
+
+def plan_shots(target_seconds: float, scene_count: int, max_shots: int) -> List[int]:
+    """
+    Clip lengths for a storyboard that covers ``target_seconds``
+
+    Uses as many scenes as there are (up to ``max_shots``) with the shortest
+    clips that reach the target, since shorter renders finish sooner, then
+    shortens trailing clips while the total still covers the target.
+    """
+    longest = SORA_CLIP_SECONDS[-1]
+    count = max(1, min(scene_count, max_shots, math.ceil(target_seconds / SORA_CLIP_SECONDS[0])))
+    per_shot = next((s for s in SORA_CLIP_SECONDS if s * count >= target_seconds), longest)
+    shots = [per_shot] * count
+    for i in reversed(range(count)):
+        while shots[i] > SORA_CLIP_SECONDS[0] and sum(shots) - SORA_CLIP_SECONDS[0] >= target_seconds:
+            shots[i] -= 4
+    return shots
+
 class VideoGenerationState(TypedDict):
     """State for the video generation workflow"""
     video_id: str
@@ -35,16 +66,30 @@ class VideoGenerationState(TypedDict):
     narration_text: Optional[str]
     error: Optional[str]
     current_step: str
+    stage_durations: Dict[str, float]  # Wall-clock seconds spent in each step
+    sora_job_id: Optional[str]  # Upstream Sora job that produced video_path
+    preview_mode: str  # "off", "auto" or "approval"
+    preview_path: Optional[str]  # Quick draft rendered before the full video
+    preview_approved: bool  # In approval mode, the full render only runs once this is set
+    hls_path: Optional[str]  # HLS master playlist of the rendition ladder
+    storyboard: bool  # Render one clip per scene and join them (step 4)
 
 class VideoGenerationWorkflow:
     """
     Video Generation Workflow using OpenAI Sora API with DALL-E reference images
     
     Steps:
-    1. Generate prompts from script
+    1. Plan prompts, best prompt and narration from script (one LLM call)
     2. Generate reference images with DALL-E
     3. Generate audio narration with selected voice
-    4. Generate video using Sora with image reference
+    3b. Optionally render a short low-resolution preview with sora-2
+    4. Generate video using Sora with image reference (or, in storyboard
+       mode, one clip per scene rendered in parallel and joined)
+    5. Mux the narration into the video (stream copy, no video re-encode)
+    6. Optionally segment the video into an HLS rendition ladder
+    
+    Steps whose output is already in the state are skipped, so a job that
+    stopped to wait for preview approval resumes at the full render.
     """
     
     def __init__(self):
@@ -53,71 +98,42 @@ class VideoGenerationWorkflow:
             self.llm = ChatOpenAI(
                 model=settings.OPENAI_MODEL,
                 api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
                 temperature=0.7
             )
+            # Schema-constrained planners replace free-text parsing
+            self.planner = self.llm.with_structured_output(VideoPlan, method="json_schema")
+            self.batch_planner = self.llm.with_structured_output(BatchVideoPlan, method="json_schema")
         else:
             self.llm = None
+            self.planner = None
+            self.batch_planner = None
             
         self.sora_service = SoraService()
         self.image_service = ImageService()
         self.audio_service = AudioService()
+        self.media_service = MediaService()
     
-    async def generate_prompts(self, state: VideoGenerationState) -> VideoGenerationState:
-        """Step 1: Generate 5-6 image prompts from script"""
-        print(f"[{state['video_id']}] Step 1: Generating 5-6 prompts...")
+    async def plan_video(self, state: VideoGenerationState) -> VideoGenerationState:
+        """Step 1: Plan prompts, best prompt and narration in one structured LLM call"""
+        print(f"[{state['video_id']}] Step 1: Planning prompts and narration...")
         
         try:
-            script = state["script"]
-            style = state["style"]
-            keywords = state.get("keywords", [])
-            negative_keywords = state.get("negative_keywords", [])
-            
-            style_info = VISUAL_STYLES.get(style, VISUAL_STYLES["realistic"])
-            style_suffix = style_info["prompt_suffix"]
-            
-            keywords_text = ", ".join(keywords) if keywords else ""
-            negative_text = ", ".join(negative_keywords) if negative_keywords else ""
-            
-            prompt = f"""Create 5-6 detailed image prompts that will serve as reference images for video generation.
-
-Script:
-{script}
-
-Visual Style: {style_info['name']}
-Style Description: {style_info['description']}
-Additional Keywords: {keywords_text}
-Avoid: {negative_text}
-
-Requirements:
-1. Create 5-6 key scene prompts (these will be reference images for Sora)
-2. Each prompt should capture a different critical visual moment
-3. Include lighting, mood, composition, and camera angle details
-4. Make prompts suitable for DALL-E 3
-5. Keep prompts family-friendly and diverse
-
-Return ONLY a JSON array of strings:
-["prompt 1", "prompt 2", "prompt 3", "prompt 4", "prompt 5", "prompt 6"]"""
-
-            if USE_LANGCHAIN and self.llm:
-                response = await self.llm.ainvoke([HumanMessage(content=prompt)])
-                content = response.content.strip()
-            else:
+            if not (USE_LANGCHAIN and self.llm):
                 raise Exception("LangChain required for prompt generation")
             
-            # Parse response
-            if content.startswith("```json"):
-                content = content[7:]
-            elif content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            
-            prompts = json.loads(content.strip())
-            prompts = [f"{p}, {style_suffix}" for p in prompts]
+            prompt = build_plan_prompt(
+                state["script"],
+                state["style"],
+                state.get("keywords", []),
+                state.get("negative_keywords", [])
+            )
+            raw_plan = await self.planner.ainvoke([HumanMessage(content=prompt)])
+            plan = parse_video_plan(raw_plan, state["script"], state["style"])
             
-            state["prompts"] = prompts
+            state.update(plan)
             state["current_step"] = "prompts_generated"
-            print(f"[{state['video_id']}] Generated {len(prompts)} prompts")
+            print(f"[{state['video_id']}] Planned {len(plan['prompts'])} prompts")
             
         except Exception as e:
             state["error"] = f"Prompt generation failed: {str(e)}"
@@ -125,53 +141,29 @@ Return ONLY a JSON array of strings:
         
         return state
     
-    async def select_best_prompt(self, state: VideoGenerationState) -> VideoGenerationState:
-        """Step 1.5: Auto-select the best prompt for video generation"""
-        print(f"[{state['video_id']}] Step 1.5: Selecting best prompt...")
-        
-        if state.get("error"):
-            return state
+    async def plan_videos_batch(self, jobs: List[Dict]) -> Dict[str, Dict]:
+        """
+        Plan several scripts that share a visual style in one structured LLM call
         
-        try:
-            prompts = state["prompts"]
-            script = state["script"]
-            
-            selection_prompt = f"""Given these {len(prompts)} image prompts, select the ONE that would work best as the primary reference for video generation.
-
-Original Script:
-{script}
-
-Image Prompts:
-{chr(10).join(f"{i+1}. {p}" for i, p in enumerate(prompts))}
-
-Which prompt (#1-{len(prompts)}) best captures the essence and would be the strongest visual reference for the video? 
-Consider: visual impact, clarity, alignment with script, and video potential.
-
-Respond with ONLY the number (1-{len(prompts)})."""
-
-            if USE_LANGCHAIN and self.llm:
-                response = await self.llm.ainvoke([HumanMessage(content=selection_prompt)])
-                choice = response.content.strip()
-                # Extract number
-                import re
-                match = re.search(r'\d+', choice)
-                if match:
-                    index = int(match.group()) - 1
-                    if 0 <= index < len(prompts):
-                        state["best_prompt"] = prompts[index]
-                        print(f"[{state['video_id']}] Selected prompt #{index+1} as best")
-                    else:
-                        state["best_prompt"] = prompts[0]
-                else:
-                    state["best_prompt"] = prompts[0]
-            else:
-                state["best_prompt"] = prompts[0]
-            
-        except Exception as e:
-            print(f"[{state['video_id']}] Best prompt selection failed: {e}, using first prompt")
-            state["best_prompt"] = state["prompts"][0] if state["prompts"] else ""
+        Args:
+            jobs: Jobs to plan (all with the same style), each with video_id,
+                script, style, keywords and negative_keywords
+            
+        Returns:
+            Mapping of video_id to plan fields (prompts, best_prompt,
+            narration_text). Jobs missing from the mapping fall back to
+            per-job planning.
+        """
+        if not jobs:
+            return {}
+        if not (USE_LANGCHAIN and self.llm):
+            raise Exception("LangChain required for prompt generation")
         
-        return state
+        print(f"Batch planning {len(jobs)} scripts ({jobs[0]['style']})...")
+        raw_plan = await self.batch_planner.ainvoke([HumanMessage(content=build_batch_plan_prompt(jobs))])
+        result = parse_batch_plan(raw_plan, jobs)
+        print(f"Batch planned {len(result)}/{len(jobs)} scripts")
+        return result
     
     async def generate_images(self, state: VideoGenerationState) -> VideoGenerationState:
         """Step 2: Generate reference images with DALL-E"""
@@ -199,38 +191,6 @@ Respond with ONLY the number (1-{len(prompts)})."""
         
         return state
     
-    async def extract_narration(self, state: VideoGenerationState) -> VideoGenerationState:
-        """Extract narration text from script"""
-        script = state["script"]
-        
-        if "narration:" in script.lower() or "—" in script or ":" in script:
-            extraction_prompt = f"""Extract ONLY the narration/voiceover text from this script.
-            
-Script:
-{script}
-
-Rules:
-1. Extract only text that should be spoken aloud
-2. Look for text after "narration:" markers or — dashes
-3. Ignore technical instructions
-4. Combine all narration into one flowing script
-5. Return ONLY the narration text"""
-            
-            try:
-                if USE_LANGCHAIN and self.llm:
-                    response = await self.llm.ainvoke([HumanMessage(content=extraction_prompt)])
-                    narration_text = response.content.strip().strip('"')
-                    state["narration_text"] = narration_text
-                else:
-                    state["narration_text"] = script
-            except Exception as e:
-                print(f"[{state['video_id']}] Narration extraction failed: {e}")
-                state["narration_text"] = script
-        else:
-            state["narration_text"] = script
-        
-        return state
-    
     async def generate_audio(self, state: VideoGenerationState) -> VideoGenerationState:
         """Step 3: Generate audio narration with selected voice"""
         print(f"[{state['video_id']}] Step 3: Generating audio narration...")
@@ -239,7 +199,7 @@ Rules:
             return state
         
         try:
-            narration_text = state.get("narration_text", state["script"])
+            narration_text = state.get("narration_text") or state["script"]
             voice = state["voice"]
             video_id = state["video_id"]
             
@@ -280,18 +240,9 @@ Rules:
             video_prompt = f"{best_prompt}\n\nStyle: {style_info['description']}"
             
             # Use first 2 images as reference if available
-            reference_images = []
-            if image_paths:
-                from pathlib import Path
-                # Take first 2 images
-                for img_url in image_paths[:2]:
-                    if img_url.startswith('/images/'):
-                        filename = Path(img_url).name
-                        img_path = str(settings.IMAGES_DIR / video_id / filename)
-                        reference_images.append(img_path)
-                
-                if reference_images:
-                    print(f"[{video_id}] Using {len(reference_images)} reference images")
+            reference_images = self._reference_images(image_paths)
+            if reference_images:
+                print(f"[{video_id}] Using {len(reference_images)} reference images")
             
             # Determine model
             use_pro = getattr(settings, 'SORA_MODEL', 'sora-2-pro') == 'sora-2-pro'
@@ -303,11 +254,13 @@ Rules:
                 video_id=video_id,
                 size=size,  # Pass custom size
                 use_pro=use_pro,
-                reference_images=reference_images  # Pass multiple images
+                reference_images=reference_images,  # Pass multiple images
+                max_wait_time=await self._render_timeout("video", state)
             )
             
             state["video_path"] = result["video_path"]
             state["duration"] = result["duration"]
+            state["sora_job_id"] = result["sora_job_id"]
             state["current_step"] = "completed"
             print(f"[{video_id}] ✅ Video completed: {result['video_path']}")
             
@@ -317,34 +270,288 @@ Rules:
         
         return state
     
+    async def generate_storyboard(self, state: VideoGenerationState) -> VideoGenerationState:
+        """Step 4 (storyboard mode): Render one Sora clip per scene in parallel and join them"""
+        print(f"[{state['video_id']}] Step 4: Rendering storyboard with Sora...")
+        
+        if state.get("error"):
+            return state
+        
+        video_id = state["video_id"]
+        if not self.media_service.available:
+            state["error"] = f"Storyboard mode needs {settings.FFMPEG_PATH} to join the clips"
+            return state
+        
+        tasks = []
+        try:
+            # Cover the narration (or the requested duration, if longer)
+            narration_seconds = 0.0
+            audio_file = storage.resolve_url(state["audio_path"]) if state.get("audio_path") else None
+            if audio_file and audio_file.exists():
+                narration_seconds = await asyncio.to_thread(mp3_duration, audio_file)
+            target = max(state.get("duration") or 8, narration_seconds)
+            
+            scenes = state.get("prompts") or [state.get("best_prompt") or state["script"]]
+            shots = plan_shots(target, len(scenes), settings.STORYBOARD_MAX_SHOTS)
+            # Spread the shots over the scenes so the whole story is covered
+            picks = [i * len(scenes) // len(shots) for i in range(len(shots))]
+            print(f"[{video_id}] Storyboard: {len(shots)} shots {shots} for {target:.1f}s of narration")
+            if sum(shots) < target:
+                print(f"[{video_id}] ⚠ {sum(shots)}s of clips can't cover {target:.1f}s; raise STORYBOARD_MAX_SHOTS to avoid cutting the narration")
+            
+            style_info = VISUAL_STYLES.get(state["style"], VISUAL_STYLES["realistic"])
+            size = state.get("size", "1280x720")
+            use_pro = getattr(settings, 'SORA_MODEL', 'sora-2-pro') == 'sora-2-pro'
+            image_paths = state.get("image_paths", [])
+            timeout = await self._render_timeout("video", dict(state, duration=max(shots)))
+            
+            # All shots render at once (within SORA_CONCURRENCY), so the step
+            # takes about as long as the slowest clip rather than their sum
+            tasks = [
+                asyncio.create_task(self.sora_service.generate_video(
+                    prompt=f"{scenes[scene]}\n\nStyle: {style_info['description']}",
+                    duration=seconds,
+                    video_id=video_id,
+                    size=size,
+                    use_pro=use_pro,
+                    reference_images=self._reference_images(image_paths[scene:scene + 1]),
+                    variant=f"shot{shot:02d}",
+                    max_wait_time=timeout
+                ))
+                for shot, (scene, seconds) in enumerate(zip(picks, shots))
+            ]
+            results = await asyncio.gather(*tasks)
+            
+            clips = [storage.video_file(video_id, f"shot{shot:02d}") for shot in range(len(shots))]
+            if not await self.media_service.concat_clips(clips, storage.video_file(video_id)):
+                raise Exception("ffmpeg could not join the clips")
+            
+            state["video_path"] = storage.video_url(video_id)
+            state["duration"] = sum(result["duration"] for result in results)
+            state["sora_job_id"] = None  # Several jobs made this video, so there is no single one to remix
+            state["current_step"] = "completed"
+            print(f"[{video_id}] ✅ Storyboard completed: {state['video_path']} ({state['duration']}s)")
+            
+        except Exception as e:
+            state["error"] = f"Sora storyboard generation failed: {str(e)}"
+            print(f"[{video_id}] Error: {state['error']}")
+        finally:
+            # A failed or cancelled shot stops the others (and their upstream jobs)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.to_thread(storage.remove_entries, storage.clip_files(video_id))
+        
+        return state
+    
+    async def mux_audio(self, state: VideoGenerationState) -> VideoGenerationState:
+        """Step 5: Add the narration to the final video as its audio track"""
+        print(f"[{state['video_id']}] Step 5: Muxing narration into video...")
+        
+        if state.get("error") or not state.get("audio_path"):
+            return state
+        
+        video_file = storage.resolve_url(state["video_path"])
+        audio_file = storage.resolve_url(state["audio_path"])
+        try:
+            if video_file and audio_file and await self.media_service.mux_narration(video_file, audio_file):
+                state["current_step"] = "audio_muxed"
+                print(f"[{state['video_id']}] ✅ Narration muxed into {state['video_path']}")
+        except asyncio.TimeoutError:
+            print(f"[{state['video_id']}] ⚠ Muxing timed out, keeping separate narration")
+        except Exception as e:
+            # The video and narration are still usable separately
+            print(f"[{state['video_id']}] ⚠ Muxing failed, keeping separate narration: {str(e)}")
+        
+        return state
+    
+    async def generate_hls(self, state: VideoGenerationState) -> VideoGenerationState:
+        """Step 6: Segment the final video into adaptive bitrate HLS renditions"""
+        print(f"[{state['video_id']}] Step 6: Segmenting HLS renditions...")
+        
+        if state.get("error"):
+            return state
+        
+        video_id = state["video_id"]
+        video_file = storage.resolve_url(state["video_path"])
+        # Only a successful mux (step 5) leaves an audio track in the MP4
+        with_audio = state.get("current_step") == "audio_muxed"
+        try:
+            if video_file and await self.media_service.segment_hls(
+                video_file, storage.hls_dir(video_id), state.get("size") or "1280x720", with_audio
+            ):
+                state["hls_path"] = storage.hls_url(video_id)
+                print(f"[{video_id}] ✅ HLS ready: {state['hls_path']}")
+        except asyncio.TimeoutError:
+            print(f"[{video_id}] ⚠ HLS segmenting timed out, serving the MP4 only")
+        except Exception as e:
+            # The MP4 is still playable on its own
+            print(f"[{video_id}] ⚠ HLS segmenting failed, serving the MP4 only: {str(e)}")
+        
+        return state
+    
+    async def generate_preview(self, state: VideoGenerationState) -> VideoGenerationState:
+        """Step 3b: Render a short, low-resolution draft from the same plan"""
+        print(f"[{state['video_id']}] Step 3b: Rendering preview with {settings.PREVIEW_MODEL}...")
+        
+        if state.get("error"):
+            return state
+        
+        try:
+            style_info = VISUAL_STYLES.get(state["style"], VISUAL_STYLES["realistic"])
+            result = await self.sora_service.generate_video(
+                prompt=f"{state['best_prompt']}\n\nStyle: {style_info['description']}",
+                duration=settings.PREVIEW_DURATION,
+                video_id=state["video_id"],
+                size=self._preview_size(state.get("size", "1280x720")),
+                use_pro=settings.PREVIEW_MODEL == "sora-2-pro",
+                reference_images=self._reference_images(state.get("image_paths", [])),
+                variant="preview",
+                max_wait_time=await self._render_timeout("preview", state)
+            )
+            state["preview_path"] = result["video_path"]
+            state["current_step"] = "preview_generated"
+            print(f"[{state['video_id']}] Preview ready: {result['video_path']}")
+            
+        except Exception as e:
+            # The preview is a convenience; without one the full render still runs
+            # (approval mode included, since there is nothing to approve)
+            print(f"[{state['video_id']}] ⚠ Preview failed, continuing to full render: {str(e)}")
+            state["preview_approved"] = True
+        
+        return state
+    
+    @staticmethod
+    def _preview_size(size: str) -> str:
+        """Lowest resolution sora-2 renders in the same orientation"""
+        try:
+            width, height = (int(part) for part in size.lower().split("x"))
+        except ValueError:
+            return "1280x720"
+        return "720x1280" if height > width else "1280x720"
+    
+    @staticmethod
+    def _reference_images(image_paths: List[str]) -> List[str]:
+        """File paths of the first 2 reference images"""
+        reference_images = []
+        for img_url in (image_paths or [])[:2]:
+            img_path = storage.resolve_url(img_url)
+            if img_path:
+                reference_images.append(str(img_path))
+        return reference_images
+    
+    async def remix(
+        self,
+        state: VideoGenerationState,
+        source_video_id: str,
+        source_job_id: str,
+        remix_prompt: str
+    ) -> VideoGenerationState:
+        """
+        Produce a video by remixing a finished Sora job instead of running the pipeline
+        
+        No planning, images or new narration: the source's narration is copied
+        and only the Sora remix is paid for.
+        """
+        video_id = state["video_id"]
+        print(f"[{video_id}] Remixing {source_video_id} (Sora job {source_job_id})...")
+        state.setdefault("stage_durations", {})
+        await self._report_stage(video_id, "remix")
+        started = time.perf_counter()
+        
+        try:
+            result = await self.sora_service.remix_video(
+                video_id=video_id,
+                source_video_id=source_job_id,
+                prompt=remix_prompt,
+                max_wait_time=await self._render_timeout("remix", state)
+            )
+            state["video_path"] = result["video_path"]
+            state["duration"] = result["duration"]
+            state["sora_job_id"] = result["sora_job_id"]
+            state["audio_path"] = await storage.copy_audio(source_video_id, video_id) or ""
+            state["current_step"] = "completed"
+            print(f"[{video_id}] ✅ Remix completed: {result['video_path']}")
+        except Exception as e:
+            state["error"] = f"Sora remix failed: {str(e)}"
+            print(f"[{video_id}] Error: {state['error']}")
+        finally:
+            state["stage_durations"]["remix"] = time.perf_counter() - started
+        
+        if settings.ENABLE_AUDIO_MUX and not state.get("error"):
+            state = await self._timed("mux", self.mux_audio, state)
+        if settings.ENABLE_HLS and not state.get("error"):
+            state = await self._timed("hls", self.generate_hls, state)
+        return state
+    
+    async def _timed(self, stage: str, step, state: VideoGenerationState) -> VideoGenerationState:
+        """Run a workflow step and record how long it took under ``stage``"""
+        await self._report_stage(state["video_id"], stage)
+        started = time.perf_counter()
+        try:
+            return await step(state)
+        finally:
+            state.setdefault("stage_durations", {})[stage] = time.perf_counter() - started
+    
+    async def _report_stage(self, video_id: str, stage: str):
+        """Store the step a job is in, for its ETA (best effort)"""
+        try:
+            await asyncio.to_thread(report_stage, video_id, stage)
+        except Exception as e:
+            print(f"[{video_id}] Could not store stage: {str(e)}")
+    
+    async def _render_timeout(self, stage: str, state: VideoGenerationState) -> float:
+        """Sora timeout adapted to past renders of the same kind"""
+        timeout = await asyncio.to_thread(sora_timeout, stage, state.get("size"), state.get("duration"), state.get("style"))
+        print(f"[{state['video_id']}] Render timeout: {int(timeout)}s")
+        return timeout
+    
     async def run(self, initial_state: VideoGenerationState) -> VideoGenerationState:
         """Execute the complete workflow"""
         print(f"[{initial_state['video_id']}] Starting enhanced Sora workflow...")
+        initial_state.setdefault("stage_durations", {})
         
         try:
-            # Step 1: Generate 5-6 prompts
-            state = await self.generate_prompts(initial_state)
-            if state.get("error"):
-                return state
-            
-            # Step 1.5: Auto-select best prompt
-            state = await self.select_best_prompt(state)
+            # Step 1: Plan prompts, best prompt and narration
+            # (skipped when planned ahead, e.g. in a batch)
+            state = initial_state
+            if not (state.get("prompts") and state.get("best_prompt")):
+                state = await self._timed("plan", self.plan_video, state)
+                if state.get("error"):
+                    return state
             
             # Step 2: Generate reference images
-            state = await self.generate_images(state)
-            if state.get("error"):
-                return state
-            
-            # Step 2.5: Extract narration
-            state = await self.extract_narration(state)
+            if not state.get("image_paths"):
+                state = await self._timed("images", self.generate_images, state)
+                if state.get("error"):
+                    return state
             
             # Step 3: Generate audio narration with selected voice
-            state = await self.generate_audio(state)
-            if state.get("error"):
+            if not state.get("audio_path"):
+                state = await self._timed("audio", self.generate_audio, state)
+                if state.get("error"):
+                    return state
+            
+            # Step 3b: Preview draft, then optionally stop until it is approved
+            preview_mode = state.get("preview_mode") or "off"
+            if preview_mode != "off" and not state.get("preview_path"):
+                state = await self._timed("preview", self.generate_preview, state)
+            if preview_mode == "approval" and not state.get("preview_approved"):
+                state["current_step"] = "awaiting_approval"
+                print(f"[{initial_state['video_id']}] Preview awaiting approval")
                 return state
             
             # Step 4: Generate video with Sora (using first 2 images + custom size)
-            state = await self.generate_video_with_sora(state)
+            render = self.generate_storyboard if state.get("storyboard") else self.generate_video_with_sora
+            state = await self._timed("video", render, state)
+            
+            # Step 5: Mux narration into the video
+            if settings.ENABLE_AUDIO_MUX and not state.get("error"):
+                state = await self._timed("mux", self.mux_audio, state)
+            
+            # Step 6: Adaptive bitrate renditions for playback
+            if settings.ENABLE_HLS and not state.get("error"):
+                state = await self._timed("hls", self.generate_hls, state)
             
             if state.get("error"):
                 print(f"[{initial_state['video_id']}] Workflow failed: {state['error']}")
@@ -1,14 +1,50 @@
 'use client';
 
+import { useEffect, useRef, useState } from 'react';
 import { Video, videoApi } from '@/lib/api';
 import { Download, Trash2, Clock, CheckCircle, XCircle, Loader, RefreshCw } from 'lucide-react';
 import { formatDistanceToNow } from 'date-fns';
 
+// hls_path is set when the backend built an adaptive bitrate HLS ladder
+type PlayableVideo = Video & { hls_path?: string | null };
+
 interface VideoGalleryProps {
-  videos: Video[];
+  videos: PlayableVideo[];
   onUpdate: () => void;
 }
 
+const HLS_MIME = 'application/vnd.apple.mpegurl';
+
+// Plays the HLS ladder where the browser supports it natively (Safari, iOS,
+// Android), otherwise the MP4; falls back to the MP4 if the playlist fails
+function VideoPlayer({ video }: { video: PlayableVideo }) {
+  const ref = useRef<HTMLVideoElement>(null);
+  const mp4Url = videoApi.getVideoUrl(video.video_path!);
+  const [src, setSrc] = useState(mp4Url);
+
+  useEffect(() => {
+    const element = ref.current;
+    if (video.hls_path && element && element.canPlayType(HLS_MIME) !== '') {
+      setSrc(videoApi.getVideoUrl(video.hls_path));
+    } else {
+      setSrc(mp4Url);
+    }
+  }, [video.hls_path, mp4Url]);
+
+  return (
+    <video
+      ref={ref}
+      src={src}
+      controls
+      preload="metadata"
+      className="w-full h-full"
+      onError={() => {
+        if (src !== mp4Url) setSrc(mp4Url);
+      }}
+    />
+  );
+}
+
 export default function VideoGallery({ videos, onUpdate }: VideoGalleryProps) {
   const handleDelete = async (id: string) => {
     if (confirm('Are you sure you want to delete this video?')) {
@@ -92,11 +128,7 @@ export default function VideoGallery({ videos, onUpdate }: VideoGalleryProps) {
           {/* Video Preview */}
           {video.status === 'completed' && video.video_path ? (
             <div className="relative aspect-video bg-black">
-              <video
-                src={videoApi.getVideoUrl(video.video_path)}
-                controls
-                className="w-full h-full"
-              />
+              <VideoPlayer video={video} />
             </div>
           ) : (
             <div className="relative aspect-video bg-gradient-to-br from-purple-900/50 to-blue-900/50 flex items-center justify-center">